@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+API Load Test - Misura di throughput e latenza dell'API HTTP locale.
+
+Client multi-thread con connessioni persistenti (http.client) che
+interroga un server già avviato (--url) oppure ne avvia uno interno
+su una porta libera. Riporta richieste al secondo e latenze p50/p99.
+
+Esempi:
+    python3 api_loadtest.py --requests 5000 --concurrency 16
+    python3 api_loadtest.py --url http://127.0.0.1:8765 --path "/api/prices?q=demolizione"
+"""
+
+__date__ = "2026-10-19"
+__version__ = "1.0.0"
+__author__ = "Gemini CLI"
+
+import time
+import argparse
+import threading
+import http.client
+from pathlib import Path
+from typing import List, Dict
+from urllib.parse import urlsplit
+
+from data_engine import DataManager
+from api_server import create_server, DEFAULT_WORKERS
+
+DEFAULT_PATHS = ["/api/prices?q=demolizione", "/api/prices", "/api/quotes", "/api/health"]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile (nearest-rank) su una lista già ordinata."""
+    if not values:
+        return 0.0
+    idx = min(len(values) - 1, max(0, int(round(pct / 100.0 * len(values))) - 1))
+    res = values[idx]
+    return res
+
+
+def run_load(host: str, port: int, paths: List[str], total: int, concurrency: int,
+             use_etag: bool, use_gzip: bool) -> Dict[str, float]:
+    """Esegue il carico e restituisce le metriche aggregate."""
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    lock = threading.Lock()
+    # Il resto della divisione va ai primi worker: partono esattamente total richieste
+    per_worker, extra = divmod(total, concurrency)
+
+    def worker(n: int) -> None:
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        etags: Dict[str, str] = {}
+        local_lat = []
+        local_status: Dict[int, int] = {}
+        for k in range(per_worker + (1 if n < extra else 0)):
+            path = paths[(n + k) % len(paths)]
+            headers = {}
+            if use_gzip:
+                headers["Accept-Encoding"] = "gzip"
+            if use_etag and path in etags:
+                headers["If-None-Match"] = etags[path]
+            t0 = time.perf_counter()
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            local_lat.append(time.perf_counter() - t0)
+            local_status[resp.status] = local_status.get(resp.status, 0) + 1
+            if resp.getheader("ETag"):
+                etags[path] = resp.getheader("ETag")
+        conn.close()
+        with lock:
+            latencies.extend(local_lat)
+            for s, c in local_status.items():
+                statuses[s] = statuses.get(s, 0) + c
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    res = {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] * 1000) if latencies else 0.0,
+    }
+    for s, c in sorted(statuses.items()):
+        res[f"http_{s}"] = c
+    return res
+
+
+def do_main() -> None:
+    parser = argparse.ArgumentParser(description="Load test dell'API HTTP locale")
+    parser.add_argument("--url", default="", help="server esistente (default: server interno su porta libera)")
+    parser.add_argument("--db", type=Path, default=None, help="database per il server interno")
+    parser.add_argument("--path", action="append", default=None, help="percorso da interrogare (ripetibile)")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="thread del server interno")
+    parser.add_argument("--no-etag", action="store_true", help="non inviare If-None-Match")
+    parser.add_argument("--no-gzip", action="store_true", help="non richiedere risposte compresse")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        server = create_server(DataManager(args.db, pooled=True), "127.0.0.1", 0, args.workers)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[0], server.server_address[1]
+
+    try:
+        m = run_load(host, port, args.path or DEFAULT_PATHS, args.requests, args.concurrency,
+                     not args.no_etag, not args.no_gzip)
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+
+    print(f"Richieste: {m['requests']} in {m['seconds']:.2f}s | {m['rps']:.0f} req/s")
+    print(f"Latenza: p50 {m['p50_ms']:.2f} ms | p99 {m['p99_ms']:.2f} ms | max {m['max_ms']:.2f} ms")
+    print("Esiti: " + ", ".join(f"{k[5:]}={v}" for k, v in m.items() if k.startswith("http_")))
+
+
+if __name__ == "__main__":
+    do_main()
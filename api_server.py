@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+API Server - Servizio HTTP/JSON locale (opzionale, senza GUI).
+
+Espone ricerca prezzi, gestione preventivi ed esportazione tramite
+http.server della Standard Library, appoggiandosi al DataManager:
+- pool di thread limitato (le richieste in eccesso attendono in accept);
+- una connessione SQLite riutilizzata per ciascun thread del pool;
+- ETag / If-None-Match sulle letture del prezzario;
+- risposte compresse gzip quando il client le accetta.
+
+Avvio:
+    python3 api_server.py --port 8765
+"""
+
+__date__ = "2026-10-19"
+__version__ = "1.0.0"
+__author__ = "Gemini CLI"
+
+import re
+import gzip
+import json
+import hashlib
+import argparse
+import threading
+import unicodedata
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, quote
+from typing import Any, Dict, Optional, Tuple
+
+from data_engine import DataManager, QuoteLineItem
+from export_engine import export_filename, render_quote_txt
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 8
+MAX_QUEUED_PER_WORKER = 4       # Richieste accettate in attesa per ciascun worker
+GZIP_MIN_BYTES = 1024           # Sotto questa soglia la compressione non conviene
+GZIP_LEVEL = 5
+MAX_BODY_BYTES = 1024 * 1024
+KEEPALIVE_TIMEOUT = 10          # Secondi di inattività prima di liberare il worker di una connessione
+DEFAULT_SEARCH_LIMIT = 200
+
+
+def _as_dict(obj: Any) -> Dict[str, Any]:
+    """
+    Campi di un modello dati (dataclass piatta) per la serializzazione JSON.
+
+    Copia superficiale di vars() al posto di dataclasses.asdict: asdict copia
+    ricorsivamente ogni campo e su un preventivo di migliaia di righe costa più
+    della query. La copia serve perché gli oggetti sono condivisi con la cache
+    dei preventivi: modificare il dizionario non deve alterarli.
+    """
+    res = dict(vars(obj))
+    return res
+
+
+def _content_disposition(filename: str) -> str:
+    """
+    Header Content-Disposition per un allegato con nome qualsiasi.
+
+    Gli header HTTP sono codificati latin-1: filename= riceve un nome ASCII
+    (accenti rimossi, altri caratteri sostituiti con "_"), filename*= il nome
+    originale in UTF-8 percent-encoded (RFC 5987).
+    """
+    ascii_name = unicodedata.normalize("NFKD", filename).encode("ascii", "ignore").decode("ascii")
+    ascii_name = re.sub(r'[^A-Za-z0-9._-]', "_", ascii_name) or "preventivo.txt"
+    res = f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename, safe='')}"
+    return res
+
+
+class ApiError(Exception):
+    """Errore applicativo con codice HTTP."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer che serve le connessioni con un ThreadPoolExecutor di dimensione fissa."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], db: DataManager, workers: int = DEFAULT_WORKERS):
+        super().__init__(address, ApiHandler)
+        self.db = db
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        self.slots = threading.BoundedSemaphore(workers * MAX_QUEUED_PER_WORKER)
+
+    def process_request(self, request, client_address) -> None:
+        # Contropressione: oltre la coda massima il ciclo di accept si ferma
+        self.slots.acquire()
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """Instradamento delle richieste REST verso il DataManager."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "PreventiviAPI/" + __version__
+    timeout = KEEPALIVE_TIMEOUT
+    disable_nagle_algorithm = True      # Intestazioni e corpo partono in scritture separate
+    verbose = False
+
+    ROUTES = [
+        ("GET", re.compile(r"^/api/health$"), "get_health"),
+        ("GET", re.compile(r"^/api/prices$"), "get_prices"),
+        ("GET", re.compile(r"^/api/prices/(?P<code>[^/]+)$"), "get_price"),
+        ("GET", re.compile(r"^/api/quotes$"), "get_quotes"),
+        ("POST", re.compile(r"^/api/quotes$"), "post_quote"),
+        ("GET", re.compile(r"^/api/quotes/(?P<quote_id>\d+)$"), "get_quote"),
+        ("DELETE", re.compile(r"^/api/quotes/(?P<quote_id>\d+)$"), "delete_quote"),
+        ("POST", re.compile(r"^/api/quotes/(?P<quote_id>\d+)/items$"), "post_item"),
+        ("DELETE", re.compile(r"^/api/quotes/(?P<quote_id>\d+)/items/(?P<item_id>\d+)$"), "delete_item"),
+        ("GET", re.compile(r"^/api/quotes/(?P<quote_id>\d+)/export$"), "get_export"),
+    ]
+
+    @property
+    def db(self) -> DataManager:
+        res = self.server.db
+        return res
+
+    # --- Infrastruttura ---
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str) -> None:
+        parts = urlsplit(self.path)
+        self.query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        self.body = b""
+        try:
+            # Il corpo si legge sempre prima dell'instradamento: con keep-alive un corpo
+            # non letto (es. POST su risorsa inesistente) verrebbe preso per la richiesta successiva
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                self.close_connection = True
+                raise ApiError(413, "richiesta troppo grande")
+            if length > 0:
+                self.body = self.rfile.read(length)
+            for m, pattern, name in self.ROUTES:
+                match = pattern.match(parts.path)
+                if match and m == method:
+                    getattr(self, name)(**match.groupdict())
+                    return
+            raise ApiError(404, f"risorsa non trovata: {method} {parts.path}")
+        except ApiError as e:
+            self._send_json({"error": e.message}, e.status)
+        except Exception as e:
+            self._send_json({"error": f"errore interno: {e}"}, 500)
+
+    def _read_json(self) -> Dict[str, Any]:
+        """Corpo della richiesta (già letto da _dispatch) come oggetto JSON."""
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body.decode("utf-8"))
+        except ValueError:
+            raise ApiError(400, "JSON non valido")
+        if not isinstance(data, dict):
+            raise ApiError(400, "atteso un oggetto JSON")
+        return data
+
+    def _send(self, body: bytes, status: int = 200, content_type: str = "application/json; charset=utf-8",
+              etag: Optional[str] = None, extra: Optional[Dict[str, str]] = None) -> None:
+        encoding = None
+        if len(body) >= GZIP_MIN_BYTES and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            body = gzip.compress(body, GZIP_LEVEL)
+            encoding = "gzip"
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        for k, v in (extra or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_json(self, data: Any, status: int = 200, etag: Optional[str] = None) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self._send(body, status, etag=etag)
+
+    def _not_modified(self, etag: str) -> bool:
+        """Risponde 304 se il client possiede già la rappresentazione corrente."""
+        candidates = [t.strip() for t in (self.headers.get("If-None-Match") or "").split(",")]
+        if etag not in candidates and "*" not in candidates:
+            return False
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        return True
+
+    def _price_etag(self, key: str) -> str:
+        """ETag derivato dalla revisione del prezzario e dai parametri della richiesta."""
+        digest = hashlib.sha1(f"{self.db.get_price_list_revision()}|{key}".encode("utf-8")).hexdigest()[:20]
+        res = f'"{digest}"'
+        return res
+
+    def _load_quote(self, quote_id: int) -> Tuple[Any, Any]:
+        header, items = self.db.get_quote_details(quote_id)
+        if not header:
+            raise ApiError(404, f"preventivo {quote_id} inesistente")
+        return header, items
+
+    # --- Endpoint ---
+
+    def get_health(self) -> None:
+        self._send_json({"status": "ok", "version": __version__, "stats": self.db.get_stats(),
+                         "quote_cache": self.db.get_cache_stats().as_dict()})
+
+    def get_prices(self) -> None:
+        q = self.query.get("q", "").strip()
+        try:
+            limit = max(1, int(self.query.get("limit", DEFAULT_SEARCH_LIMIT)))
+        except ValueError:
+            raise ApiError(400, "limit non valido")
+        etag = self._price_etag(f"search:{q}:{limit}")
+        if self._not_modified(etag):
+            return
+        items = self.db.search_price_items(q, limit) if q else self.db.get_all_price_items(limit)
+        count = len(items) if len(items) < limit else self.db.count_price_items(q)
+        self._send_json({"count": count, "items": [_as_dict(i) for i in items]}, etag=etag)
+
+    def get_price(self, code: str) -> None:
+        etag = self._price_etag(f"item:{code}")
+        if self._not_modified(etag):
+            return
+        item = self.db.get_price_item(code)
+        if not item:
+            raise ApiError(404, f"voce {code} inesistente")
+        self._send_json(_as_dict(item), etag=etag)
+
+    def get_quotes(self) -> None:
+        self._send_json([_as_dict(q) for q in self.db.get_quotes()])
+
+    def post_quote(self) -> None:
+        data = self._read_json()
+        customer = str(data.get("customer_name", "")).strip()
+        if not customer:
+            raise ApiError(400, "customer_name obbligatorio")
+        quote_id = self.db.create_quote(customer, str(data.get("notes", "")))
+        if not quote_id:
+            raise ApiError(500, "creazione preventivo fallita")
+        self._send_json({"id": quote_id}, 201)
+
+    def get_quote(self, quote_id: str) -> None:
+        header, items = self._load_quote(int(quote_id))
+        self._send_json({"header": _as_dict(header), "items": [_as_dict(i) for i in items]})
+
+    def delete_quote(self, quote_id: str) -> None:
+        self._load_quote(int(quote_id))
+        if not self.db.delete_quote(int(quote_id)):
+            raise ApiError(500, "eliminazione fallita")
+        self._send_json({"deleted": int(quote_id)})
+
+    def post_item(self, quote_id: str) -> None:
+        """
+        Aggiunge una riga. Con un codice di prezzario prezzo e descrizione vengono dal
+        listino corrente; altrimenti la riga è libera e richiede description e unit_price.
+        """
+        q_id = int(quote_id)
+        self._load_quote(q_id)
+        data = self._read_json()
+        try:
+            quantity = float(data.get("quantity", 1))
+        except (TypeError, ValueError):
+            raise ApiError(400, "quantity non valida")
+        code = str(data.get("code", "")).strip()
+
+        item = self.db.get_price_item(code) if code else None
+        if item:
+            line = QuoteLineItem(None, q_id, item.code, item.description, quantity, item.price,
+                                 item.price * quantity, item.unit, item.version_id)
+        else:
+            if not data.get("description") or "unit_price" not in data:
+                raise ApiError(400, "codice inesistente: servono description e unit_price per una riga libera")
+            try:
+                price = float(data["unit_price"])
+            except (TypeError, ValueError):
+                raise ApiError(400, "unit_price non valido")
+            line = QuoteLineItem(None, q_id, code, str(data["description"]), quantity, price,
+                                 price * quantity, str(data.get("unit", "")))
+        if not self.db.add_quote_item(line):
+            raise ApiError(500, "inserimento riga fallito")
+        header, items = self._load_quote(q_id)
+        self._send_json({"header": _as_dict(header), "items": [_as_dict(i) for i in items]}, 201)
+
+    def delete_item(self, quote_id: str, item_id: str) -> None:
+        q_id = int(quote_id)
+        header, items = self._load_quote(q_id)
+        if not any(i.id == int(item_id) for i in items):
+            raise ApiError(404, f"riga {item_id} inesistente nel preventivo {q_id}")
+        if not self.db.delete_quote_item(int(item_id), q_id):
+            raise ApiError(500, "eliminazione riga fallita")
+        self._send_json({"deleted": int(item_id)})
+
+    def get_export(self, quote_id: str) -> None:
+        header, items = self._load_quote(int(quote_id))
+        body = render_quote_txt(header, items).encode("utf-8")
+        self._send(body, content_type="text/plain; charset=utf-8",
+                   extra={"Content-Disposition": _content_disposition(export_filename(header))})
+
+
+def create_server(db: DataManager, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                  workers: int = DEFAULT_WORKERS) -> PooledHTTPServer:
+    """Crea il server (porta 0 = porta libera scelta dal sistema)."""
+    server = PooledHTTPServer((host, port), db, workers)
+    return server
+
+
+def do_main() -> None:
+    parser = argparse.ArgumentParser(description="API HTTP/JSON locale di Preventivi Manager")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--db", type=Path, default=None, help="percorso del database (default: data/computa_ai.db)")
+    parser.add_argument("--verbose", action="store_true", help="registra ogni richiesta su stderr")
+    args = parser.parse_args()
+
+    ApiHandler.verbose = args.verbose
+    db = DataManager(args.db, pooled=True)
+    server = create_server(db, args.host, args.port, args.workers)
+    print(f"API in ascolto su http://{args.host}:{server.server_address[1]}/api (workers: {args.workers})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    do_main()
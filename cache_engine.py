@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache Engine - Cache LRU in memoria con budget in byte.
+
+Cache generica e thread-safe usata dal DataManager per il dettaglio dei
+preventivi: le voci meno usate di recente vengono scartate quando la
+dimensione stimata supera il budget. Tiene le statistiche (hit, miss,
+scarti, invalidazioni, prefetch) esposte nella scheda SISTEMA e
+nell'endpoint di salute dell'API.
+"""
+
+__date__ = "2026-10-19"
+__version__ = "1.0.0"
+__author__ = "Gemini CLI"
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from dataclasses import dataclass, asdict
+
+
+@dataclass
+class CacheStats:
+    """Istantanea delle statistiche di una cache."""
+    entries: int
+    size_bytes: int
+    budget_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    prefetched: int
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        res = self.hits / total if total else 0.0
+        return res
+
+    def as_dict(self) -> Dict[str, Any]:
+        res = asdict(self)
+        res["hit_ratio"] = round(self.hit_ratio, 4)
+        return res
+
+    def summary(self) -> str:
+        """Riga leggibile per il registro della scheda SISTEMA."""
+        res = (f"{self.entries} voci | {self.size_bytes / 1024:.0f} / {self.budget_bytes / 1024:.0f} KB | "
+               f"hit {self.hits} miss {self.misses} ({self.hit_ratio:.0%}) | scartate {self.evictions} | "
+               f"invalidate {self.invalidations} | prefetch {self.prefetched}")
+        return res
+
+
+class LRUCache:
+    """
+    Cache LRU con budget di memoria stimato.
+
+    La dimensione di ciascuna voce è calcolata una sola volta, all'inserimento,
+    dalla funzione sizeof. Una voce più grande dell'intero budget non viene
+    memorizzata.
+    """
+
+    def __init__(self, budget_bytes: int, sizeof: Callable[[Any], int]):
+        self.budget_bytes = budget_bytes
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._prefetched = 0
+
+    def get(self, key: Hashable, count: bool = True) -> Optional[Any]:
+        """Valore in cache (segnato come usato di recente) o None."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                if count:
+                    self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            if count:
+                self._hits += 1
+            res = entry[0]
+        return res
+
+    def record(self, hit: bool) -> None:
+        """Conta un accesso deciso dal chiamante (es. get con count=False seguito da una validazione)."""
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def peek(self, key: Hashable) -> bool:
+        """True se la chiave è in cache, senza alterare ordine e statistiche."""
+        with self._lock:
+            res = key in self._data
+        return res
+
+    def put(self, key: Hashable, value: Any, prefetched: bool = False) -> None:
+        """Inserisce o sostituisce una voce, scartando le meno recenti oltre il budget."""
+        size = self._sizeof(value)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            if size > self.budget_bytes:
+                return
+            self._data[key] = (value, size)
+            self._size += size
+            if prefetched:
+                self._prefetched += 1
+            while self._size > self.budget_bytes:
+                _, (_, old_size) = self._data.popitem(last=False)
+                self._size -= old_size
+                self._evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self._size -= entry[1]
+                self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidations += len(self._data)
+            self._data.clear()
+            self._size = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            res = CacheStats(len(self._data), self._size, self.budget_bytes, self._hits, self._misses,
+                             self._evictions, self._invalidations, self._prefetched)
+        return res
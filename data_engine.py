@@ -12,14 +12,34 @@ __date__ = "2026-02-21"
 __version__ = "1.0.0"
 __author__ = "Gemini CLI"
 
+import os
+import time
 import sqlite3
-import csv
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Optional, Any, Tuple
+from typing import List, Dict, Iterator, Optional, Any, Tuple
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
+
+import report_engine
+import import_engine
+import similarity_engine
+import sync_engine
+from report_engine import QuoteReport
+from similarity_engine import SimilarItem, DedupReport
+from sync_engine import SyncResult
+from import_engine import ImportReport, FileImportStat, ColumnMapping
+from cache_engine import LRUCache, CacheStats
 
 DB_FILENAME = "computa_ai.db"
+ARCHIVE_SUFFIX = "_archive"           # computa_ai.db -> computa_ai_archive.db
+DEFAULT_ARCHIVE_AGE_DAYS = 730        # Preventivi più vecchi di 2 anni
+ARCHIVE_BATCH_SIZE = 500              # Preventivi spostati per transazione
+IMPORT_BATCH_SIZE = 5000              # Righe per executemany durante l'import
+IMPORT_CACHE_KB = 65536               # Cache di pagina della connessione di import (indice UNIQUE su code)
+QUOTE_CACHE_BYTES = 32 * 1024 * 1024  # Budget della cache del dettaglio preventivi
 
 # --- Modelli Dati (Semplificati per compatibilità con Tkinter) ---
 
@@ -32,6 +52,7 @@ class PriceItem:
     unit: str
     price: float
     category: str
+    version_id: Optional[int] = None
 
 @dataclass
 class QuoteHeader:
@@ -53,17 +74,82 @@ class QuoteLineItem:
     unit_price: float
     total_price: float
     unit: str
+    version_id: Optional[int] = None
+
+@dataclass
+class PriceListVersion:
+    """Modello per una versione (immutabile) del prezzario."""
+    id: int
+    label: str
+    source: str
+    date_created: str
+    item_count: int
+
+@dataclass
+class QuoteTemplate:
+    """Modello per un modello (template) di preventivo riutilizzabile."""
+    id: int
+    name: str
+    notes: str
+    date_created: str
+    line_count: int
+
+
+# Espressioni di copia righe usate da duplicazione e modelli (alias sorgente "s").
+# Con riprezzatura la riga punta alla versione corrente del prezzario, se il codice esiste ancora.
+_LINE_COPY_COLUMNS = "s.item_code, s.description, s.quantity, s.unit_price, s.unit, s.version_id"
+_LINE_REPRICE_COLUMNS = """
+    s.item_code,
+    CASE WHEN p.version_id IS NULL THEN s.description ELSE NULL END,
+    s.quantity,
+    COALESCE(p.price, s.unit_price),
+    CASE WHEN p.version_id IS NULL THEN s.unit ELSE NULL END,
+    COALESCE(p.version_id, s.version_id)
+"""
+_LINE_REPRICE_JOIN = "LEFT JOIN price_list p ON p.code = s.item_code"
+
+
+@dataclass
+class _CachedQuote:
+    """Dettaglio di un preventivo in cache, con la firma usata per rivalidarlo."""
+    header: QuoteHeader
+    items: List[QuoteLineItem]
+    signature: Tuple[Any, ...]
+    data_version: int
+
+
+def _cached_quote_size(entry: _CachedQuote) -> int:
+    """Stima (byte) della memoria occupata da un preventivo in cache: oggetti più testi."""
+    res = 600 + sum(450 + len(i.description or "") + len(i.item_code or "") + len(i.unit or "") for i in entry.items)
+    return res
+
+
+class _PooledConnection(sqlite3.Connection):
+    """
+    Connessione riutilizzata dallo stesso thread.
+    
+    close() non chiude: annulla l'eventuale transazione rimasta aperta e
+    restituisce la connessione al pool del thread.
+    """
+    
+    def close(self) -> None:
+        self.rollback()
+        
+    def really_close(self) -> None:
+        super().close()
 
 
 class DataManager:
     """Gestore centrale delle operazioni su database."""
 
-    def __init__(self, db_path: Optional[Path] = None):
+    def __init__(self, db_path: Optional[Path] = None, pooled: bool = False):
         """
         Inizializza il DataManager.
         
         Args:
             db_path: Percorso del file database. Se None, usa il locale in data/.
+            pooled: Se True, ogni thread riusa una propria connessione
+                (servizi multi-thread come l'API HTTP) invece di aprirne una per operazione.
         """
         if db_path is None:
             # Crea il DB nella cartella data/ all'interno di prv/
@@ -75,10 +161,28 @@ class DataManager:
         else:
             self.db_path = db_path
             
+        db_file = Path(self.db_path)
+        self.archive_path = db_file.with_name(f"{db_file.stem}{ARCHIVE_SUFFIX}{db_file.suffix}")
+        self.pooled = pooled
+        self._local = threading.local()
+        
+        # Cache del dettaglio preventivi, valida finché PRAGMA data_version non cambia
+        self.quote_cache = LRUCache(QUOTE_CACHE_BYTES, _cached_quote_size)
+        self._watch_conn: Optional[sqlite3.Connection] = None
+        self._watch_lock = threading.Lock()
+            
         self._init_db()
 
     def _get_connection(self) -> sqlite3.Connection:
-        """Ottiene una connessione al DB con row factory."""
+        """Ottiene una connessione al DB con row factory (per thread, se in modalità pooled)."""
+        if self.pooled:
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = sqlite3.connect(self.db_path, factory=_PooledConnection, timeout=30)
+                conn.row_factory = sqlite3.Row
+                self._local.conn = conn
+            return conn
+            
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
         return conn
@@ -88,6 +192,14 @@ class DataManager:
         conn = self._get_connection()
         cursor = conn.cursor()
         
+        # Solo per DB nuovi: consente la compattazione incrementale (vedi maintenance_engine)
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        
+        # L'archivio serve solo se esiste già (ricalcolo report con lo storico completo)
+        has_archive = self.archive_path.exists()
+        if has_archive:
+            self._attach_archive(cursor)
+        
         # Tabella Prezzario
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS price_list (
@@ -126,9 +238,155 @@ class DataManager:
             )
         """)
         
+        # Versioni del prezzario (una per import o modifica manuale)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS price_list_versions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                label TEXT NOT NULL,
+                source TEXT,
+                date_created TEXT NOT NULL
+            )
+        """)
+        
+        # Descrizioni deduplicate, condivise tra le versioni
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS price_descriptions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                text TEXT UNIQUE NOT NULL
+            )
+        """)
+        
+        # Storico immutabile: una riga per (versione, codice)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS price_history (
+                version_id INTEGER NOT NULL,
+                code TEXT NOT NULL,
+                description_id INTEGER NOT NULL,
+                unit TEXT NOT NULL,
+                price REAL NOT NULL,
+                category TEXT,
+                PRIMARY KEY (version_id, code),
+                FOREIGN KEY (version_id) REFERENCES price_list_versions (id),
+                FOREIGN KEY (description_id) REFERENCES price_descriptions (id)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS price_history_no_update
+            BEFORE UPDATE ON price_history
+            BEGIN SELECT RAISE(ABORT, 'price_history è immutabile'); END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS price_history_no_delete
+            BEFORE DELETE ON price_history
+            BEGIN SELECT RAISE(ABORT, 'price_history è immutabile'); END
+        """)
+        
+        # Modelli di preventivo
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS quote_templates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL,
+                notes TEXT,
+                date_created TEXT NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS quote_template_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                template_id INTEGER NOT NULL,
+                item_code TEXT,
+                description TEXT,
+                quantity REAL NOT NULL,
+                unit_price REAL NOT NULL,
+                unit TEXT,
+                version_id INTEGER,
+                FOREIGN KEY (template_id) REFERENCES quote_templates (id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_template_items_template ON quote_template_items (template_id)")
+        
+        # Migrazione DB esistenti: riferimenti alla versione
+        self._ensure_column(cursor, "price_list", "version_id", "INTEGER")
+        self._ensure_column(cursor, "quote_items", "version_id", "INTEGER")
+        # Identità stabili tra database diversi (sincronizzazione)
+        self._ensure_column(cursor, "quotes", "uid", "TEXT")
+        self._ensure_column(cursor, "quote_items", "uid", "TEXT")
+        # Contatore delle modifiche alle righe (firma della cache del dettaglio, anche tra processi)
+        self._ensure_column(cursor, "quotes", "rev", "INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_quote_rev_insert AFTER INSERT ON quote_items
+            BEGIN UPDATE quotes SET rev = rev + 1 WHERE id = NEW.quote_id; END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_quote_rev_update AFTER UPDATE ON quote_items
+            BEGIN UPDATE quotes SET rev = rev + 1 WHERE id IN (OLD.quote_id, NEW.quote_id); END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_quote_rev_delete AFTER DELETE ON quote_items
+            BEGIN UPDATE quotes SET rev = rev + 1 WHERE id = OLD.quote_id; END
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_quote_items_quote ON quote_items (quote_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_quotes_date ON quotes (date_created)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_price_list_version ON price_list (version_id)")
+        
+        # Le voci preesistenti confluiscono in una versione iniziale
+        self._snapshot_pending(cursor, "Versione iniziale", "migrazione")
+        
+        # Aggregati per i report (mantenuti da trigger)
+        report_engine.init_report_schema(cursor, has_archive)
+        
+        # Indice di somiglianza delle descrizioni (voci duplicate)
+        similarity_engine.init_similarity_schema(cursor)
+        
+        # Registro delle modifiche per la sincronizzazione tra database
+        sync_engine.init_sync_schema(cursor)
+        
         conn.commit()
         conn.close()
 
+    def _ensure_column(self, cursor: sqlite3.Cursor, table: str, column: str, decl: str) -> None:
+        """Aggiunge una colonna a una tabella esistente se manca."""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = [r[1] for r in cursor.fetchall()]
+        if column in existing:
+            return
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+    def _snapshot_pending(self, cursor: sqlite3.Cursor, label: str, source: str = "") -> Optional[int]:
+        """
+        Congela in una nuova versione tutte le voci del prezzario non ancora versionate.
+        
+        Le voci con version_id NULL (nuove o modificate) vengono copiate in
+        price_history, con la descrizione deduplicata in price_descriptions.
+        
+        Returns:
+            ID della nuova versione, None se non c'era nulla da congelare.
+        """
+        cursor.execute("SELECT 1 FROM price_list WHERE version_id IS NULL LIMIT 1")
+        if not cursor.fetchone():
+            return None
+            
+        date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cursor.execute("""
+            INSERT INTO price_list_versions (label, source, date_created)
+            VALUES (?, ?, ?)
+        """, (label, source, date_str))
+        version_id = cursor.lastrowid
+        
+        cursor.execute("""
+            INSERT OR IGNORE INTO price_descriptions (text)
+            SELECT description FROM price_list WHERE version_id IS NULL
+        """)
+        cursor.execute("""
+            INSERT INTO price_history (version_id, code, description_id, unit, price, category)
+            SELECT ?, p.code, d.id, p.unit, p.price, p.category
+            FROM price_list p JOIN price_descriptions d ON d.text = p.description
+            WHERE p.version_id IS NULL
+        """, (version_id,))
+        cursor.execute("UPDATE price_list SET version_id = ? WHERE version_id IS NULL", (version_id,))
+        
+        return version_id
+
     # --- CRUD PREZZARIO ---
 
     def add_price_item(self, item: PriceItem) -> bool:
@@ -142,6 +400,8 @@ class DataManager:
                 INSERT INTO price_list (code, description, unit, price, category)
                 VALUES (?, ?, ?, ?, ?)
             """, (item.code, item.description, item.unit, item.price, item.category))
+            self._snapshot_pending(cursor, f"Inserimento {item.code}", "manuale")
+            similarity_engine.index_pending(cursor)
             conn.commit()
             success = True
         except sqlite3.IntegrityError:
@@ -156,7 +416,7 @@ class DataManager:
         return success
 
     def update_price_item(self, item: PriceItem) -> bool:
-        """Aggiorna una voce esistente."""
+        """Aggiorna una voce esistente (nessuna nuova versione se i dati non cambiano)."""
         conn = self._get_connection()
         cursor = conn.cursor()
         success = False
@@ -164,9 +424,13 @@ class DataManager:
         try:
             cursor.execute("""
                 UPDATE price_list 
-                SET description=?, unit=?, price=?, category=?
-                WHERE code=?
-            """, (item.description, item.unit, item.price, item.category, item.code))
+                SET description=?, unit=?, price=?, category=?, version_id=NULL
+                WHERE code=? AND (description IS NOT ? OR unit IS NOT ? OR price IS NOT ? OR category IS NOT ?)
+            """, (item.description, item.unit, item.price, item.category, item.code,
+                  item.description, item.unit, item.price, item.category))
+            if cursor.rowcount:
+                self._snapshot_pending(cursor, f"Modifica {item.code}", "manuale")
+                similarity_engine.index_pending(cursor)
             conn.commit()
             success = True
         except Exception as e:
@@ -201,6 +465,8 @@ class DataManager:
         cursor = conn.cursor()
         success = False
         try:
+            # Svuotata in blocco: i trigger per riga non trovano più nulla da eliminare
+            cursor.execute("DELETE FROM sim_signatures")
             cursor.execute("DELETE FROM price_list")
             conn.commit()
             success = True
@@ -211,14 +477,14 @@ class DataManager:
             conn.close()
         return success
 
-    def get_all_price_items(self) -> List[PriceItem]:
-        """Restituisce tutte le voci del prezzario."""
+    def get_all_price_items(self, limit: Optional[int] = None) -> List[PriceItem]:
+        """Restituisce le voci del prezzario (tutte, o le prime limit)."""
         conn = self._get_connection()
         cursor = conn.cursor()
         items = []
         
         try:
-            cursor.execute("SELECT * FROM price_list ORDER BY category, code")
+            cursor.execute("SELECT * FROM price_list ORDER BY category, code LIMIT ?", (-1 if limit is None else limit,))
             rows = cursor.fetchall()
             for row in rows:
                 item = PriceItem(
@@ -227,7 +493,8 @@ class DataManager:
                     description=row['description'],
                     unit=row['unit'],
                     price=row['price'],
-                    category=row['category']
+                    category=row['category'],
+                    version_id=row['version_id']
                 )
                 items.append(item)
         except Exception as e:
@@ -238,8 +505,8 @@ class DataManager:
             
         return items
     
-    def search_price_items(self, query: str) -> List[PriceItem]:
-        """Cerca voci per codice o descrizione."""
+    def search_price_items(self, query: str, limit: Optional[int] = None) -> List[PriceItem]:
+        """Cerca voci per codice o descrizione (tutte, o le prime limit)."""
         conn = self._get_connection()
         cursor = conn.cursor()
         items = []
@@ -250,7 +517,8 @@ class DataManager:
                 SELECT * FROM price_list 
                 WHERE code LIKE ? OR description LIKE ? OR category LIKE ?
                 ORDER BY code
-            """, (search_term, search_term, search_term))
+                LIMIT ?
+            """, (search_term, search_term, search_term, -1 if limit is None else limit))
             
             rows = cursor.fetchall()
             for row in rows:
@@ -260,7 +528,8 @@ class DataManager:
                     description=row['description'],
                     unit=row['unit'],
                     price=row['price'],
-                    category=row['category']
+                    category=row['category'],
+                    version_id=row['version_id']
                 )
                 items.append(item)
         finally:
@@ -268,6 +537,79 @@ class DataManager:
             
         return items
 
+    def count_price_items(self, query: str = "") -> int:
+        """Numero di voci del prezzario, o di quelle trovate da search_price_items(query)."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        count = 0
+        search_term = f"%{query}%"
+        
+        try:
+            if query:
+                cursor.execute("""
+                    SELECT COUNT(*) FROM price_list
+                    WHERE code LIKE ? OR description LIKE ? OR category LIKE ?
+                """, (search_term, search_term, search_term))
+            else:
+                cursor.execute("SELECT COUNT(*) FROM price_list")
+            count = cursor.fetchone()[0]
+        except Exception as e:
+            print(f"ERRORE DB Select: {e}")
+        finally:
+            conn.close()
+            
+        return count
+
+    def get_price_item(self, code: str) -> Optional[PriceItem]:
+        """Restituisce una voce del prezzario per codice."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        item = None
+        
+        try:
+            cursor.execute("SELECT * FROM price_list WHERE code = ?", (code,))
+            row = cursor.fetchone()
+            if row:
+                item = PriceItem(
+                    id=row['id'],
+                    code=row['code'],
+                    description=row['description'],
+                    unit=row['unit'],
+                    price=row['price'],
+                    category=row['category'],
+                    version_id=row['version_id']
+                )
+        except Exception as e:
+            print(f"ERRORE DB Get Price Item: {e}")
+            item = None
+        finally:
+            conn.close()
+            
+        return item
+
+    def get_price_list_revision(self) -> str:
+        """
+        Identificativo dello stato corrente del prezzario (per cache/ETag).
+        
+        Ogni inserimento, modifica o import crea una nuova versione; le
+        cancellazioni cambiano il numero di voci.
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        revision = ""
+        
+        try:
+            cursor.execute("SELECT COALESCE(MAX(version_id), 0), COUNT(*) FROM price_list")
+            row = cursor.fetchone()
+            revision = f"{row[0]}-{row[1]}"
+        except Exception as e:
+            print(f"ERRORE DB Revision: {e}")
+            revision = ""
+        finally:
+            conn.close()
+            
+        return revision
+
     # --- CRUD PREVENTIVI ---
 
     def create_quote(self, customer_name: str, notes: str = "") -> Optional[int]:
@@ -293,18 +635,29 @@ class DataManager:
         return quote_id
         
     def add_quote_item(self, line_item: QuoteLineItem) -> bool:
-        """Aggiunge una riga al preventivo e ricalcola il totale."""
+        """
+        Aggiunge una riga al preventivo e ricalcola il totale.
+        
+        Se la riga indica una versione del prezzario, descrizione e unità non
+        vengono copiate: la riga punta alla voce immutabile (versione, codice).
+        """
         conn = self._get_connection()
         cursor = conn.cursor()
         success = False
         
+        description = line_item.description
+        unit = line_item.unit
+        if line_item.version_id is not None:
+            description = None
+            unit = None
+        
         try:
             # 1. Inserisci riga
             cursor.execute("""
-                INSERT INTO quote_items (quote_id, item_code, description, quantity, unit_price, total_price, unit)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (line_item.quote_id, line_item.item_code, line_item.description, 
-                  line_item.quantity, line_item.unit_price, line_item.total_price, line_item.unit))
+                INSERT INTO quote_items (quote_id, item_code, description, quantity, unit_price, total_price, unit, version_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (line_item.quote_id, line_item.item_code, description, 
+                  line_item.quantity, line_item.unit_price, line_item.total_price, unit, line_item.version_id))
             
             # 2. Aggiorna totale testata
             cursor.execute("""
@@ -320,6 +673,7 @@ class DataManager:
             success = False
         finally:
             conn.close()
+            self.quote_cache.invalidate(line_item.quote_id)
             
         return success
         
@@ -346,8 +700,103 @@ class DataManager:
             
         return quotes
         
+    def _data_version(self) -> int:
+        """
+        PRAGMA data_version su una connessione dedicata e sempre aperta.
+        
+        Il valore cambia a ogni commit di qualunque altra connessione, anche di
+        altri processi (es. l'API HTTP sullo stesso database).
+        """
+        with self._watch_lock:
+            if self._watch_conn is None:
+                self._watch_conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            version = self._watch_conn.execute("PRAGMA data_version").fetchone()[0]
+        return version
+
+    @staticmethod
+    def _quote_signature(header: QuoteHeader, rev: int) -> Tuple[Any, ...]:
+        """
+        Firma di un preventivo: testata e contatore rev, incrementato da trigger
+        a ogni inserimento, modifica o eliminazione di una sua riga.
+        """
+        res = (header.customer_name, header.date_created, header.total_amount, header.notes, rev)
+        return res
+
+    def _read_quote_signature(self, quote_id: int) -> Optional[Tuple[Any, ...]]:
+        """Firma corrente di un preventivo letta dal DB (lettura della sola testata)."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        signature = None
+        
+        try:
+            cursor.execute("SELECT * FROM quotes WHERE id = ?", (quote_id,))
+            row = cursor.fetchone()
+            if row:
+                header = QuoteHeader(id=row['id'], customer_name=row['customer_name'], date_created=row['date_created'],
+                                     total_amount=row['total_amount'], notes=row['notes'])
+                signature = self._quote_signature(header, row['rev'])
+        except Exception as e:
+            print(f"ERRORE DB Quote Signature: {e}")
+            signature = None
+        finally:
+            conn.close()
+            
+        return signature
+
     def get_quote_details(self, quote_id: int) -> Tuple[Optional[QuoteHeader], List[QuoteLineItem]]:
-        """Restituisce testata e righe di un preventivo."""
+        """
+        Restituisce testata e righe di un preventivo, dalla cache LRU se possibile.
+        
+        Una voce in cache è valida senza accedere al DB finché PRAGMA data_version
+        non cambia; dopo un commit (di questo o di altri processi) viene confrontata
+        con la firma corrente del preventivo. Gli oggetti restituiti sono condivisi
+        con la cache e non vanno modificati.
+        """
+        version = self._data_version()
+        cached = self.quote_cache.get(quote_id, count=False)
+        if cached is not None:
+            if cached.data_version == version or self._read_quote_signature(quote_id) == cached.signature:
+                cached.data_version = version
+                self.quote_cache.record(hit=True)
+                items = list(cached.items)
+                return cached.header, items
+            self.quote_cache.invalidate(quote_id)
+        self.quote_cache.record(hit=False)
+        
+        header, items = self._load_quote_details(quote_id, version)
+        return header, items
+
+    def prefetch_quote_details(self, quote_ids: List[int]) -> int:
+        """
+        Carica in cache i preventivi indicati non ancora presenti (es. i vicini
+        nella lista della GUI), senza contarli come accessi.
+        
+        Returns:
+            Numero di preventivi caricati.
+        """
+        loaded = 0
+        for quote_id in quote_ids:
+            if self.quote_cache.peek(quote_id):
+                continue
+            header, _ = self._load_quote_details(quote_id, self._data_version(), prefetched=True)
+            if header:
+                loaded += 1
+        return loaded
+
+    def get_cache_stats(self) -> CacheStats:
+        """Statistiche della cache del dettaglio preventivi."""
+        stats = self.quote_cache.stats()
+        return stats
+
+    def _load_quote_details(self, quote_id: int, version: int,
+                            prefetched: bool = False) -> Tuple[Optional[QuoteHeader], List[QuoteLineItem]]:
+        """
+        Legge testata e righe di un preventivo dal DB e le memorizza in cache.
+        
+        Args:
+            version: data_version letto prima della lettura (mai dopo: un commit
+                intermedio renderebbe la voce valida ma superata).
+        """
         conn = self._get_connection()
         cursor = conn.cursor()
         header = None
@@ -365,9 +814,21 @@ class DataManager:
                     total_amount=row['total_amount'],
                     notes=row['notes']
                 )
+                # Letto prima delle righe: una modifica intermedia lascia la firma superata, mai valida
+                rev = row['rev']
                 
-                # Recupera Righe
-                cursor.execute("SELECT * FROM quote_items WHERE quote_id = ?", (quote_id,))
+                # Recupera Righe (testo dallo storico se la riga è versionata)
+                cursor.execute("""
+                    SELECT qi.id, qi.quote_id, qi.item_code,
+                           COALESCE(qi.description, d.text, '') AS description,
+                           qi.quantity, qi.unit_price, qi.total_price,
+                           COALESCE(qi.unit, h.unit, '') AS unit, qi.version_id
+                    FROM quote_items qi
+                    LEFT JOIN price_history h ON h.version_id = qi.version_id AND h.code = qi.item_code
+                    LEFT JOIN price_descriptions d ON d.id = h.description_id
+                    WHERE qi.quote_id = ?
+                    ORDER BY qi.id
+                """, (quote_id,))
                 rows_items = cursor.fetchall()
                 for ri in rows_items:
                     item = QuoteLineItem(
@@ -378,7 +839,8 @@ class DataManager:
                         quantity=ri['quantity'],
                         unit_price=ri['unit_price'],
                         total_price=ri['total_price'],
-                        unit=ri['unit']
+                        unit=ri['unit'],
+                        version_id=ri['version_id']
                     )
                     items.append(item)
                     
@@ -389,8 +851,51 @@ class DataManager:
         finally:
             conn.close()
             
+        if header:
+            signature = self._quote_signature(header, rev)
+            self.quote_cache.put(quote_id, _CachedQuote(header, items, signature, version), prefetched=prefetched)
+        items = list(items)
         return header, items
 
+    def iter_all_quote_details(self) -> Iterator[Tuple[QuoteHeader, List[QuoteLineItem]]]:
+        """
+        Tutti i preventivi con le loro righe, in ordine di id, da due sole query.
+        
+        Per le scansioni in blocco (es. esportazioni da aggiornare): non passa
+        dalla cache del dettaglio, così non ne scalza i preventivi in uso e non
+        ne altera le statistiche. La connessione resta aperta fino a fine iterazione.
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        item_cursor = conn.cursor()
+        
+        try:
+            cursor.execute("SELECT id, customer_name, date_created, total_amount, notes FROM quotes ORDER BY id")
+            item_cursor.execute("""
+                SELECT qi.id, qi.quote_id, qi.item_code,
+                       COALESCE(qi.description, d.text, '') AS description,
+                       qi.quantity, qi.unit_price, qi.total_price,
+                       COALESCE(qi.unit, h.unit, '') AS unit, qi.version_id
+                FROM quote_items qi
+                LEFT JOIN price_history h ON h.version_id = qi.version_id AND h.code = qi.item_code
+                LEFT JOIN price_descriptions d ON d.id = h.description_id
+                ORDER BY qi.quote_id, qi.id
+            """)
+            # Fusione delle due sequenze ordinate per id preventivo
+            pending = item_cursor.fetchone()
+            for row in cursor:
+                header = QuoteHeader(row['id'], row['customer_name'], row['date_created'], row['total_amount'], row['notes'])
+                items = []
+                while pending is not None and pending['quote_id'] <= header.id:
+                    if pending['quote_id'] == header.id:
+                        items.append(QuoteLineItem(*pending))
+                    pending = item_cursor.fetchone()
+                yield header, items
+        except Exception as e:
+            print(f"ERRORE DB Iter Quote Details: {e}")
+        finally:
+            conn.close()
+
     def delete_quote(self, quote_id: int) -> bool:
         """Elimina un preventivo e le sue righe (CASCADE gestito da DB o manuale)."""
         conn = self._get_connection()
@@ -408,6 +913,7 @@ class DataManager:
             success = False
         finally:
             conn.close()
+            self.quote_cache.invalidate(quote_id)
             
         return success
         
@@ -434,9 +940,215 @@ class DataManager:
             success = False
         finally:
             conn.close()
+            self.quote_cache.invalidate(quote_id)
             
         return success
 
+    # --- DUPLICAZIONE E MODELLI ---
+
+    def _copy_lines_into_quote(self, cursor: sqlite3.Cursor, quote_id: int, source_table: str,
+                               source_key: str, source_id: int, reprice: bool) -> None:
+        """
+        Copia righe da una tabella sorgente in un preventivo con un unico INSERT ... SELECT
+        e aggiorna il totale della testata con un solo UPDATE.
+        """
+        columns = _LINE_COPY_COLUMNS
+        price_expr = "s.unit_price"
+        join = ""
+        if reprice:
+            columns = _LINE_REPRICE_COLUMNS
+            price_expr = "COALESCE(p.price, s.unit_price)"
+            join = _LINE_REPRICE_JOIN
+            
+        cursor.execute(f"""
+            INSERT INTO quote_items (quote_id, item_code, description, quantity, unit_price, unit, version_id, total_price)
+            SELECT ?, {columns}, s.quantity * {price_expr}
+            FROM {source_table} s {join}
+            WHERE s.{source_key} = ?
+            ORDER BY s.id
+        """, (quote_id, source_id))
+        
+        cursor.execute("""
+            UPDATE quotes 
+            SET total_amount = COALESCE((SELECT SUM(total_price) FROM quote_items WHERE quote_id = ?), 0)
+            WHERE id = ?
+        """, (quote_id, quote_id))
+
+    def clone_quote(self, quote_id: int, new_customer: str, reprice: bool = False) -> Optional[int]:
+        """
+        Duplica un preventivo (testata e righe) per un nuovo cliente.
+        
+        Args:
+            quote_id: Preventivo sorgente.
+            new_customer: Nome del cliente del nuovo preventivo.
+            reprice: Se True, i prezzi vengono aggiornati al prezzario corrente.
+            
+        Returns:
+            ID del nuovo preventivo, None in caso di errore.
+        """
+        if not new_customer:
+            return None
+            
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        new_id = None
+        
+        try:
+            date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cursor.execute("""
+                INSERT INTO quotes (customer_name, date_created, total_amount, notes)
+                SELECT ?, ?, 0.0, notes FROM quotes WHERE id = ?
+            """, (new_customer, date_str, quote_id))
+            if cursor.rowcount == 0:
+                raise ValueError(f"preventivo {quote_id} inesistente")
+            new_id = cursor.lastrowid
+            
+            self._copy_lines_into_quote(cursor, new_id, "quote_items", "quote_id", quote_id, reprice)
+            conn.commit()
+        except Exception as e:
+            print(f"ERRORE DB Clone Quote: {e}")
+            conn.rollback()
+            new_id = None
+        finally:
+            conn.close()
+            
+        return new_id
+
+    def save_quote_as_template(self, quote_id: int, name: str) -> Optional[int]:
+        """Salva le righe di un preventivo come modello riutilizzabile."""
+        if not name:
+            return None
+            
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        template_id = None
+        
+        try:
+            date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cursor.execute("""
+                INSERT INTO quote_templates (name, notes, date_created)
+                SELECT ?, notes, ? FROM quotes WHERE id = ?
+            """, (name, date_str, quote_id))
+            if cursor.rowcount == 0:
+                raise ValueError(f"preventivo {quote_id} inesistente")
+            template_id = cursor.lastrowid
+            
+            cursor.execute(f"""
+                INSERT INTO quote_template_items (template_id, item_code, description, quantity, unit_price, unit, version_id)
+                SELECT ?, {_LINE_COPY_COLUMNS}
+                FROM quote_items s
+                WHERE s.quote_id = ?
+                ORDER BY s.id
+            """, (template_id, quote_id))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            print(f"ERRORE: Modello {name} già esistente.")
+            conn.rollback()
+            template_id = None
+        except Exception as e:
+            print(f"ERRORE DB Save Template: {e}")
+            conn.rollback()
+            template_id = None
+        finally:
+            conn.close()
+            
+        return template_id
+
+    def get_quote_templates(self) -> List[QuoteTemplate]:
+        """Restituisce i modelli di preventivo in ordine alfabetico."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        templates = []
+        
+        try:
+            cursor.execute("""
+                SELECT t.id, t.name, t.notes, t.date_created,
+                       (SELECT COUNT(*) FROM quote_template_items i WHERE i.template_id = t.id) AS line_count
+                FROM quote_templates t
+                ORDER BY t.name
+            """)
+            for row in cursor.fetchall():
+                templates.append(QuoteTemplate(
+                    id=row['id'],
+                    name=row['name'],
+                    notes=row['notes'] or "",
+                    date_created=row['date_created'],
+                    line_count=row['line_count']
+                ))
+        except Exception as e:
+            print(f"ERRORE DB Templates: {e}")
+            templates = []
+        finally:
+            conn.close()
+            
+        return templates
+
+    def create_quote_from_template(self, template_id: int, customer_name: str, reprice: bool = False) -> Optional[int]:
+        """Crea un nuovo preventivo istanziando un modello."""
+        if not customer_name:
+            return None
+            
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        new_id = None
+        
+        try:
+            date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cursor.execute("""
+                INSERT INTO quotes (customer_name, date_created, total_amount, notes)
+                SELECT ?, ?, 0.0, notes FROM quote_templates WHERE id = ?
+            """, (customer_name, date_str, template_id))
+            if cursor.rowcount == 0:
+                raise ValueError(f"modello {template_id} inesistente")
+            new_id = cursor.lastrowid
+            
+            self._copy_lines_into_quote(cursor, new_id, "quote_template_items", "template_id", template_id, reprice)
+            conn.commit()
+        except Exception as e:
+            print(f"ERRORE DB Quote From Template: {e}")
+            conn.rollback()
+            new_id = None
+        finally:
+            conn.close()
+            
+        return new_id
+
+    def delete_quote_template(self, template_id: int) -> bool:
+        """Elimina un modello e le sue righe."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        success = False
+        
+        try:
+            cursor.execute("DELETE FROM quote_template_items WHERE template_id = ?", (template_id,))
+            cursor.execute("DELETE FROM quote_templates WHERE id = ?", (template_id,))
+            conn.commit()
+            success = True
+        except Exception as e:
+            print(f"ERRORE DB Delete Template: {e}")
+            success = False
+        finally:
+            conn.close()
+            
+        return success
+
+    def _write_price_rows(self, cursor: sqlite3.Cursor, rows: List[Any]) -> int:
+        """
+        Inserisce righe (code, description, unit, price, category) a blocchi con executemany.
+        I codici già presenti vengono ignorati.
+        
+        Returns:
+            Numero di voci effettivamente inserite.
+        """
+        inserted = 0
+        for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+            cursor.executemany("""
+                INSERT OR IGNORE INTO price_list (code, description, unit, price, category)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows[start:start + IMPORT_BATCH_SIZE])
+            inserted += max(cursor.rowcount, 0)
+        return inserted
+
     def import_from_csv(self, csv_path: str) -> int:
         """
         Importa voci di prezzario da un file CSV in modo robusto.
@@ -446,68 +1158,564 @@ class DataManager:
         if not path_obj.exists():
             return 0
             
-        count = 0
+        report = self.import_price_files([str(path_obj)], category=import_engine.DEFAULT_CATEGORY, workers=1)
+        count = report.inserted
+        return count
+
+    def import_price_files(self, paths: List[str], category: Optional[str] = None,
+                           workers: Optional[int] = None,
+                           mapping: Optional[ColumnMapping] = None) -> ImportReport:
+        """
+        Importa più listini (.csv, .xlsx, .ods): lettura e validazione in parallelo
+        (processi separati), scrittura da un unico writer in una sola transazione
+        e in un'unica versione del prezzario.
+        
+        Con un solo file (o workers=1) la lettura avviene nel processo corrente
+        e le righe arrivano al writer a blocchi, a memoria costante.
+        
+        Args:
+            paths: File da importare.
+            category: Categoria di default; se None, ricavata dal nome di ciascun file
+                (una colonna categoria nel file prevale comunque).
+            workers: Processi di lettura; 1 = lettura nel processo corrente.
+            mapping: Posizione delle colonne; se None, il tracciato CSV storico.
+            
+        Returns:
+            ImportReport con tempi, voci inserite e righe scartate per file.
+        """
+        report = ImportReport()
+        paths = [p for p in paths if Path(p).is_file()]
+        if not paths:
+            return report
+            
+        start = time.perf_counter()
+        workers = workers or min(len(paths), os.cpu_count() or 1)
         conn = self._get_connection()
         cursor = conn.cursor()
+        cursor.execute(f"PRAGMA cache_size = -{IMPORT_CACHE_KB}")
+        
+        def write(stat: FileImportStat, rows: List[Any]) -> None:
+            t0 = time.perf_counter()
+            stat.inserted += self._write_price_rows(cursor, rows)
+            stat.write_s += time.perf_counter() - t0
+        
+        def record(stat: FileImportStat, result: import_engine.FileParseResult) -> None:
+            stat.parsed, stat.rejected = result.parsed, result.rejected
+            stat.parse_s, stat.error = result.parse_s, result.error
+            stat.rejected_samples = result.rejected_samples
+            report.files.append(stat)
         
         try:
-            with path_obj.open("r", encoding="utf-8") as f:
-                # Usa reader semplice per evitare problemi con i nomi delle colonne
-                reader = csv.reader(f, delimiter='|')
-                
-                # Salta l'intestazione (che può essere su più righe nel file originale)
-                header_skipped = False
-                
-                for row in reader:
-                    # Salta la prima riga se contiene 'Tariffa' o se è la prima del ciclo
-                    if not header_skipped:
-                        header_skipped = True
-                        if row and "Tariffa" in row[0]:
-                            continue
-                    
-                    if len(row) < 4:
-                        continue
-                        
-                    code = row[0].strip()
-                    desc = row[1].strip()
-                    unit = row[2].strip()
-                    price_str = row[3].replace(",", ".").strip()
-                    
-                    if not code or not desc:
-                        continue
-                        
-                    try:
-                        price = float(price_str)
-                    except ValueError:
-                        price = 0.0
-                        
-                    cursor.execute("""
-                        INSERT OR IGNORE INTO price_list (code, description, unit, price, category)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (code, desc, unit, price, "Edile"))
-                    
-                    if cursor.rowcount > 0:
-                        count += 1
+            # Transazione aperta esplicitamente: con il controllo implicito di sqlite3 un
+            # SAVEPOINT iniziale aprirebbe la transazione esterna e il suo RELEASE la
+            # confermerebbe, rendendo inefficace il rollback in caso di errore.
+            cursor.execute("BEGIN")
+            # Il registro delle modifiche si scrive in blocco prima dello snapshot
+            sync_engine.suspend_sync(cursor)
+            if workers <= 1 or len(paths) == 1:
+                for p in paths:
+                    stat = FileImportStat(path=str(p))
+                    # Un file che fallisce a metà lettura non lascia righe parziali
+                    cursor.execute("SAVEPOINT import_file")
+                    result = import_engine.parse_price_file(p, category, mapping, sink=lambda rows, st=stat: write(st, rows))
+                    if result.error:
+                        cursor.execute("ROLLBACK TO import_file")
+                        stat.inserted = 0
+                    cursor.execute("RELEASE import_file")
+                    record(stat, result)
+                    stat.parse_s -= stat.write_s  # La lettura in streaming include le scritture
+            else:
+                # "spawn" anche su Linux: un fork del processo GUI (Tk e thread di prefetch,
+                # manutenzione, scansione cartelle) può ereditare lock occupati e bloccarsi
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    futures = [pool.submit(import_engine.parse_price_file, p, category, mapping) for p in paths]
+                    for fut in as_completed(futures):
+                        result = fut.result()
+                        stat = FileImportStat(path=result.path)
+                        if not result.error:
+                            write(stat, result.rows)
+                        record(stat, result)
                         
+            sync_engine.log_pending_prices(cursor)
+            sync_engine.resume_sync(cursor)
+            label = f"Import {Path(paths[0]).name}" if len(paths) == 1 else f"Import {len(paths)} file"
+            report.version_id = self._snapshot_pending(cursor, label, "; ".join(paths))
+            t0 = time.perf_counter()
+            similarity_engine.index_pending(cursor)
+            report.index_s = time.perf_counter() - t0
             conn.commit()
         except Exception as e:
-            print(f"ERRORE Import CSV: {e}")
+            print(f"ERRORE Import: {e}")
+            conn.rollback()
+            for f in report.files:
+                f.inserted = 0
         finally:
             conn.close()
             
+        report.files.sort(key=lambda f: f.path)
+        report.total_s = time.perf_counter() - start
+        return report
+
+    # --- VOCI DUPLICATE ---
+
+    def find_similar_items(self, code: str, threshold: float = similarity_engine.SIMILAR_THRESHOLD,
+                           limit: int = 50) -> List[SimilarItem]:
+        """Voci con descrizione simile a quella del codice indicato, dalla più simile."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        items = []
+        try:
+            # Voci rimaste senza firma (DB migrati, modifiche esterne)
+            if similarity_engine.index_pending(cursor):
+                conn.commit()
+            items = similarity_engine.find_similar(cursor, code, threshold, limit)
+        except Exception as e:
+            print(f"ERRORE Voci simili: {e}")
+        finally:
+            conn.close()
+        return items
+
+    def find_duplicate_items(self, threshold: float = similarity_engine.DEFAULT_THRESHOLD) -> Optional[DedupReport]:
+        """Gruppi di voci identiche o quasi identiche su tutto il prezzario."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        report = None
+        try:
+            if similarity_engine.index_pending(cursor):
+                conn.commit()
+            report = similarity_engine.find_duplicates(cursor, threshold)
+        except Exception as e:
+            print(f"ERRORE Report duplicati: {e}")
+        finally:
+            conn.close()
+        return report
+
+    def rebuild_similarity_index(self) -> int:
+        """Ricostruisce da zero l'indice di somiglianza; restituisce le voci indicizzate."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        count = 0
+        try:
+            count = similarity_engine.rebuild_index(cursor)
+            conn.commit()
+        except Exception as e:
+            print(f"ERRORE Indice somiglianza: {e}")
+            conn.rollback()
+        finally:
+            conn.close()
         return count
 
+    def get_price_versions(self) -> List[PriceListVersion]:
+        """Restituisce le versioni del prezzario, dalla più recente."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        versions = []
+        
+        try:
+            cursor.execute("""
+                SELECT v.id, v.label, v.source, v.date_created,
+                       (SELECT COUNT(*) FROM price_history h WHERE h.version_id = v.id) AS item_count
+                FROM price_list_versions v
+                ORDER BY v.id DESC
+            """)
+            for row in cursor.fetchall():
+                versions.append(PriceListVersion(
+                    id=row['id'],
+                    label=row['label'],
+                    source=row['source'] or "",
+                    date_created=row['date_created'],
+                    item_count=row['item_count']
+                ))
+        except Exception as e:
+            print(f"ERRORE DB Versions: {e}")
+            versions = []
+        finally:
+            conn.close()
+            
+        return versions
+
+    # --- REPORT ---
+
+    def get_report(self, top_n: int = 10, months: int = 24) -> Optional[QuoteReport]:
+        """Restituisce il report sui preventivi letto dagli aggregati precalcolati."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        report = None
+        
+        try:
+            report = report_engine.build_report(cursor, top_n, months)
+        except Exception as e:
+            print(f"ERRORE DB Report: {e}")
+            report = None
+        finally:
+            conn.close()
+            
+        return report
+
+    # --- ARCHIVIO ---
+
+    def _attach_archive(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Collega il database di archivio come schema "arc" e ne allinea le tabelle.
+        
+        Le colonne vengono copiate da quelle del DB principale, così l'archivio
+        segue automaticamente le migrazioni di quotes e quote_items.
+        """
+        cursor.execute("SELECT 1 FROM pragma_database_list WHERE name = 'arc'")
+        if not cursor.fetchone():
+            cursor.execute("ATTACH DATABASE ? AS arc", (str(self.archive_path),))
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS arc.quotes (
+                id INTEGER PRIMARY KEY,
+                customer_name TEXT NOT NULL,
+                date_created TEXT NOT NULL,
+                total_amount REAL DEFAULT 0.0,
+                notes TEXT
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS arc.quote_items (
+                id INTEGER PRIMARY KEY,
+                quote_id INTEGER NOT NULL,
+                item_code TEXT,
+                description TEXT,
+                quantity REAL NOT NULL,
+                unit_price REAL NOT NULL,
+                total_price REAL NOT NULL,
+                unit TEXT
+            )
+        """)
+        for table in ("quotes", "quote_items"):
+            cursor.execute(f"PRAGMA main.table_info({table})")
+            main_cols = [(r[1], r[2]) for r in cursor.fetchall()]
+            cursor.execute(f"PRAGMA arc.table_info({table})")
+            arc_cols = [r[1] for r in cursor.fetchall()]
+            for name, decl in main_cols:
+                if name not in arc_cols:
+                    cursor.execute(f"ALTER TABLE arc.{table} ADD COLUMN {name} {decl}")
+        cursor.execute("CREATE INDEX IF NOT EXISTS arc.idx_arc_items_quote ON quote_items (quote_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS arc.idx_arc_quotes_customer ON quotes (customer_name)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS arc.idx_arc_quotes_date ON quotes (date_created)")
+
+    def _move_quotes(self, cursor: sqlite3.Cursor, src: str, dst: str, batch_table: str) -> None:
+        """Sposta testate e righe dei preventivi elencati in batch_table da uno schema all'altro."""
+        for table, key in (("quotes", "id"), ("quote_items", "quote_id")):
+            cursor.execute(f"PRAGMA main.table_info({table})")
+            cols = ", ".join(r[1] for r in cursor.fetchall())
+            cursor.execute(f"""
+                INSERT INTO {dst}.{table} ({cols})
+                SELECT {cols} FROM {src}.{table} WHERE {key} IN (SELECT id FROM {batch_table})
+            """)
+        cursor.execute(f"DELETE FROM {src}.quote_items WHERE quote_id IN (SELECT id FROM {batch_table})")
+        cursor.execute(f"DELETE FROM {src}.quotes WHERE id IN (SELECT id FROM {batch_table})")
+
+    def archive_quotes(self, older_than_days: int = DEFAULT_ARCHIVE_AGE_DAYS,
+                       batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        """
+        Sposta nel database di archivio i preventivi più vecchi dell'età indicata.
+        
+        Lo spostamento avviene a blocchi di batch_size preventivi, ciascuno in una
+        propria transazione. Gli aggregati dei report non cambiano: i preventivi
+        archiviati restano nello storico. L'archiviazione è locale: non entra nel
+        registro delle modifiche e non cancella i preventivi sugli altri database.
+        
+        Returns:
+            Numero di preventivi archiviati.
+        """
+        if older_than_days < 0 or batch_size <= 0:
+            return 0
+            
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        count = 0
+        
+        try:
+            self._attach_archive(cursor)
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS arc_batch (id INTEGER PRIMARY KEY)")
+            cursor.execute("SELECT id FROM quotes WHERE date_created < ? ORDER BY id", (cutoff,))
+            ids = [r[0] for r in cursor.fetchall()]
+            
+            for start in range(0, len(ids), batch_size):
+                chunk = ids[start:start + batch_size]
+                cursor.execute("DELETE FROM temp.arc_batch")
+                cursor.executemany("INSERT INTO temp.arc_batch (id) VALUES (?)", [(i,) for i in chunk])
+                report_engine.suspend_reports(cursor)
+                sync_engine.suspend_sync(cursor)
+                self._move_quotes(cursor, "main", "arc", "temp.arc_batch")
+                sync_engine.resume_sync(cursor)
+                report_engine.resume_reports(cursor)
+                conn.commit()
+                count += len(chunk)
+        except Exception as e:
+            print(f"ERRORE DB Archive: {e}")
+            conn.rollback()
+        finally:
+            conn.close()
+            self.quote_cache.clear()
+            
+        return count
+
+    def restore_archived_quote(self, quote_id: int) -> bool:
+        """Riporta un preventivo archiviato nel database principale."""
+        if not self.archive_path.exists():
+            return False
+            
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        success = False
+        
+        try:
+            self._attach_archive(cursor)
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS arc_batch (id INTEGER PRIMARY KEY)")
+            cursor.execute("DELETE FROM temp.arc_batch")
+            cursor.execute("INSERT INTO temp.arc_batch (id) SELECT id FROM arc.quotes WHERE id = ?", (quote_id,))
+            if cursor.rowcount == 0:
+                raise ValueError(f"preventivo {quote_id} non presente in archivio")
+            report_engine.suspend_reports(cursor)
+            sync_engine.suspend_sync(cursor)
+            self._move_quotes(cursor, "arc", "main", "temp.arc_batch")
+            sync_engine.resume_sync(cursor)
+            report_engine.resume_reports(cursor)
+            conn.commit()
+            success = True
+        except Exception as e:
+            print(f"ERRORE DB Restore: {e}")
+            conn.rollback()
+            success = False
+        finally:
+            conn.close()
+            self.quote_cache.invalidate(quote_id)
+            
+        return success
+
+    def search_archived_quotes(self, query: str = "", limit: int = 500) -> List[QuoteHeader]:
+        """Cerca nell'archivio per cliente, note o numero preventivo."""
+        if not self.archive_path.exists():
+            return []
+            
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        quotes = []
+        search_term = f"%{query}%"
+        
+        try:
+            self._attach_archive(cursor)
+            cursor.execute("""
+                SELECT * FROM arc.quotes
+                WHERE customer_name LIKE ? OR notes LIKE ? OR CAST(id AS TEXT) = ?
+                ORDER BY date_created DESC
+                LIMIT ?
+            """, (search_term, search_term, query.strip(), limit))
+            for row in cursor.fetchall():
+                quotes.append(QuoteHeader(
+                    id=row['id'],
+                    customer_name=row['customer_name'],
+                    date_created=row['date_created'],
+                    total_amount=row['total_amount'],
+                    notes=row['notes']
+                ))
+        except Exception as e:
+            print(f"ERRORE DB Search Archive: {e}")
+            quotes = []
+        finally:
+            conn.close()
+            
+        return quotes
+
+    def get_archived_quote_details(self, quote_id: int) -> Tuple[Optional[QuoteHeader], List[QuoteLineItem]]:
+        """Restituisce testata e righe di un preventivo archiviato."""
+        if not self.archive_path.exists():
+            return None, []
+            
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        header = None
+        items = []
+        
+        try:
+            self._attach_archive(cursor)
+            cursor.execute("SELECT * FROM arc.quotes WHERE id = ?", (quote_id,))
+            row = cursor.fetchone()
+            if row:
+                header = QuoteHeader(
+                    id=row['id'],
+                    customer_name=row['customer_name'],
+                    date_created=row['date_created'],
+                    total_amount=row['total_amount'],
+                    notes=row['notes']
+                )
+                # Le righe versionate puntano allo storico (immutabile) del DB principale
+                cursor.execute("""
+                    SELECT qi.id, qi.quote_id, qi.item_code,
+                           COALESCE(qi.description, d.text, '') AS description,
+                           qi.quantity, qi.unit_price, qi.total_price,
+                           COALESCE(qi.unit, h.unit, '') AS unit, qi.version_id
+                    FROM arc.quote_items qi
+                    LEFT JOIN main.price_history h ON h.version_id = qi.version_id AND h.code = qi.item_code
+                    LEFT JOIN main.price_descriptions d ON d.id = h.description_id
+                    WHERE qi.quote_id = ?
+                    ORDER BY qi.id
+                """, (quote_id,))
+                for ri in cursor.fetchall():
+                    items.append(QuoteLineItem(
+                        id=ri['id'],
+                        quote_id=ri['quote_id'],
+                        item_code=ri['item_code'],
+                        description=ri['description'],
+                        quantity=ri['quantity'],
+                        unit_price=ri['unit_price'],
+                        total_price=ri['total_price'],
+                        unit=ri['unit'],
+                        version_id=ri['version_id']
+                    ))
+        except Exception as e:
+            print(f"ERRORE DB Get Archived Quote: {e}")
+            header = None
+            items = []
+        finally:
+            conn.close()
+            
+        return header, items
+
+    # --- SINCRONIZZAZIONE ---
+
+    def get_sync_status(self) -> Dict[str, Any]:
+        """Identità del database, ultima sequenza del registro e nodi noti."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        status: Dict[str, Any] = {}
+        try:
+            node_id, name = sync_engine.node_info(cursor)
+            status = {"node_id": node_id, "name": name, "last_seq": sync_engine.last_seq(cursor),
+                      "peers": sync_engine.get_peers(cursor)}
+        except Exception as e:
+            print(f"ERRORE Sync Status: {e}")
+        finally:
+            conn.close()
+        return status
+
+    def new_sync_node(self, name: Optional[str] = None) -> str:
+        """Nuova identità di sincronizzazione, da usare su una copia appena fatta del database."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        node_id = ""
+        try:
+            node_id = sync_engine.new_node(cursor, name)
+            conn.commit()
+        except Exception as e:
+            print(f"ERRORE Sync Nodo: {e}")
+            conn.rollback()
+        finally:
+            conn.close()
+        return node_id
+
+    def export_changes(self, path: Optional[Path] = None, peer: Optional[str] = None,
+                       since: Optional[int] = None, full: bool = False) -> SyncResult:
+        """
+        Esporta le modifiche in un pacchetto .jsonl.gz.
+        
+        Args:
+            path: File di destinazione; se None, in data/sync/ con nome da nodo e sequenza.
+            peer: Nodo destinatario (nome o id): riparte dall'ultimo invio e ne
+                esclude le modifiche, che possiede già. A invio riuscito la
+                posizione viene aggiornata.
+            since: Sequenza di partenza esplicita; se None, quella del nodo
+                destinatario o, per un nodo sconosciuto, quella della copia.
+            full: Tutte le righe (anche mai modificate), per allineare da zero un
+                database che non deriva da una copia di questo.
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        result = SyncResult(path=str(path or ""), direction="export")
+        try:
+            target = sync_engine.find_peer(cursor, peer) if peer else None
+            if peer and not target and since is None and not full:
+                raise ValueError(f"nodo {peer} sconosciuto: indicare la sequenza di partenza")
+            if full:
+                sync_engine.seed_log(cursor)
+                since = 0
+            elif since is None:
+                since = target.sent_seq if target else sync_engine.base_seq(cursor)
+            if path is None:
+                name = sync_engine.node_info(cursor)[1]
+                stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                path = Path(self.db_path).parent / sync_engine.SYNC_DIRNAME / f"{name}_{stamp}{sync_engine.BUNDLE_SUFFIX}"
+            result = sync_engine.export_bundle(cursor, Path(path), since, target.node_id if target else "",
+                                               target.received_seq if target else 0)
+            if target:
+                cursor.execute("UPDATE sync_peers SET sent_seq = ?, last_sync = ? WHERE node_id = ?",
+                               (result.upto, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), target.node_id))
+            conn.commit()
+        except Exception as e:
+            print(f"ERRORE Sync Export: {e}")
+            conn.rollback()
+            result.error = str(e)
+        finally:
+            conn.close()
+        return result
+
+    def import_changes(self, path: Path) -> SyncResult:
+        """
+        Applica un pacchetto di modifiche in un'unica transazione.
+        
+        Le voci di prezzario cambiate confluiscono in una nuova versione del
+        prezzario e nell'indice di somiglianza.
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        result = SyncResult(path=str(path), direction="import")
+        try:
+            has_archive = self.archive_path.exists()
+            if has_archive:
+                self._attach_archive(cursor)
+            result = sync_engine.apply_bundle(cursor, Path(path), has_archive)
+            self._snapshot_pending(cursor, f"Sync {result.node}", Path(path).name)
+            similarity_engine.index_pending(cursor)
+            conn.commit()
+        except Exception as e:
+            print(f"ERRORE Sync Import: {e}")
+            conn.rollback()
+            result.error = str(e)
+        finally:
+            conn.close()
+            self.quote_cache.clear()
+        return result
+
+    def refresh_reports(self) -> bool:
+        """Ricalcola da zero gli aggregati dei report."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        success = False
+        
+        try:
+            has_archive = self.archive_path.exists()
+            if has_archive:
+                self._attach_archive(cursor)
+            report_engine.refresh_reports(cursor, has_archive)
+            conn.commit()
+            success = True
+        except Exception as e:
+            print(f"ERRORE DB Refresh Report: {e}")
+            success = False
+        finally:
+            conn.close()
+            
+        return success
+
     def get_stats(self) -> Dict[str, int]:
-        """Restituisce il numero totale di voci e preventivi."""
+        """Restituisce il numero totale di voci, preventivi e versioni del prezzario."""
         conn = self._get_connection()
         cursor = conn.cursor()
-        stats = {"prices": 0, "quotes": 0}
+        stats = {"prices": 0, "quotes": 0, "versions": 0}
         
         try:
             cursor.execute("SELECT COUNT(*) FROM price_list")
             stats["prices"] = cursor.fetchone()[0]
             cursor.execute("SELECT COUNT(*) FROM quotes")
             stats["quotes"] = cursor.fetchone()[0]
+            cursor.execute("SELECT COUNT(*) FROM price_list_versions")
+            stats["versions"] = cursor.fetchone()[0]
         finally:
             conn.close()
             
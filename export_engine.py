@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Export Engine - Generazione dei documenti di preventivo.
+
+Produce il testo del preventivo (formato .txt a colonne) a partire
+da testata e righe, indipendentemente dall'interfaccia che lo richiede
+(GUI, API HTTP).
+
+ExportCache evita di reimpaginare e riscrivere i file già aggiornati:
+un manifest nella cartella exports/ conserva per ogni preventivo l'hash
+del contenuto (testata, righe, versione del modello) con cui è stato
+scritto il file. Anche da riga di comando:
+python3 export_engine.py stale|refresh [--all]
+"""
+
+__date__ = "2026-10-19"
+__version__ = "1.0.0"
+__author__ = "Gemini CLI"
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import astuple, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from data_engine import DataManager, QuoteHeader, QuoteLineItem
+
+EXPORTS_DIR = Path(__file__).parent / "exports"
+TEMPLATE_VERSION = "1"                  # Da incrementare a ogni modifica di render_quote_txt()
+EXPORT_FORMAT = "txt"
+MANIFEST_NAME = ".export_manifest.json"
+
+# Motivi per cui un'esportazione va rigenerata
+REASON_NEW = "mai esportato"
+REASON_CHANGED = "preventivo modificato"
+REASON_FILE = "file mancante o modificato"
+
+
+def export_filename(header: QuoteHeader) -> str:
+    """Nome del file di esportazione di un preventivo."""
+    res = f"Preventivo_{header.id}_{header.customer_name.replace(' ', '_')}.txt"
+    return res
+
+
+def render_quote_txt(header: QuoteHeader, items: List[QuoteLineItem]) -> str:
+    """Impagina il preventivo in formato testo a colonne."""
+    h = header
+    l = ["="*85, f"PREVENTIVO N. {h.id:04d} | CLIENTE: {h.customer_name.upper()} | DATA: {h.date_created}", "="*85, ""]
+    l.append(f"{'CODICE':<12} | {'DESCRIZIONE':<35} | {'UM':<4} | {'QTA':<7} | {'UNITARIO':<10} | {'TOTALE':<10}")
+    l.append("-" * 95)
+    for i in items:
+        desc = i.description or ""
+        desc = (desc[:32] + '..') if len(desc) > 32 else desc
+        l.append(f"{i.item_code or '':<12} | {desc:<35} | {i.unit or '':<4} | {i.quantity:<7.2f} | {i.unit_price:<10.2f} | {i.total_price:<10.2f}")
+    l.append("-" * 95); l.append(f"{'TOTALE COMPLESSIVO:':<80} € {h.total_amount:.2f}"); l.append("="*85)
+    res = "\n".join(l)
+    return res
+
+
+def content_hash(header: QuoteHeader, items: List[QuoteLineItem]) -> str:
+    """Hash di testata, righe, formato e versione del modello: cambia solo se cambia il documento."""
+    payload = [EXPORT_FORMAT, TEMPLATE_VERSION, astuple(header), [astuple(i) for i in items]]
+    data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    res = hashlib.blake2b(data, digest_size=16).hexdigest()
+    return res
+
+
+@dataclass
+class ExportResult:
+    """Esito dell'esportazione di un preventivo."""
+    quote_id: int
+    path: Path
+    written: bool       # False: il file era già aggiornato, nessuna scrittura
+
+
+@dataclass
+class StaleExport:
+    """Preventivo la cui esportazione va (ri)generata."""
+    quote_id: int
+    customer_name: str
+    file: str
+    reason: str
+
+
+@dataclass
+class ExportRefreshReport:
+    """Esito di una verifica o rigenerazione delle esportazioni."""
+    checked: int = 0
+    stale: List[StaleExport] = field(default_factory=list)
+    written: int = 0
+    orphans: List[str] = field(default_factory=list)   # File di preventivi non più presenti
+    duration_s: float = 0.0
+
+    def summary(self) -> str:
+        res = (f"ESPORTAZIONI: {self.checked} preventivi verificati | {len(self.stale)} da aggiornare | "
+               f"{self.written} scritte | {len(self.orphans)} senza preventivo | {self.duration_s:.2f}s")
+        return res
+
+
+class ExportCache:
+    """
+    Manifest delle esportazioni scritte in una cartella.
+
+    Una voce per preventivo: nome del file, hash del contenuto, dimensione e
+    mtime del file al momento della scrittura. Un file cancellato o modificato
+    a mano risulta non aggiornato e viene riscritto.
+    """
+
+    def __init__(self, exports_dir: Path = EXPORTS_DIR):
+        self.exports_dir = Path(exports_dir)
+        self.manifest_path = self.exports_dir / MANIFEST_NAME
+        self.entries: Dict[str, Dict[str, Any]] = self._load()
+        self._lock = threading.RLock()     # GUI e aggiornamento in blocco possono scrivere insieme
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        res: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                res = data.get("quotes", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            # Manifest illeggibile: tutte le esportazioni risultano da rigenerare
+            print(f"ERRORE lettura manifest esportazioni: {e}")
+        return res
+
+    def save(self) -> None:
+        """Scrive il manifest (file .part rinominato a fine scrittura)."""
+        self.exports_dir.mkdir(parents=True, exist_ok=True)
+        part = self.manifest_path.with_name(self.manifest_path.name + ".part")
+        with self._lock:
+            with open(part, "w", encoding="utf-8") as f:
+                json.dump({"template_version": TEMPLATE_VERSION, "quotes": self.entries}, f, ensure_ascii=False, indent=1)
+            os.replace(part, self.manifest_path)
+
+    def _file_matches(self, entry: Dict[str, Any]) -> bool:
+        """True se il file esiste ed è quello scritto dall'ultima esportazione."""
+        try:
+            st = (self.exports_dir / entry["file"]).stat()
+        except OSError:
+            return False
+        res = st.st_size == entry.get("size") and st.st_mtime_ns == entry.get("mtime_ns")
+        return res
+
+    def check(self, header: QuoteHeader, items: List[QuoteLineItem],
+              digest: Optional[str] = None) -> Optional[str]:
+        """Motivo per cui l'esportazione va rigenerata, None se è aggiornata."""
+        entry = self.entries.get(str(header.id))
+        if entry is None:
+            return REASON_NEW
+        if entry.get("hash") != (digest or content_hash(header, items)) or entry.get("file") != export_filename(header):
+            return REASON_CHANGED
+        if not self._file_matches(entry):
+            return REASON_FILE
+        return None
+
+    def export(self, header: QuoteHeader, items: List[QuoteLineItem],
+               force: bool = False, save: bool = True) -> ExportResult:
+        """
+        Esporta il preventivo solo se il file non è aggiornato (o con force).
+
+        Se il nome del file è cambiato (cliente rinominato) il vecchio file
+        viene rimosso, purché non sia stato modificato dopo l'esportazione.
+        Con save=False il manifest va salvato dal chiamante (esportazioni in blocco).
+        """
+        digest = content_hash(header, items)
+        path = self.exports_dir / export_filename(header)
+        if not force and self.check(header, items, digest) is None:
+            res = ExportResult(header.id, path, False)
+            return res
+        self.exports_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            old = self.entries.get(str(header.id))
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(render_quote_txt(header, items))
+            if old and old.get("file") != path.name and self._file_matches(old):
+                (self.exports_dir / old["file"]).unlink()
+            st = path.stat()
+            self.entries[str(header.id)] = {"file": path.name, "hash": digest, "size": st.st_size,
+                                            "mtime_ns": st.st_mtime_ns, "exported_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        if save:
+            self.save()
+        res = ExportResult(header.id, path, True)
+        return res
+
+
+def _iter_stale(db: DataManager, cache: ExportCache, include_new: bool,
+                report: ExportRefreshReport) -> Iterator[Tuple[QuoteHeader, List[QuoteLineItem], str]]:
+    """
+    Preventivi con esportazione non aggiornata; annota verificati e orfani nel report.
+
+    Lettura in blocco senza la cache del dettaglio preventivi (vedi
+    DataManager.iter_all_quote_details).
+    """
+    seen = set()
+    for header, items in db.iter_all_quote_details():
+        seen.add(str(header.id))
+        if not include_new and str(header.id) not in cache.entries:
+            continue
+        report.checked += 1
+        reason = cache.check(header, items)
+        if reason is not None:
+            report.stale.append(StaleExport(header.id, header.customer_name, export_filename(header), reason))
+            yield header, items, reason
+    report.orphans = sorted(e["file"] for k, e in list(cache.entries.items()) if k not in seen)
+
+
+def find_stale_exports(db: DataManager, cache: Optional[ExportCache] = None,
+                       include_new: bool = False) -> ExportRefreshReport:
+    """
+    Elenca le esportazioni da rigenerare senza scrivere nulla.
+
+    Di norma solo i preventivi già esportati; con include_new anche quelli mai esportati.
+    """
+    t0 = time.perf_counter()
+    cache = cache or ExportCache()
+    res = ExportRefreshReport()
+    for _ in _iter_stale(db, cache, include_new, res):
+        pass
+    res.duration_s = time.perf_counter() - t0
+    return res
+
+
+def refresh_exports(db: DataManager, cache: Optional[ExportCache] = None,
+                    include_new: bool = False) -> ExportRefreshReport:
+    """Rigenera solo le esportazioni non aggiornate; manifest salvato una volta a fine lavoro."""
+    t0 = time.perf_counter()
+    cache = cache or ExportCache()
+    res = ExportRefreshReport()
+    try:
+        for header, items, _ in _iter_stale(db, cache, include_new, res):
+            cache.export(header, items, force=True, save=False)
+            res.written += 1
+    except OSError as e:
+        print(f"ERRORE scrittura esportazioni: {e}")
+    finally:
+        if res.written:
+            cache.save()
+    res.duration_s = time.perf_counter() - t0
+    return res
+
+
+def do_main() -> None:
+    """Uso da riga di comando: python3 export_engine.py stale|refresh [--all]"""
+    parser = argparse.ArgumentParser(description="Esportazioni dei preventivi non aggiornate")
+    parser.add_argument("--db", type=Path, default=None, help="percorso del database (default: data/computa_ai.db)")
+    parser.add_argument("--dir", type=Path, default=EXPORTS_DIR, help="cartella delle esportazioni (default: exports/)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, text in (("stale", "elenca le esportazioni da rigenerare"), ("refresh", "rigenera solo le esportazioni non aggiornate")):
+        p = sub.add_parser(name, help=text)
+        p.add_argument("--all", action="store_true", help="include i preventivi mai esportati")
+    args = parser.parse_args()
+
+    db = DataManager(args.db)
+    cache = ExportCache(args.dir)
+    if args.command == "stale":
+        report = find_stale_exports(db, cache, args.all)
+        for s in report.stale:
+            print(f"  {s.quote_id:>6} {s.customer_name:<30} {s.file} ({s.reason})")
+    else:
+        report = refresh_exports(db, cache, args.all)
+    for f in report.orphans:
+        print(f"  senza preventivo (eliminato o archiviato): {f}")
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    do_main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+GUI Loader - Popolamento progressivo dei Treeview.
+
+Inserisce le righe a fette di tempo tramite after(), così Tk continua a
+ridisegnare e a rispondere all'utente anche con decine di migliaia di
+righe: la prima schermata compare subito, il resto segue in background.
+Un nuovo caricamento sullo stesso Treeview annulla quello in corso.
+"""
+
+__date__ = "2026-10-19"
+__version__ = "1.0.0"
+__author__ = "Gemini CLI"
+
+import time
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, Iterable, Iterator, Optional, Sequence
+
+FIRST_CHUNK = 80            # Righe inserite subito (la prima schermata)
+SLICE_MS = 15               # Tempo massimo di inserimento per ogni fetta
+SLICE_PAUSE_MS = 1          # Pausa tra le fette, per lasciare spazio agli eventi Tk
+
+
+class TreeLoader:
+    """Caricatore progressivo associato a un Treeview (uno per widget, vedi of())."""
+
+    def __init__(self, tree: ttk.Treeview):
+        self.tree = tree
+        self._gen = 0
+        self._rows: Optional[Iterator[Sequence]] = None
+        self._on_done: Optional[Callable[[], None]] = None
+        self._after_id: Optional[str] = None
+
+    @classmethod
+    def of(cls, tree: ttk.Treeview) -> "TreeLoader":
+        """Il caricatore del Treeview, creato al primo uso e legato al widget."""
+        loader = getattr(tree, "_tree_loader", None)
+        if loader is None:
+            loader = cls(tree)
+            tree._tree_loader = loader
+        return loader
+
+    @property
+    def busy(self) -> bool:
+        res = self._rows is not None
+        return res
+
+    def load(self, rows: Iterable[Sequence], on_done: Optional[Callable[[], None]] = None) -> None:
+        """
+        Sostituisce il contenuto del Treeview con rows (tuple di valori).
+
+        rows può essere un generatore: le righe vengono formattate solo quando
+        inserite. on_done viene chiamato a caricamento completato (non se
+        annullato da un caricamento successivo).
+        """
+        self.cancel()
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self._rows = iter(rows)
+        self._on_done = on_done
+        self._insert(FIRST_CHUNK, None)
+        if self._rows is not None:
+            self._schedule()
+
+    def cancel(self) -> None:
+        """Interrompe il caricamento in corso (le righe già inserite restano)."""
+        self._gen += 1
+        if self._after_id is not None:
+            try:
+                self.tree.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        self._rows = None
+        self._on_done = None
+
+    def finish(self) -> None:
+        """Completa subito il caricamento in corso (es. prima di un ordinamento)."""
+        if self._rows is None:
+            return
+        if self._after_id is not None:
+            self.tree.after_cancel(self._after_id)
+            self._after_id = None
+        self._insert(None, None)
+
+    def _schedule(self) -> None:
+        gen = self._gen
+        self._after_id = self.tree.after(SLICE_PAUSE_MS, lambda: self._step(gen))
+
+    def _step(self, gen: int) -> None:
+        self._after_id = None
+        if gen != self._gen or self._rows is None:
+            return
+        try:
+            if not self.tree.winfo_exists():
+                self._rows = None
+                return
+            self._insert(None, time.perf_counter() + SLICE_MS / 1000)
+        except tk.TclError:
+            # Finestra chiusa durante il caricamento
+            self._rows = None
+            return
+        if self._rows is not None:
+            self._schedule()
+
+    def _insert(self, limit: Optional[int], deadline: Optional[float]) -> None:
+        """Inserisce fino a limit righe o fino alla scadenza; chiude il caricamento a fine dati."""
+        rows = self._rows
+        count = 0
+        for values in rows:
+            self.tree.insert("", tk.END, values=values)
+            count += 1
+            if limit is not None and count >= limit:
+                return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+        on_done = self._on_done
+        self._rows = None
+        self._on_done = None
+        if on_done:
+            on_done()
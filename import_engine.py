@@ -0,0 +1,705 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Import Engine - Lettura e validazione dei listini prezzi.
+
+Trasforma i file sorgente (CSV delimitati da '|', fogli .xlsx e .ods)
+in righe pronte per l'inserimento (code, description, unit, price,
+category), normalizzando i decimali con la virgola e gli spazi e
+scartando le righe non valide con il relativo motivo. I fogli di
+calcolo vengono letti in streaming (zipfile + iterparse, una riga XML
+alla volta) senza librerie esterne. Le funzioni di parsing sono a
+livello di modulo per poter essere eseguite in un ProcessPoolExecutor
+(import multi-file).
+"""
+
+__date__ = "2026-10-19"
+__version__ = "1.0.0"
+__author__ = "Gemini CLI"
+
+import os
+import csv
+import time
+import sqlite3
+import threading
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import List, Optional, Tuple, Iterator, Callable, Dict
+from dataclasses import dataclass, field
+
+CSV_DELIMITER = "|"
+DEFAULT_CATEGORY = "Edile"
+REJECT_SAMPLES = 20             # Righe scartate conservate nel report per ciascun file
+STREAM_BATCH_SIZE = 5000        # Righe passate al writer per volta nella lettura in streaming
+SHARED_STRINGS_IN_MEMORY = 100000   # Stringhe condivise xlsx tenute in memoria; le successive su disco
+ESTIMATE_SAMPLE_BYTES = 65536   # Byte letti dall'inizio di un CSV per stimarne le righe
+LISTING_BATCH = 200             # Voci consegnate per volta durante la scansione di una cartella
+SPREADSHEET_SUFFIXES = (".xlsx", ".ods")
+IMPORT_SUFFIXES = (".csv",) + SPREADSHEET_SUFFIXES
+
+# Namespace XML dei formati supportati
+# Etichette tipiche delle intestazioni di codice e descrizione (minuscole, senza punti)
+_HEADER_LABELS = {"codice", "cod", "code", "articolo", "voce", "n", "nr", "num", "tariffa",
+                  "descrizione", "desc", "description", "descr", "lavorazione"}
+
+_NS_XLSX = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_XLSX_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_NS_ODS_TABLE = "{urn:oasis:names:tc:opendocument:xmlns:table:1.0}"
+_NS_ODS_OFFICE = "{urn:oasis:names:tc:opendocument:xmlns:office:1.0}"
+_NS_ODS_TEXT = "{urn:oasis:names:tc:opendocument:xmlns:text:1.0}"
+
+# Riga pronta per price_list: (code, description, unit, price, category)
+PriceRow = Tuple[str, str, str, float, str]
+# Riga grezza del file: (numero di riga, celle)
+RawRow = Tuple[int, List[str]]
+
+
+@dataclass
+class ColumnMapping:
+    """
+    Posizione delle colonne nel file sorgente (0 = prima colonna, "A").
+
+    Il default corrisponde al tracciato CSV storico: codice, descrizione,
+    unità, prezzo e una quinta colonna opzionale con la categoria.
+    """
+    code: int = 0
+    description: int = 1
+    unit: Optional[int] = 2
+    price: int = 3
+    category: Optional[int] = 4
+    sheet: str = ""             # Nome del foglio (xlsx/ods); vuoto = primo foglio
+
+    @staticmethod
+    def column_index(ref: str) -> int:
+        """Converte una colonna in indice: "A" -> 0, "AB" -> 27, "3" -> 2 (1-based)."""
+        ref = ref.strip().upper()
+        if ref.isdigit():
+            res = int(ref) - 1
+            return res
+        if not ref or not ref.isalpha():
+            raise ValueError(f"colonna non valida '{ref}'")
+        idx = 0
+        for ch in ref:
+            idx = idx * 26 + (ord(ch) - ord("A") + 1)
+        res = idx - 1
+        return res
+
+    @staticmethod
+    def column_letter(index: int) -> str:
+        """Converte un indice in lettere di colonna: 0 -> "A", 27 -> "AB"."""
+        letters = ""
+        n = index + 1
+        while n:
+            n, rem = divmod(n - 1, 26)
+            letters = chr(ord("A") + rem) + letters
+        return letters
+
+    @classmethod
+    def from_spec(cls, spec: str) -> "ColumnMapping":
+        """
+        Crea la mappatura da un testo "codice=A,descrizione=C,um=D,prezzo=F,categoria=-,foglio=Listino".
+
+        Sono accettati anche i nomi inglesi dei campi (code, description, unit,
+        price, category, sheet); "-" o vuoto esclude unità o categoria.
+        """
+        aliases = {"codice": "code", "descrizione": "description", "um": "unit", "unita": "unit",
+                   "prezzo": "price", "categoria": "category", "foglio": "sheet"}
+        mapping = cls()
+        for part in filter(None, (x.strip() for x in spec.split(","))):
+            key, _, value = part.partition("=")
+            key = aliases.get(key.strip().lower(), key.strip().lower())
+            value = value.strip()
+            if key == "sheet":
+                mapping.sheet = value
+            elif key in ("unit", "category") and value in ("", "-"):
+                setattr(mapping, key, None)
+            elif key in ("code", "description", "unit", "price", "category"):
+                setattr(mapping, key, cls.column_index(value))
+            else:
+                raise ValueError(f"campo di mappatura sconosciuto '{key}'")
+        return mapping
+
+    def to_spec(self) -> str:
+        """Rappresentazione testuale, inversa di from_spec."""
+        def col(idx: Optional[int]) -> str:
+            letter = self.column_letter(idx) if idx is not None else "-"
+            return letter
+        res = (f"codice={col(self.code)},descrizione={col(self.description)},um={col(self.unit)},"
+               f"prezzo={col(self.price)},categoria={col(self.category)}")
+        if self.sheet:
+            res += f",foglio={self.sheet}"
+        return res
+
+    @property
+    def min_columns(self) -> int:
+        """Numero minimo di colonne di una riga CSV valida (fino alla colonna del prezzo)."""
+        res = max(self.code, self.description, self.price, self.unit or 0) + 1
+        return res
+
+    def project(self, cells: List[str]) -> List[str]:
+        """Estrae [code, description, unit, price, category] dalle celle (vuoto se mancanti)."""
+        def get(idx: Optional[int]) -> str:
+            value = cells[idx] if idx is not None and idx < len(cells) else ""
+            return value
+        res = [get(self.code), get(self.description), get(self.unit), get(self.price), get(self.category)]
+        return res
+
+
+@dataclass
+class FileParseResult:
+    """
+    Esito della lettura di un file sorgente.
+
+    rows contiene le righe valide non ancora consegnate al writer: nella
+    lettura in streaming viene svuotata ad ogni blocco, parsed le conta tutte.
+    """
+    path: str
+    rows: List[PriceRow] = field(default_factory=list)
+    parsed: int = 0
+    rejected: int = 0
+    rejected_samples: List[Tuple[int, str]] = field(default_factory=list)
+    parse_s: float = 0.0
+    error: str = ""
+
+    def reject(self, line_no: int, reason: str) -> None:
+        self.rejected += 1
+        if len(self.rejected_samples) < REJECT_SAMPLES:
+            self.rejected_samples.append((line_no, reason))
+
+
+@dataclass
+class FileImportStat:
+    """Statistiche di import di un singolo file."""
+    path: str
+    parsed: int = 0
+    inserted: int = 0
+    rejected: int = 0
+    parse_s: float = 0.0
+    write_s: float = 0.0
+    error: str = ""
+    rejected_samples: List[Tuple[int, str]] = field(default_factory=list)
+
+
+@dataclass
+class ImportReport:
+    """Report complessivo di un import (uno o più file)."""
+    files: List[FileImportStat] = field(default_factory=list)
+    total_s: float = 0.0
+    index_s: float = 0.0
+    version_id: Optional[int] = None
+
+    @property
+    def inserted(self) -> int:
+        res = sum(f.inserted for f in self.files)
+        return res
+
+    @property
+    def rejected(self) -> int:
+        res = sum(f.rejected for f in self.files)
+        return res
+
+    def summary(self) -> str:
+        """Testo del report, una riga per file più le righe scartate di esempio."""
+        lines = [f"Importate {self.inserted} voci da {len(self.files)} file in {self.total_s:.2f}s "
+                 f"(scartate {self.rejected}; indice somiglianza {self.index_s:.2f}s)", ""]
+        for f in self.files:
+            name = Path(f.path).name
+            if f.error:
+                lines.append(f"{name}: ERRORE {f.error}")
+                continue
+            dup = f.parsed - f.inserted
+            lines.append(f"{name}: lette {f.parsed} | inserite {f.inserted} | già presenti {dup} | "
+                         f"scartate {f.rejected} | lettura {f.parse_s * 1000:.0f} ms | scrittura {f.write_s * 1000:.0f} ms")
+            for line_no, reason in f.rejected_samples:
+                lines.append(f"    riga {line_no}: {reason}")
+        res = "\n".join(lines)
+        return res
+
+
+def parse_price(text: str) -> Optional[float]:
+    """
+    Converte un prezzo testuale in float.
+
+    Accetta "45,00", "45.00", "1.234,56", "1,234.56", "€ 12,5".
+    Restituisce None se il valore non è interpretabile.
+    """
+    s = (text or "").replace("€", "").replace(" ", "").replace(" ", "").strip()
+    if not s:
+        return None
+    if "," in s and "." in s:
+        # Il separatore più a destra è quello decimale
+        if s.rfind(",") > s.rfind("."):
+            s = s.replace(".", "").replace(",", ".")
+        else:
+            s = s.replace(",", "")
+    else:
+        s = s.replace(",", ".")
+    try:
+        value = float(s)
+    except ValueError:
+        value = None
+    return value
+
+
+def category_from_filename(path: str) -> str:
+    """Categoria ricavata dal nome file: "CAP_03_Demolizioni.csv" -> "CAP 03 Demolizioni"."""
+    res = " ".join(Path(path).stem.replace("_", " ").replace("-", " ").split())
+    return res
+
+
+def normalize_row(fields: List[str], line_no: int, category: str,
+                  result: FileParseResult) -> Optional[PriceRow]:
+    """
+    Valida e normalizza i campi [code, description, unit, price, category].
+
+    Le righe non valide vengono registrate in result con il motivo.
+    """
+    code = (fields[0] or "").strip()
+    desc = " ".join((fields[1] or "").split())
+    unit = (fields[2] or "").strip()
+    if not code or not desc:
+        result.reject(line_no, "codice o descrizione mancante")
+        return None
+    price_text = (fields[3] or "").strip()
+    # Prezzo vuoto = voce ancora da completare, importata a 0 come in passato
+    price = parse_price(price_text) if price_text else 0.0
+    if price is None:
+        result.reject(line_no, f"prezzo non valido '{price_text}'")
+        return None
+    if (fields[4] or "").strip():
+        category = fields[4].strip()
+    row = (code, desc, unit, price, category)
+    return row
+
+
+# --- LETTORI DI RIGHE GREZZE ---
+
+def iter_csv_rows(path: str) -> Iterator[RawRow]:
+    """Righe di un CSV delimitato da '|'."""
+    with Path(path).open("r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f, delimiter=CSV_DELIMITER)
+        for line_no, fields in enumerate(reader, start=1):
+            yield line_no, fields
+
+
+def _iter_rows_streaming(stream, row_tag: str, on_start: Callable[[ET.Element], bool],
+                         read_row: Callable[[ET.Element], Iterator[RawRow]]) -> Iterator[RawRow]:
+    """
+    Scorre un XML con iterparse consegnando una riga alla volta.
+
+    Ogni riga letta viene rimossa dal padre, così la memoria resta costante
+    indipendentemente dalla dimensione del foglio. on_start riceve ogni
+    elemento in apertura e indica se le righe successive vanno lette.
+    """
+    stack: List[ET.Element] = []
+    active = False
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            active = on_start(elem) if elem.tag != row_tag else active
+            stack.append(elem)
+            continue
+        stack.pop()
+        if elem.tag != row_tag:
+            continue
+        if active:
+            yield from read_row(elem)
+        if stack:
+            stack[-1].remove(elem)
+
+
+def _xlsx_sheet_path(zf: zipfile.ZipFile, sheet: str) -> str:
+    """Percorso nel pacchetto del foglio richiesto (o del primo)."""
+    workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+    sheets = [(s.get("name"), s.get(f"{_NS_XLSX_REL}id")) for s in workbook.iter(f"{_NS_XLSX}sheet")]
+    if not sheets:
+        raise ValueError("nessun foglio nella cartella di lavoro")
+    chosen = next((rid for name, rid in sheets if name == sheet), None) if sheet else sheets[0][1]
+    if chosen is None:
+        raise ValueError(f"foglio '{sheet}' non trovato (disponibili: {', '.join(n for n, _ in sheets)})")
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    target = next(r.get("Target") for r in rels.iter(f"{_NS_PKG_REL}Relationship") if r.get("Id") == chosen)
+    res = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+    return res
+
+
+class _SharedStrings:
+    """
+    Tabella delle stringhe condivise di un .xlsx.
+
+    Le prime SHARED_STRINGS_IN_MEMORY stringhe restano in una lista, le
+    successive in un database SQLite temporaneo su disco: nei listini le
+    descrizioni sono quasi tutte distinte e la tabella cresce con il file.
+    """
+
+    def __init__(self):
+        self._mem: List[str] = []
+        self._pending: List[Tuple[int, str]] = []
+        self._db: Optional[sqlite3.Connection] = None
+        self._count = 0
+
+    def append(self, text: str) -> None:
+        if self._count < SHARED_STRINGS_IN_MEMORY:
+            self._mem.append(text)
+        else:
+            if self._db is None:
+                # Nome vuoto = database temporaneo su disco, eliminato alla chiusura
+                self._db = sqlite3.connect("")
+                self._db.execute("CREATE TABLE s (idx INTEGER PRIMARY KEY, text TEXT)")
+            self._pending.append((self._count, text))
+            if len(self._pending) >= STREAM_BATCH_SIZE:
+                self._flush()
+        self._count += 1
+
+    def _flush(self) -> None:
+        if self._db is not None and self._pending:
+            self._db.executemany("INSERT INTO s (idx, text) VALUES (?, ?)", self._pending)
+            self._pending = []
+
+    def __getitem__(self, idx: int) -> str:
+        if idx < len(self._mem):
+            res = self._mem[idx]
+            return res
+        self._flush()
+        row = self._db.execute("SELECT text FROM s WHERE idx = ?", (idx,)).fetchone() if self._db else None
+        if row is None:
+            raise IndexError(f"stringa condivisa {idx} inesistente")
+        res = row[0]
+        return res
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def _xlsx_shared_strings(zf: zipfile.ZipFile) -> _SharedStrings:
+    """Legge in streaming la tabella delle stringhe condivise."""
+    strings = _SharedStrings()
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return strings
+    with zf.open("xl/sharedStrings.xml") as f:
+        root = None
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if root is None:
+                root = elem
+            if event == "end" and elem.tag == f"{_NS_XLSX}si":
+                # Testo semplice (t) o rich text (r/t); la fonetica (rPh) è esclusa
+                parts = []
+                for child in elem:
+                    if child.tag == f"{_NS_XLSX}t":
+                        parts.append(child.text or "")
+                    elif child.tag == f"{_NS_XLSX}r":
+                        parts.extend(t.text or "" for t in child.iter(f"{_NS_XLSX}t"))
+                strings.append("".join(parts))
+                root.clear()  # Le voci lette non restano appese alla radice
+    return strings
+
+
+def iter_xlsx_rows(path: str, sheet: str = "") -> Iterator[RawRow]:
+    """Righe di un foglio .xlsx (Office Open XML) lette in streaming."""
+    with zipfile.ZipFile(path) as zf:
+        shared = _xlsx_shared_strings(zf)
+        sheet_path = _xlsx_sheet_path(zf, sheet)
+        counter = [0]
+
+        def read_row(row: ET.Element) -> Iterator[RawRow]:
+            counter[0] = int(row.get("r") or counter[0] + 1)
+            cells: List[str] = []
+            for c in row.iter(f"{_NS_XLSX}c"):
+                ref = c.get("r")
+                col = ColumnMapping.column_index(ref.rstrip("0123456789")) if ref else len(cells)
+                kind = c.get("t", "n")
+                if kind == "inlineStr":
+                    value = "".join(t.text or "" for t in c.iter(f"{_NS_XLSX}t"))
+                else:
+                    v = c.find(f"{_NS_XLSX}v")
+                    value = v.text or "" if v is not None else ""
+                    if kind == "s" and value:
+                        value = shared[int(value)]
+                if col >= len(cells):
+                    cells.extend([""] * (col - len(cells) + 1))
+                cells[col] = value
+            yield counter[0], cells
+
+        try:
+            with zf.open(sheet_path) as f:
+                yield from _iter_rows_streaming(f, f"{_NS_XLSX}row", lambda e: True, read_row)
+        finally:
+            shared.close()
+
+
+def _ods_text(elem: ET.Element) -> str:
+    """Testo di una cella ODS, con spazi (text:s), tabulazioni e a capo espliciti."""
+    parts = [elem.text or ""]
+    for child in elem:
+        if child.tag == f"{_NS_ODS_TEXT}s":
+            parts.append(" " * int(child.get(f"{_NS_ODS_TEXT}c", "1")))
+        elif child.tag in (f"{_NS_ODS_TEXT}tab", f"{_NS_ODS_TEXT}line-break"):
+            parts.append(" ")
+        else:
+            parts.append(_ods_text(child))
+        parts.append(child.tail or "")
+    res = "".join(parts)
+    return res
+
+
+def iter_ods_rows(path: str, sheet: str = "") -> Iterator[RawRow]:
+    """Righe di un foglio .ods (OpenDocument) lette in streaming."""
+    table_tag = f"{_NS_ODS_TABLE}table"
+    cell_tags = (f"{_NS_ODS_TABLE}table-cell", f"{_NS_ODS_TABLE}covered-table-cell")
+    tables_seen = [0]
+    counter = [0]
+    state = [False]             # Righe della tabella corrente da leggere
+    found = [False]             # Tabella richiesta incontrata
+
+    def on_start(elem: ET.Element) -> bool:
+        if elem.tag != table_tag:
+            active = state[0]
+            return active
+        tables_seen[0] += 1
+        name = elem.get(f"{_NS_ODS_TABLE}name", "")
+        state[0] = (name == sheet) if sheet else tables_seen[0] == 1
+        if state[0]:
+            found[0] = True
+        active = state[0]
+        return active
+
+    def read_row(row: ET.Element) -> Iterator[RawRow]:
+        repeat = int(row.get(f"{_NS_ODS_TABLE}number-rows-repeated", "1"))
+        cells: List[str] = []
+        width = 0
+        for c in row:
+            if c.tag not in cell_tags:
+                continue
+            span = int(c.get(f"{_NS_ODS_TABLE}number-columns-repeated", "1"))
+            if c.get(f"{_NS_ODS_OFFICE}value-type") in ("float", "currency", "percentage"):
+                value = c.get(f"{_NS_ODS_OFFICE}value", "")
+            else:
+                value = "\n".join(_ods_text(p) for p in c.iter(f"{_NS_ODS_TEXT}p"))
+            if value:
+                # Le celle vuote ripetute (anche migliaia) non vengono materializzate
+                cells.extend([""] * (width - len(cells)))
+                cells.extend([value] * span)
+            width += span
+        if not cells:
+            counter[0] += repeat
+            return
+        for _ in range(repeat):
+            counter[0] += 1
+            yield counter[0], list(cells)
+
+    with zipfile.ZipFile(path) as zf:
+        with zf.open("content.xml") as f:
+            yield from _iter_rows_streaming(f, f"{_NS_ODS_TABLE}table-row", on_start, read_row)
+    if sheet and not found[0]:
+        raise ValueError(f"foglio '{sheet}' non trovato")
+
+
+def iter_file_rows(path: str, sheet: str = "") -> Iterator[RawRow]:
+    """Righe grezze di un listino, scegliendo il lettore dall'estensione."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".xlsx":
+        rows = iter_xlsx_rows(path, sheet)
+    elif suffix == ".ods":
+        rows = iter_ods_rows(path, sheet)
+    else:
+        rows = iter_csv_rows(path)
+    return rows
+
+
+def preview_rows(path: str, limit: int = 8, sheet: str = "") -> List[RawRow]:
+    """Prime righe non vuote di un listino (per scegliere la mappatura delle colonne)."""
+    res: List[RawRow] = []
+    for line_no, cells in iter_file_rows(path, sheet):
+        if any(x.strip() for x in cells):
+            res.append((line_no, cells))
+        if len(res) >= limit:
+            break
+    return res
+
+
+def parse_price_file(path: str, category: Optional[str] = None,
+                     mapping: Optional[ColumnMapping] = None,
+                     sink: Optional[Callable[[List[PriceRow]], None]] = None) -> FileParseResult:
+    """
+    Legge e valida un listino (.csv, .xlsx, .ods) secondo la mappatura delle colonne.
+
+    Le righe di intestazione iniziali ("Tariffa...", etichette come "Codice" o
+    "Descrizione", prezzo vuoto o testuale) vengono saltate. Una colonna
+    categoria valorizzata prevale sulla categoria indicata.
+
+    Args:
+        path: File sorgente.
+        category: Categoria di default; se None, ricavata dal nome file.
+        mapping: Posizione delle colonne; se None, il tracciato storico.
+        sink: Se indicato, riceve le righe valide a blocchi di STREAM_BATCH_SIZE
+            (memoria costante); altrimenti le righe restano in result.rows.
+    """
+    start = time.perf_counter()
+    result = FileParseResult(path=str(path))
+    mapping = mapping or ColumnMapping()
+    default_cat = category if category is not None else category_from_filename(path)
+    is_csv = Path(path).suffix.lower() not in SPREADSHEET_SUFFIXES
+    seen_data = False
+    try:
+        for line_no, cells in iter_file_rows(path, mapping.sheet):
+            if not cells or not any(x.strip() for x in cells):
+                continue
+            fields = mapping.project(cells)
+            if not seen_data:
+                price_text = fields[3].strip()
+                labels = {f.strip().rstrip(".:").lower() for f in fields[:2]}
+                if ("Tariffa" in fields[0] or not price_text or parse_price(price_text) is None
+                        or labels & _HEADER_LABELS):
+                    continue
+            seen_data = True
+            # Nei CSV i separatori sono espliciti: una riga corta è malformata
+            # (i fogli di calcolo invece omettono le celle vuote finali)
+            if is_csv and len(cells) < mapping.min_columns:
+                result.reject(line_no, f"colonne insufficienti ({len(cells)})")
+                continue
+            row = normalize_row(fields, line_no, default_cat, result)
+            if not row:
+                continue
+            result.rows.append(row)
+            result.parsed += 1
+            if sink and len(result.rows) >= STREAM_BATCH_SIZE:
+                sink(result.rows)
+                result.rows = []
+        if sink and result.rows:
+            sink(result.rows)
+            result.rows = []
+    except Exception as e:
+        result.error = str(e)
+    result.parse_s = time.perf_counter() - start
+    return result
+
+
+def parse_csv_file(path: str, category: Optional[str] = None) -> FileParseResult:
+    """Legge un listino CSV delimitato da '|' con il tracciato storico a indici fissi."""
+    res = parse_price_file(path, category)
+    return res
+
+
+# --- ELENCO FILE DA IMPORTARE ---
+
+@dataclass
+class DirEntryInfo:
+    """Voce di una cartella mostrata nel selettore di import."""
+    name: str
+    is_dir: bool
+    size: int = 0
+    est_rows: Optional[int] = None  # Solo CSV; None = non ancora stimato
+
+
+def estimate_csv_rows(path: str, size: int) -> Optional[int]:
+    """
+    Stima le righe di un CSV dalla lunghezza media delle prime ESTIMATE_SAMPLE_BYTES.
+
+    Per i file più piccoli del campione il conteggio è esatto.
+    """
+    try:
+        with open(path, "rb") as f:
+            sample = f.read(ESTIMATE_SAMPLE_BYTES)
+    except OSError:
+        return None
+    if not sample:
+        return 0
+    lines = sample.count(b"\n")
+    if len(sample) >= size:
+        res = lines + (0 if sample.endswith(b"\n") else 1)
+        return res
+    res = int(size * max(lines, 1) / len(sample))
+    return res
+
+
+class DirectoryCache:
+    """
+    Contenuto delle cartelle già visitate nel selettore di import.
+
+    Una voce resta valida finché la mtime della cartella non cambia (file
+    aggiunti, rimossi o rinominati). Thread-safe: la scansione avviene in
+    un thread di lavoro, lontano dal thread della GUI.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[int, List[DirEntryInfo]]] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Dimentica una cartella (o tutte)."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(path), None)
+
+    def listing(self, path: str,
+                on_entries: Callable[[List[DirEntryInfo]], None],
+                on_estimates: Callable[[List[DirEntryInfo]], None],
+                cancelled: Callable[[], bool] = lambda: False) -> Optional[List[DirEntryInfo]]:
+        """
+        Elenca sottocartelle (non nascoste) e listini importabili di path.
+
+        Dalla cache consegna tutto in un unico blocco; altrimenti scandisce con
+        os.scandir consegnando le voci a blocchi di LISTING_BATCH e, in una
+        seconda passata, le stime delle righe dei CSV.
+
+        Returns:
+            Le voci della cartella, None se la scansione è stata annullata.
+        """
+        path = str(path)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._entries.get(path)
+        if cached and cached[0] == mtime:
+            hit = cached[1]
+            on_entries(hit)
+            return hit
+
+        entries: List[DirEntryInfo] = []
+        batch: List[DirEntryInfo] = []
+        with os.scandir(path) as it:
+            for e in it:
+                if cancelled():
+                    return None
+                try:
+                    if e.is_dir():
+                        if e.name.startswith("."):
+                            continue
+                        info = DirEntryInfo(e.name, True)
+                    elif e.is_file() and e.name.lower().endswith(IMPORT_SUFFIXES):
+                        info = DirEntryInfo(e.name, False, e.stat().st_size)
+                    else:
+                        continue
+                except OSError:
+                    continue
+                entries.append(info)
+                batch.append(info)
+                if len(batch) >= LISTING_BATCH:
+                    on_entries(batch)
+                    batch = []
+        if batch:
+            on_entries(batch)
+
+        batch = []
+        for info in entries:
+            if cancelled():
+                return None
+            if info.is_dir or not info.name.lower().endswith(".csv"):
+                continue
+            info.est_rows = estimate_csv_rows(os.path.join(path, info.name), info.size)
+            batch.append(info)
+            if len(batch) >= LISTING_BATCH:
+                on_estimates(batch)
+                batch = []
+        if batch:
+            on_estimates(batch)
+
+        with self._lock:
+            self._entries[path] = (mtime, entries)
+        return entries
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Maintenance Engine - Backup a caldo e manutenzione del database.
+
+Esegue backup online con sqlite3.Connection.backup a blocchi di pagine
+(l'applicazione può continuare a scrivere), la rotazione delle copie,
+la verifica di integrità, l'aggiornamento delle statistiche (ANALYZE /
+PRAGMA optimize) e la compattazione incrementale (incremental_vacuum).
+Ogni operazione restituisce durata e spazio recuperato.
+"""
+
+__date__ = "2026-10-19"
+__version__ = "1.0.0"
+__author__ = "Gemini CLI"
+
+import sys
+import json
+import time
+import sqlite3
+from pathlib import Path
+from typing import List, Dict, Optional, Callable
+from dataclasses import dataclass
+from datetime import datetime
+
+BACKUP_DIRNAME = "backups"
+BACKUP_KEEP = 7                 # Copie conservate per ciascun database
+BACKUP_PAGES_PER_STEP = 256     # Pagine copiate per passo
+BACKUP_STEP_PAUSE = 0.005       # Pausa (s) tra i passi per lasciare spazio agli scrittori
+VACUUM_PAGES = 2000             # Pagine libere restituite per ogni incremental_vacuum
+IDLE_SECONDS = 120              # Inattività minima dell'utente prima della manutenzione automatica
+STATE_FILENAME = "maintenance_state.json"
+
+# Intervallo minimo (secondi) tra due esecuzioni automatiche di ciascuna attività
+# (ordine di esecuzione: prima la verifica, poi il backup di un DB sano)
+DEFAULT_INTERVALS: Dict[str, int] = {
+    "integrity": 7 * 24 * 3600,
+    "backup": 24 * 3600,
+    "optimize": 24 * 3600,
+    "vacuum": 7 * 24 * 3600,
+}
+
+
+@dataclass
+class MaintenanceResult:
+    """Esito di una singola attività di manutenzione."""
+    task: str
+    ok: bool
+    duration_s: float
+    bytes_before: int
+    bytes_after: int
+    detail: str
+
+    @property
+    def reclaimed(self) -> int:
+        """Byte recuperati (negativo se il file è cresciuto)."""
+        res = self.bytes_before - self.bytes_after
+        return res
+
+    def summary(self) -> str:
+        """Riga leggibile per log e barra di stato."""
+        state = "OK" if self.ok else "ERRORE"
+        res = f"{self.task.upper()} {state} in {self.duration_s:.2f}s | recuperati {self.reclaimed / 1024:.1f} KB | {self.detail}"
+        return res
+
+
+class MaintenanceService:
+    """Servizio di manutenzione per il database principale (e l'eventuale archivio)."""
+
+    def __init__(self, db_path: Path, archive_path: Optional[Path] = None,
+                 backup_dir: Optional[Path] = None, keep: int = BACKUP_KEEP):
+        """
+        Inizializza il servizio.
+
+        Args:
+            db_path: Database principale.
+            archive_path: Database di archivio, incluso nei backup se esiste.
+            backup_dir: Cartella delle copie. Se None, usa backups/ accanto al DB.
+            keep: Numero di copie da conservare per ciascun database.
+        """
+        self.db_path = Path(db_path)
+        self.archive_path = Path(archive_path) if archive_path else None
+        self.backup_dir = Path(backup_dir) if backup_dir else self.db_path.parent / BACKUP_DIRNAME
+        self.keep = keep
+        self.state_path = self.backup_dir / STATE_FILENAME
+
+    def _connect(self, path: Path) -> sqlite3.Connection:
+        """Connessione dedicata alla manutenzione, tollerante ai lock brevi."""
+        conn = sqlite3.connect(path, timeout=30)
+        return conn
+
+    def _size(self) -> int:
+        """Dimensione su disco del database principale (incluso WAL)."""
+        total = 0
+        for p in (self.db_path, self.db_path.with_name(self.db_path.name + "-wal")):
+            if p.exists():
+                total += p.stat().st_size
+        return total
+
+    # --- ATTIVITÀ ---
+
+    def backup(self, progress: Optional[Callable[[int, int], None]] = None) -> MaintenanceResult:
+        """
+        Backup online a blocchi di pagine, seguito dalla rotazione delle copie.
+
+        La copia viene scritta in un file .part e rinominata solo a fine backup,
+        così una copia interrotta non viene mai scambiata per valida.
+        """
+        start = time.perf_counter()
+        size = self._size()
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        sources = [self.db_path]
+        if self.archive_path and self.archive_path.exists():
+            sources.append(self.archive_path)
+
+        written = []
+        ok = True
+        detail = ""
+
+        def on_step(status: int, remaining: int, total: int) -> None:
+            if progress:
+                progress(total - remaining, total)
+            time.sleep(BACKUP_STEP_PAUSE)
+
+        try:
+            for src_path in sources:
+                target = self.backup_dir / f"{src_path.stem}_{stamp}{src_path.suffix}"
+                part = target.with_name(target.name + ".part")
+                src = self._connect(src_path)
+                dst = sqlite3.connect(part)
+                try:
+                    src.backup(dst, pages=BACKUP_PAGES_PER_STEP, progress=on_step)
+                finally:
+                    dst.close()
+                    src.close()
+                part.replace(target)
+                written.append(target)
+            removed = self.rotate()
+            detail = f"{', '.join(p.name for p in written)} (rimossi {removed} vecchi)"
+        except Exception as e:
+            ok = False
+            detail = str(e)
+
+        res = MaintenanceResult("backup", ok, time.perf_counter() - start, size, size, detail)
+        return res
+
+    def rotate(self) -> int:
+        """Elimina le copie più vecchie oltre il limite keep. Restituisce quante ne ha rimosse."""
+        removed = 0
+        sources = [self.db_path]
+        if self.archive_path:
+            sources.append(self.archive_path)
+        for src_path in sources:
+            copies = sorted(self.backup_dir.glob(f"{src_path.stem}_????????_??????{src_path.suffix}"))
+            for old in copies[:max(0, len(copies) - self.keep)]:
+                old.unlink()
+                removed += 1
+        return removed
+
+    def list_backups(self) -> List[Path]:
+        """Copie presenti, dalla più recente."""
+        if not self.backup_dir.exists():
+            return []
+        copies = sorted(self.backup_dir.glob(f"*_????????_??????{self.db_path.suffix}"), reverse=True)
+        return copies
+
+    def integrity_check(self) -> MaintenanceResult:
+        """PRAGMA integrity_check sul database principale."""
+        start = time.perf_counter()
+        size = self._size()
+        ok = False
+        detail = ""
+        conn = self._connect(self.db_path)
+        try:
+            rows = [r[0] for r in conn.execute("PRAGMA integrity_check").fetchall()]
+            ok = rows == ["ok"]
+            detail = "integrità ok" if ok else "; ".join(rows[:10])
+        except Exception as e:
+            detail = str(e)
+        finally:
+            conn.close()
+
+        res = MaintenanceResult("integrity", ok, time.perf_counter() - start, size, size, detail)
+        return res
+
+    def optimize(self) -> MaintenanceResult:
+        """Aggiorna le statistiche del pianificatore (ANALYZE + PRAGMA optimize)."""
+        start = time.perf_counter()
+        size = self._size()
+        ok = False
+        detail = ""
+        conn = self._connect(self.db_path)
+        try:
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA optimize")
+            conn.commit()
+            ok = True
+            detail = "statistiche aggiornate"
+        except Exception as e:
+            detail = str(e)
+        finally:
+            conn.close()
+
+        res = MaintenanceResult("optimize", ok, time.perf_counter() - start, size, self._size(), detail)
+        return res
+
+    def incremental_vacuum(self, max_pages: int = VACUUM_PAGES, convert: bool = False) -> MaintenanceResult:
+        """
+        Restituisce al file system le pagine libere.
+
+        Un database non ancora in auto_vacuum=INCREMENTAL va convertito con un
+        VACUUM completo (una sola volta), che blocca le scritture per tutta la
+        durata: avviene solo con convert=True (azione confermata dall'utente),
+        altrimenti l'attività si limita a segnalarlo.
+        """
+        start = time.perf_counter()
+        size = self._size()
+        ok = False
+        detail = ""
+        conn = self._connect(self.db_path)
+        try:
+            mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            if mode != 2 and not convert:
+                free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                ok = True
+                detail = f"database non in auto_vacuum incrementale (pagine libere {free}): conversione solo da COMPATTA"
+            else:
+                if mode != 2:
+                    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                    conn.execute("VACUUM")
+                    detail = "convertito ad auto_vacuum incrementale; "
+                free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                conn.execute(f"PRAGMA incremental_vacuum({int(max_pages)})").fetchall()
+                free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                conn.commit()
+                ok = True
+                detail += f"pagine libere {free_before} -> {free_after}"
+        except Exception as e:
+            detail += str(e)
+        finally:
+            conn.close()
+
+        res = MaintenanceResult("vacuum", ok, time.perf_counter() - start, size, self._size(), detail)
+        return res
+
+    # --- PIANIFICAZIONE ---
+
+    def _load_state(self) -> Dict[str, float]:
+        if not self.state_path.exists():
+            return {}
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except Exception:
+            state = {}
+        return state
+
+    def _save_state(self, state: Dict[str, float]) -> None:
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        self.state_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+
+    def due_tasks(self, now: Optional[float] = None,
+                  intervals: Optional[Dict[str, int]] = None) -> List[str]:
+        """Attività il cui intervallo minimo è trascorso dall'ultima esecuzione riuscita."""
+        now = now if now is not None else time.time()
+        intervals = intervals or DEFAULT_INTERVALS
+        state = self._load_state()
+        due = [t for t, every in intervals.items() if now - state.get(t, 0) >= every]
+        return due
+
+    def run_tasks(self, tasks: List[str],
+                  progress: Optional[Callable[[int, int], None]] = None) -> List[MaintenanceResult]:
+        """Esegue le attività indicate, nell'ordine, e registra quelle riuscite."""
+        runners = {
+            "integrity": self.integrity_check,
+            "backup": lambda: self.backup(progress),
+            "optimize": self.optimize,
+            "vacuum": self.incremental_vacuum,
+            "compact": lambda: self.incremental_vacuum(convert=True),
+        }
+        results = []
+        state = self._load_state()
+        for task in tasks:
+            runner = runners.get(task)
+            if not runner:
+                continue
+            result = runner()
+            results.append(result)
+            if result.ok:
+                state[task] = time.time()
+        self._save_state(state)
+        return results
+
+    def run_due(self, now: Optional[float] = None) -> List[MaintenanceResult]:
+        """Esegue solo le attività scadute (per la manutenzione automatica a riposo)."""
+        tasks = [t for t in DEFAULT_INTERVALS if t in self.due_tasks(now)]
+        results = self.run_tasks(tasks)
+        return results
+
+
+def do_main() -> None:
+    """Uso da riga di comando: python3 maintenance_engine.py [backup|integrity|optimize|vacuum|compact|due]... | list"""
+    from data_engine import DataManager
+    db = DataManager()
+    service = MaintenanceService(db.db_path, db.archive_path)
+    tasks = sys.argv[1:] or ["due"]
+    if tasks == ["list"]:
+        for p in service.list_backups():
+            print(f"{p.name}  {p.stat().st_size / 1024:.0f} KB")
+        return
+    results = service.run_due() if tasks == ["due"] else service.run_tasks(tasks)
+    for r in results:
+        print(r.summary())
+        if r.task == "backup" and r.ok:
+            print(f"Copie presenti: {', '.join(p.name for p in service.list_backups())}")
+
+
+if __name__ == "__main__":
+    do_main()
@@ -12,6 +12,10 @@ __author__ = "Gemini CLI"
 
 import sys
 import os
+import time
+import multiprocessing
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, simpledialog
 from pathlib import Path
@@ -19,7 +23,17 @@ from typing import Optional, List, Any, Dict, Callable
 
 # Import locali diretti
 import gui_config as cfg
-from data_engine import DataManager, PriceItem, QuoteHeader, QuoteLineItem
+from data_engine import DataManager, PriceItem, QuoteHeader, QuoteLineItem, DEFAULT_ARCHIVE_AGE_DAYS
+from maintenance_engine import MaintenanceService, IDLE_SECONDS
+from export_engine import EXPORTS_DIR, ExportCache, refresh_exports
+from gui_loader import TreeLoader
+from import_engine import ColumnMapping, DirectoryCache, DirEntryInfo, SPREADSHEET_SUFFIXES, preview_rows
+
+MAINT_CHECK_MS = 60000      # Frequenza di controllo per la manutenzione a riposo
+MAINT_POLL_MS = 300         # Frequenza di lettura dei risultati dal thread di manutenzione
+IMPORT_POLL_MS = 200        # Frequenza di controllo della fine dell'import in background
+BROWSE_POLL_MS = 50         # Frequenza di lettura delle voci dal thread di scansione cartelle
+PREFETCH_NEIGHBOURS = 2     # Preventivi precaricati sopra e sotto quello selezionato
 
 
 class PreventiviApp:
@@ -39,11 +53,36 @@ class PreventiviApp:
         self.sort_order = {
             "prices": {"col": None, "reverse": False},
             "quotes": {"col": None, "reverse": False},
-            "items": {"col": None, "reverse": False}
+            "items": {"col": None, "reverse": False},
+            "popup": {"col": None, "reverse": False},
+            "report": {"col": None, "reverse": False}
         }
         
-        # Percorso corrente per il selettore file personalizzato
+        # Percorso corrente e cache delle cartelle per il selettore file personalizzato
         self.current_browser_path = Path(__file__).parent
+        self.dir_cache = DirectoryCache()
+        
+        # Manutenzione in background (thread dedicato, risultati via coda)
+        self.maint = MaintenanceService(self.db.db_path, self.db.archive_path)
+        self.maint_queue: "queue.Queue[tuple]" = queue.Queue()
+        self.maint_busy = False
+        self.last_activity = time.time()
+        
+        # Import prezzari in background
+        self.import_queue: "queue.Queue[Any]" = queue.Queue()
+        self.import_busy = False
+        self.import_mapping = ColumnMapping()   # Ultima mappatura colonne usata per i fogli di calcolo
+        
+        # Manifest delle esportazioni: i file già aggiornati non vengono riscritti
+        self.export_cache = ExportCache(EXPORTS_DIR)
+        
+        # Report duplicati del prezzario in background
+        self.dedup_queue: "queue.Queue[Any]" = queue.Queue()
+        self.dedup_busy = False
+        
+        # Precaricamento in cache dei preventivi vicini (un thread, conta solo l'ultima richiesta)
+        self.prefetch_queue: "queue.Queue[List[int]]" = queue.Queue()
+        threading.Thread(target=self._prefetch_worker, daemon=True).start()
         
         self._setup_styles()
         self._create_header()
@@ -73,7 +112,7 @@ class PreventiviApp:
         tk.Button(header, text=" ESCI ", command=self.root.quit, bg="#AA0000", fg="white", font=cfg.FONT_HEADER, relief="flat", padx=20).pack(side=tk.RIGHT, padx=10, pady=10)
         tk.Button(header, text=" GUIDA ", command=self._show_help, bg="#444444", fg=cfg.COLOR_WARN, font=cfg.FONT_HEADER, relief="flat", padx=20).pack(side=tk.RIGHT, padx=5, pady=10)
 
-    def _custom_confirm(self, title: str, message: str, callback_yes: Callable) -> None:
+    def _custom_confirm(self, title: str, message: str, callback_yes: Callable, callback_no: Optional[Callable] = None) -> None:
         """Finestra di conferma con pulsanti grandi SÌ (VERDE) a sinistra e NO (ROSSO) a destra."""
         win = tk.Toplevel(self.root)
         win.title(title)
@@ -89,7 +128,9 @@ class PreventiviApp:
         btn_frame.pack(fill=tk.X, pady=10)
         
         def on_yes(): win.destroy(); callback_yes()
-        def on_no(): win.destroy()
+        def on_no():
+            win.destroy()
+            if callback_no: callback_no()
 
         # SÌ a sinistra (Verde), NO a destra (Rosso)
         tk.Button(btn_frame, text="  SÌ  ", command=on_yes, bg="#008800", fg="white", font=cfg.FONT_HEADER, width=12).pack(side=tk.LEFT, padx=40)
@@ -109,11 +150,18 @@ class PreventiviApp:
         self.tab_quotes = ttk.Frame(self.notebook); self.notebook.add(self.tab_quotes, text="  GESTIONE PREVENTIVI  ")
         self._build_quotes_tab()
         
+        self.tab_report = ttk.Frame(self.notebook); self.notebook.add(self.tab_report, text="  REPORT  ")
+        self._build_report_tab()
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+        
+        self.tab_system = ttk.Frame(self.notebook); self.notebook.add(self.tab_system, text="  SISTEMA  ")
+        self._build_system_tab()
+        
         self._update_status()
 
     def _update_status(self) -> None:
         stats = self.db.get_stats()
-        self.status_bar.config(text=f" Database Attivo | Voci: {stats['prices']} | Preventivi: {stats['quotes']}")
+        self.status_bar.config(text=f" Database Attivo | Voci: {stats['prices']} | Preventivi: {stats['quotes']} | Versioni listino: {stats['versions']}")
 
     def _show_help(self) -> None:
         """Manuale tecnico dell'applicazione."""
@@ -125,21 +173,54 @@ class PreventiviApp:
 
 1. GESTIONE PREZZARIO
 ----------------------------------------------------------------------
-• IMPORTA CSV: Scegli un file CSV dal tuo computer. Puoi navigare tra 
-  le cartelle cliccando sui nomi e selezionare il file desiderato. 
-  Non c'è alcun campo di testo "Nome File" superfluo.
+• IMPORTA LISTINO: Scegli uno o più file CSV, XLSX o ODS (Ctrl/Shift
+  + clic). Puoi navigare tra le cartelle cliccando sui nomi. Per i fogli
+  di calcolo indica foglio e colonne aiutandoti con l'anteprima. I file
+  vengono letti in parallelo e al termine un report mostra voci inserite,
+  tempi e righe scartate (es. prezzo non valido) per ciascun file.
 • ORDINAMENTO: Clicca sull'intestazione di una colonna per ordinare 
   i dati (A-Z / Z-A).
 • AZIONI RIGA: NUOVO, SALVA e ELIMINA SINGOLA VOCE.
-• AZIONI TABELLA: IMPORTA CSV e CANCELLA PREZZARIO.
+• VOCI SIMILI: Elenca le voci con descrizione uguale o simile a quella
+  della voce selezionata (codice diverso), con la percentuale di
+  somiglianza. Doppio clic per aprire una voce nel dettaglio.
+• AZIONI TABELLA: IMPORTA LISTINO e CANCELLA PREZZARIO.
+• REPORT DUPLICATI: Raggruppa le voci identiche o quasi identiche di
+  tutto il prezzario (utile dopo aver unito più listini).
 
 2. GESTIONE PREVENTIVI
 ----------------------------------------------------------------------
 • NUOVO PREVENTIVO: Inserisci il nome cliente.
+• DUPLICA: Copia il preventivo selezionato per un nuovo cliente,
+  con la possibilità di aggiornare i prezzi al prezzario corrente.
+• SALVA MODELLO / DA MODELLO: Salva le righe come modello riutilizzabile
+  e crea nuovi preventivi a partire dai modelli salvati.
+• ARCHIVIO: Cerca e consulta i preventivi archiviati, ripristinali o
+  sposta in archivio quelli più vecchi (il DB principale resta leggero).
 • AGGIUNGI VOCE: Seleziona la lavorazione e indica la quantità.
-• ESPORTA TXT: Salva il preventivo formattato in 'exports/'.
+• ESPORTA TXT: Salva il preventivo formattato in 'exports/' (se il
+  file è già aggiornato non viene riscritto).
+
+3. REPORT
+----------------------------------------------------------------------
+• Ricavi per mese, clienti principali, voci più preventivate e medie.
+  I dati sono aggiornati automaticamente ad ogni modifica.
+• RICALCOLA: Ricostruisce da zero gli aggregati (operazione massiva).
 
-3. COMANDI DI SISTEMA
+4. SISTEMA
+----------------------------------------------------------------------
+• BACKUP ORA: Copia a caldo del database in 'data/backups/' (le copie
+  più vecchie vengono ruotate). Si può continuare a lavorare.
+• VERIFICA / OTTIMIZZA / COMPATTA: Controllo integrità, statistiche e
+  recupero spazio. Eseguite anche in automatico quando il programma
+  è inattivo. Su un database vecchio solo COMPATTA (con conferma)
+  lo converte alla compattazione incrementale, riscrivendolo per intero.
+• AGGIORNA ESPORTAZIONI: Riscrive solo i file in 'exports/' dei
+  preventivi modificati dopo l'ultima esportazione.
+• STATISTICHE CACHE: Occupazione ed efficacia (hit/miss) della cache
+  dei preventivi aperti di recente e di quelli vicini precaricati.
+
+5. COMANDI DI SISTEMA
 ----------------------------------------------------------------------
 • ESCI: Chiude il programma (tasto rosso in alto).
 • CONFERME: Usa SÌ (VERDE) a sinistra o NO (ROSSO) a destra.
@@ -181,82 +262,234 @@ class PreventiviApp:
         tk.Button(b_frame, text="NUOVO", command=self._clear_price_form, **b_style).pack(fill=tk.X, pady=2)
         tk.Button(b_frame, text="SALVA / AGGIORNA", command=self._save_price, **b_style).pack(fill=tk.X, pady=2)
         tk.Button(b_frame, text="ELIMINA SINGOLA VOCE", command=self._delete_price, **b_style).pack(fill=tk.X, pady=2)
+        tk.Button(b_frame, text="VOCI SIMILI", command=self._similar_items_dialog, **b_style).pack(fill=tk.X, pady=2)
         
         tk.Frame(b_frame, height=40, bg=cfg.COLOR_BG_PANEL).pack() # Separatore
         
         # Gruppo Azioni su Tabella
-        tk.Button(b_frame, text="IMPORTA CSV", command=self._custom_file_browser, **b_style).pack(fill=tk.X, pady=2)
+        tk.Button(b_frame, text="IMPORTA LISTINO", command=self._custom_file_browser, **b_style).pack(fill=tk.X, pady=2)
+        tk.Button(b_frame, text="REPORT DUPLICATI", command=self._run_dedup_report, **b_style).pack(fill=tk.X, pady=2)
         tk.Button(b_frame, text="CANCELLA PREZZARIO", command=lambda: self._custom_confirm("Reset Totale", "Svuotare TUTTO il prezzario?", self._do_clear_table), bg="#660000", fg="white", font=cfg.FONT_HEADER).pack(fill=tk.X, pady=10)
         self._load_prices()
 
     def _custom_file_browser(self) -> None:
-        """Selettore file navigabile senza alcun campo 'Nome File' inutile."""
-        win = tk.Toplevel(self.root); win.title("Naviga e Seleziona CSV"); win.geometry("600x500"); win.configure(bg=cfg.COLOR_BG_PANEL)
-        win.transient(self.root); win.grab_set(); win.geometry(f"+{self.root.winfo_x() + 250}+{self.root.winfo_y() + 150}")
+        """
+        Selettore file navigabile senza alcun campo 'Nome File' inutile.
+        
+        Il contenuto delle cartelle viene letto in un thread (os.scandir, cache per
+        cartella invalidata dalla mtime) e compare a blocchi; per i CSV sono mostrate
+        dimensione e righe stimate.
+        """
+        win = tk.Toplevel(self.root); win.title("Naviga e Seleziona Listini"); win.geometry("700x500"); win.configure(bg=cfg.COLOR_BG_PANEL)
+        win.transient(self.root); win.grab_set(); win.geometry(f"+{self.root.winfo_x() + 200}+{self.root.winfo_y() + 150}")
         
         # Variabile per il percorso attuale
         path_var = tk.StringVar(value=str(self.current_browser_path))
-        tk.Label(win, textvariable=path_var, bg=cfg.COLOR_BG_PANEL, fg=cfg.COLOR_ACCENT, wraplength=550).pack(pady=5)
+        tk.Label(win, textvariable=path_var, bg=cfg.COLOR_BG_PANEL, fg=cfg.COLOR_ACCENT, wraplength=650).pack(pady=5)
         
-        lb = tk.Listbox(win, bg="#111111", fg="#FFFFFF", font=cfg.FONT_MONO, borderwidth=0, highlightthickness=1)
+        lb = tk.Listbox(win, bg="#111111", fg="#FFFFFF", font=cfg.FONT_MONO, borderwidth=0, highlightthickness=1, selectmode=tk.EXTENDED)
         lb.pack(fill=tk.BOTH, expand=True, padx=20, pady=5)
+        info_var = tk.StringVar(value="Ctrl/Shift + clic per selezionare più file")
+        tk.Label(win, textvariable=info_var, bg=cfg.COLOR_BG_PANEL, fg="white").pack()
         
-        def refresh_lb():
-            lb.delete(0, tk.END)
-            lb.insert(tk.END, ".. [Torna Su]")
+        # Voci mostrate (indice Listbox -> voce; None = "Torna Su") e scansione corrente
+        shown: List[Optional[DirEntryInfo]] = []
+        scan = {"gen": 0, "queue": queue.Queue()}
+        
+        def entry_text(e: DirEntryInfo) -> str:
+            if e.is_dir: return f"DIR: {e.name}"
+            rows = f"~{e.est_rows:,} righe".replace(",", ".") if e.est_rows is not None else ""
+            return f"{e.name:<40} {self._format_size(e.size):>9} {rows:>15}"
+        
+        def render(entries: List[DirEntryInfo]):
+            # Selezione e scorrimento fatti durante la lettura progressiva restano validi
+            selected = {shown[i].name for i in lb.curselection() if i < len(shown) and shown[i]}
+            top = lb.yview()[0]
+            ordered = sorted(entries, key=lambda e: (not e.is_dir, e.name.lower()))
+            lb.delete(0, tk.END); shown.clear()
+            lb.insert(tk.END, ".. [Torna Su]"); shown.append(None)
+            for e in ordered:
+                lb.insert(tk.END, entry_text(e)); shown.append(e)
+                if e.name in selected: lb.selection_set(len(shown) - 1)
+            lb.yview_moveto(top)
+        
+        def poll(gen: int):
+            if not win.winfo_exists() or gen != scan["gen"]: return
+            done = False
             try:
-                # Cartelle
-                for p in sorted(self.current_browser_path.iterdir()):
-                    if p.is_dir() and not p.name.startswith("."):
-                        lb.insert(tk.END, f"DIR: {p.name}")
-                # File CSV
-                for p in sorted(self.current_browser_path.glob("*.csv")):
-                    lb.insert(tk.END, p.name)
-            except Exception as e:
-                lb.insert(tk.END, f"ERRORE: {e}")
+                while True:
+                    kind, payload = scan["queue"].get_nowait()
+                    if kind == "entries":
+                        for e in payload: lb.insert(tk.END, entry_text(e)); shown.append(e)
+                        info_var.set(f"Lettura cartella... {len(shown) - 1} voci")
+                    elif kind == "estimates":
+                        # Aggiorna solo le righe interessate, mantenendo la selezione
+                        pos = {id(e): i for i, e in enumerate(shown)}
+                        for e in payload:
+                            i = pos.get(id(e))
+                            if i is None: continue
+                            selected = lb.selection_includes(i)
+                            lb.delete(i); lb.insert(i, entry_text(e))
+                            if selected: lb.selection_set(i)
+                    elif kind == "done":
+                        done = True
+                        if payload is not None: render(payload)
+                    elif kind == "error":
+                        done = True; lb.insert(tk.END, f"ERRORE: {payload}"); shown.append(None)
+            except queue.Empty:
+                pass
+            if done:
+                files = [e for e in shown if e and not e.is_dir]
+                info_var.set(f"{len(files)} listini | Ctrl/Shift + clic per selezionare più file")
+            else:
+                win.after(BROWSE_POLL_MS, poll, gen)
+        
+        def refresh_lb():
+            # Una nuova scansione rende obsolete quelle ancora in corso
+            scan["gen"] += 1; scan["queue"] = queue.Queue()
+            gen, q, path = scan["gen"], scan["queue"], self.current_browser_path
+            lb.delete(0, tk.END); shown.clear()
+            lb.insert(tk.END, ".. [Torna Su]"); shown.append(None)
+            info_var.set("Lettura cartella...")
+            def worker():
+                try:
+                    entries = self.dir_cache.listing(
+                        str(path), lambda b: q.put(("entries", list(b))), lambda b: q.put(("estimates", list(b))),
+                        cancelled=lambda: gen != scan["gen"])
+                    q.put(("done", entries))
+                except Exception as e:
+                    q.put(("error", str(e)))
+            threading.Thread(target=worker, daemon=True).start()
+            win.after(BROWSE_POLL_MS, poll, gen)
+        
+        def navigate(entry: Optional[DirEntryInfo]):
+            if entry is None: self.current_browser_path = self.current_browser_path.parent
+            else: self.current_browser_path = self.current_browser_path / entry.name
+            path_var.set(str(self.current_browser_path)); refresh_lb()
 
         def on_double_click(event):
             sel = lb.curselection()
-            if not sel: return
-            name = lb.get(sel[0])
-            if name == ".. [Torna Su]":
-                self.current_browser_path = self.current_browser_path.parent
-                path_var.set(str(self.current_browser_path)); refresh_lb()
-            elif name.startswith("DIR: "):
-                dir_name = name[5:]
-                self.current_browser_path = self.current_browser_path / dir_name
-                path_var.set(str(self.current_browser_path)); refresh_lb()
-            elif name.endswith(".csv"):
-                do_load() # Carica se doppio clic su CSV
+            if not sel or sel[0] >= len(shown): return
+            entry = shown[sel[0]]
+            if entry is None and sel[0] != 0: return
+            if entry is None or entry.is_dir: navigate(entry)
+            else: do_load() # Carica se doppio clic su un listino
 
         def do_load():
-            sel = lb.curselection()
+            sel = [i for i in lb.curselection() if i < len(shown)]
             if not sel: return
-            name = lb.get(sel[0])
-            if name.endswith(".csv") and not name.startswith("DIR: "):
-                full_path = self.current_browser_path / name
-                win.destroy()
-                count = self.db.import_from_csv(str(full_path))
-                if count > 0:
-                    self._load_prices(); self._update_status()
-                    self._custom_confirm("Import Successo", f"Importate {count} voci correttamente.", lambda: None)
-            elif name.startswith("DIR: ") or name == ".. [Torna Su]":
+            files = [shown[i] for i in sel if shown[i] and not shown[i].is_dir]
+            if files:
+                paths = [str(self.current_browser_path / e.name) for e in files]
+                scan["gen"] += 1; win.destroy()
+                sheets = [p for p in paths if p.lower().endswith(SPREADSHEET_SUFFIXES)]
+                # I fogli di calcolo hanno tracciati variabili: prima si sceglie la mappatura delle colonne
+                if sheets: self._column_mapping_dialog(sheets[0], lambda m: self._run_import(paths, m))
+                else: self._run_import(paths)
+            elif sel[0] == 0 or shown[sel[0]]:
                 # Navigazione con tasto carica se cartella selezionata
-                if name == ".. [Torna Su]": self.current_browser_path = self.current_browser_path.parent
-                else: self.current_browser_path = self.current_browser_path / name[5:]
-                path_var.set(str(self.current_browser_path)); refresh_lb()
+                navigate(shown[sel[0]])
 
         lb.bind("<Double-Button-1>", on_double_click); refresh_lb()
         
+        def close():
+            scan["gen"] += 1; win.destroy()
+        win.protocol("WM_DELETE_WINDOW", close)
         f = tk.Frame(win, bg=cfg.COLOR_BG_PANEL); f.pack(fill=tk.X, pady=15)
         # CARICA (Verde) e ANNULLA (Rosso)
-        tk.Button(f, text="  CARICA SELEZIONATO  ", command=do_load, bg="#008800", fg="white", font=cfg.FONT_HEADER).pack(side=tk.LEFT, padx=30)
-        tk.Button(f, text="  ANNULLA  ", command=win.destroy, bg="#AA0000", fg="white", font=cfg.FONT_HEADER).pack(side=tk.RIGHT, padx=30)
+        tk.Button(f, text="  CARICA SELEZIONATI  ", command=do_load, bg="#008800", fg="white", font=cfg.FONT_HEADER).pack(side=tk.LEFT, padx=30)
+        tk.Button(f, text="  ANNULLA  ", command=close, bg="#AA0000", fg="white", font=cfg.FONT_HEADER).pack(side=tk.RIGHT, padx=30)
+
+    @staticmethod
+    def _format_size(size: int) -> str:
+        """Dimensione leggibile di un file (B, KB, MB, GB)."""
+        value = float(size)
+        for unit in ("B", "KB", "MB"):
+            if value < 1024:
+                res = f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+                return res
+            value /= 1024
+        res = f"{value:.1f} GB"
+        return res
+
+    def _column_mapping_dialog(self, sample_path: str, on_ok: Callable[[ColumnMapping], None]) -> None:
+        """Scelta di foglio e colonne (codice, descrizione, U.M., prezzo, categoria) con anteprima delle prime righe."""
+        win = tk.Toplevel(self.root); win.title("Mappatura Colonne"); win.geometry("900x520"); win.configure(bg=cfg.COLOR_BG_PANEL)
+        win.transient(self.root); win.grab_set()
+        tk.Label(win, text=f"ANTEPRIMA: {Path(sample_path).name} (mappatura applicata a tutti i file selezionati)", bg=cfg.COLOR_BG_PANEL, fg=cfg.COLOR_ACCENT, font=cfg.FONT_HEADER).pack(pady=5)
+        txt = tk.Text(win, bg="#000000", fg=cfg.COLOR_FG_TEXT, font=cfg.FONT_MONO, height=12, wrap=tk.NONE)
+        txt.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        m = self.import_mapping
+        letters = [ColumnMapping.column_letter(i) for i in range(26)]
+        fields = [("Codice", "code", False), ("Descrizione", "description", False), ("U.M.", "unit", True), ("Prezzo", "price", False), ("Categoria", "category", True)]
+        f = tk.Frame(win, bg=cfg.COLOR_BG_PANEL); f.pack(fill=tk.X, padx=10, pady=5)
+        combo_vars: Dict[str, tk.StringVar] = {}
+        for col, (label, attr, optional) in enumerate(fields):
+            idx = getattr(m, attr)
+            combo_vars[attr] = tk.StringVar(value=ColumnMapping.column_letter(idx) if idx is not None else "-")
+            tk.Label(f, text=label, bg=cfg.COLOR_BG_PANEL, fg="white").grid(row=0, column=col, padx=5)
+            ttk.Combobox(f, textvariable=combo_vars[attr], values=(["-"] if optional else []) + letters, width=5, state="readonly").grid(row=1, column=col, padx=5)
+        sheet_var = tk.StringVar(value=m.sheet)
+        tk.Label(f, text="Foglio (vuoto = primo)", bg=cfg.COLOR_BG_PANEL, fg="white").grid(row=0, column=len(fields), padx=5)
+        tk.Entry(f, textvariable=sheet_var, width=18, **cfg.get_entry_style()).grid(row=1, column=len(fields), padx=5)
+        
+        def show_preview():
+            txt.config(state=tk.NORMAL); txt.delete("1.0", tk.END)
+            try:
+                rows = preview_rows(sample_path, 10, sheet_var.get().strip())
+                width = max((len(c) for _, c in rows), default=0)
+                txt.insert(tk.END, "riga  " + " | ".join(f"{ColumnMapping.column_letter(i):<14}" for i in range(width)) + "\n")
+                for line_no, cells in rows:
+                    txt.insert(tk.END, f"{line_no:<5} " + " | ".join(f"{c[:14]:<14}" for c in cells) + "\n")
+            except Exception as e:
+                txt.insert(tk.END, f"ERRORE: {e}")
+            txt.config(state=tk.DISABLED)
+        
+        def confirm():
+            spec = ",".join(f"{a}={v.get()}" for a, v in combo_vars.items()) + f",sheet={sheet_var.get().strip()}"
+            self.import_mapping = ColumnMapping.from_spec(spec)
+            win.destroy(); on_ok(self.import_mapping)
+        
+        show_preview()
+        b = tk.Frame(win, bg=cfg.COLOR_BG_PANEL); b.pack(fill=tk.X, pady=10)
+        tk.Button(b, text="  IMPORTA  ", command=confirm, bg="#008800", fg="white", font=cfg.FONT_HEADER).pack(side=tk.LEFT, padx=30)
+        tk.Button(b, text="AGGIORNA ANTEPRIMA", command=show_preview, **cfg.get_button_style()).pack(side=tk.LEFT, padx=10)
+        tk.Button(b, text="  ANNULLA  ", command=win.destroy, bg="#AA0000", fg="white", font=cfg.FONT_HEADER).pack(side=tk.RIGHT, padx=30)
+
+    def _run_import(self, paths: List[str], mapping: Optional[ColumnMapping] = None) -> None:
+        """Importa i file in un thread (lettura parallela nel data engine); la GUI attende l'esito dalla coda."""
+        if self.import_busy: return
+        self.import_busy = True
+        self.status_bar.config(text=f" Import di {len(paths)} file in corso...")
+        def worker():
+            report = self.db.import_price_files(paths, mapping=mapping)
+            self.import_queue.put(report)
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(IMPORT_POLL_MS, self._poll_import)
+
+    def _poll_import(self) -> None:
+        try:
+            report = self.import_queue.get_nowait()
+        except queue.Empty:
+            self.root.after(IMPORT_POLL_MS, self._poll_import); return
+        self.import_busy = False
+        self._load_prices(); self._update_status()
+        self._show_import_report(report)
+
+    def _show_import_report(self, report: Any) -> None:
+        """Finestra con l'esito dell'import: voci inserite, tempi e righe scartate per file."""
+        win = tk.Toplevel(self.root); win.title("Esito Import"); win.geometry("800x450"); win.configure(bg=cfg.COLOR_BG_PANEL)
+        txt = tk.Text(win, bg="#000000", fg=cfg.COLOR_FG_TEXT, font=cfg.FONT_MONO, wrap=tk.NONE, padx=10, pady=10)
+        txt.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        txt.insert(tk.END, report.summary()); txt.config(state=tk.DISABLED)
+        tk.Button(win, text="CHIUDI", command=win.destroy, bg="#333333", fg="white").pack(pady=10)
 
     def _sort_tree(self, group: str, tree: ttk.Treeview, col: str) -> None:
         rev = False
         if self.sort_order[group]["col"] == col: rev = not self.sort_order[group]["reverse"]
         self.sort_order[group]["col"] = col; self.sort_order[group]["reverse"] = rev
+        TreeLoader.of(tree).finish()  # Si ordina sempre l'elenco completo
         data = [(tree.set(k, col), k) for k in tree.get_children('')]
         try: data.sort(key=lambda t: float(t[0].replace(',', '.')), reverse=rev)
         except ValueError: data.sort(reverse=rev)
@@ -265,9 +498,8 @@ class PreventiviApp:
     def _do_clear_table(self): self.db.clear_price_list(); self._load_prices()
 
     def _load_prices(self, items: Optional[List[PriceItem]] = None) -> None:
-        for r in self.tree_prices.get_children(): self.tree_prices.delete(r)
         data = items if items else self.db.get_all_price_items()
-        for i in data: self.tree_prices.insert("", tk.END, values=(i.code, i.category, i.description, i.unit, f"{i.price:.2f}"))
+        TreeLoader.of(self.tree_prices).load((i.code, i.category, i.description, i.unit, f"{i.price:.2f}") for i in data)
         self._update_status()
 
     def _on_price_select(self, e) -> None:
@@ -276,6 +508,66 @@ class PreventiviApp:
         v = self.tree_prices.item(s[0])['values']
         self.form_vars["code"].set(v[0]); self.form_vars["cat"].set(v[1]); self.form_vars["desc"].set(v[2]); self.form_vars["um"].set(v[3]); self.form_vars["price"].set(float(v[4]))
 
+    def _load_price_form(self, code: str) -> None:
+        """Porta nel form di dettaglio la voce indicata (es. da un elenco di voci simili)."""
+        it = self.db.get_price_item(code)
+        if not it: return
+        self.form_vars["code"].set(it.code); self.form_vars["cat"].set(it.category or ""); self.form_vars["desc"].set(it.description); self.form_vars["um"].set(it.unit); self.form_vars["price"].set(it.price)
+
+    def _similar_items_popup(self, title: str, cols: Dict[str, int]) -> ttk.Treeview:
+        """Finestra con un elenco di voci; doppio clic porta la voce nel form del prezzario."""
+        top = tk.Toplevel(self.root); top.title(title); top.geometry("1000x550"); top.configure(bg=cfg.COLOR_BG_MAIN)
+        top.transient(self.root)
+        t = ttk.Treeview(top, columns=tuple(cols), show="headings")
+        for c, w in cols.items(): t.heading(c, text=c, command=lambda x=c: self._sort_tree("popup", t, x)); t.column(c, width=w, anchor="w" if c == "Descrizione" else "center")
+        vsb = ttk.Scrollbar(top, orient="vertical", command=t.yview); t.configure(yscrollcommand=vsb.set)
+        tk.Button(top, text="CHIUDI", command=top.destroy, bg="#333333", fg="white").pack(side=tk.BOTTOM, pady=10)
+        vsb.pack(side=tk.RIGHT, fill=tk.Y, pady=10); t.pack(fill=tk.BOTH, expand=True, padx=(15, 0), pady=10)
+        def on_open(*_):
+            s = t.selection()
+            if s: self._load_price_form(str(t.set(s[0], "Codice")))
+        t.bind("<Double-Button-1>", on_open)
+        return t
+
+    def _similar_items_dialog(self) -> None:
+        """Voci con descrizione simile a quella della voce nel form (indice di somiglianza)."""
+        c = self.form_vars["code"].get()
+        if not c: return
+        items = self.db.find_similar_items(c)
+        if not items:
+            self._custom_confirm("Voci Simili", f"Nessuna voce simile a {c}.", lambda: None); return
+        t = self._similar_items_popup(f"Voci simili a {c}", {"Simil. %": 80, "Codice": 100, "Categoria": 110, "Descrizione": 520, "U.M.": 60, "Prezzo": 80})
+        TreeLoader.of(t).load((f"{i.similarity:.0%}", i.code, i.category, i.description, i.unit, f"{i.price:.2f}") for i in items)
+
+    def _run_dedup_report(self) -> None:
+        """Cerca le voci duplicate in un thread; la GUI attende l'esito dalla coda."""
+        if self.dedup_busy: return
+        self.dedup_busy = True
+        self.status_bar.config(text=" Ricerca voci duplicate in corso...")
+        def worker():
+            self.dedup_queue.put(self.db.find_duplicate_items())
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(IMPORT_POLL_MS, self._poll_dedup_report)
+
+    def _poll_dedup_report(self) -> None:
+        try:
+            report = self.dedup_queue.get_nowait()
+        except queue.Empty:
+            self.root.after(IMPORT_POLL_MS, self._poll_dedup_report); return
+        self.dedup_busy = False
+        self._update_status()
+        if report is None: return
+        if not report.groups:
+            self._custom_confirm("Report Duplicati", f"Nessuna voce duplicata.\n{report.summary()}", lambda: None); return
+        t = self._similar_items_popup("Report Duplicati", {"Gruppo": 70, "Simil. %": 80, "Codice": 100, "Categoria": 110, "Descrizione": 470, "U.M.": 60, "Prezzo": 80})
+        tk.Label(t.master, text=report.summary(), bg=cfg.COLOR_BG_MAIN, fg=cfg.COLOR_FG_TEXT).pack(side=tk.TOP, before=t, anchor="w", padx=15)
+        def rows():
+            for n, g in enumerate(report.groups, 1):
+                sim = "IDENTICHE" if g.exact else f">= {g.min_similarity:.0%}"
+                for i in g.items:
+                    yield (n, sim, i.code, i.category, i.description, i.unit, f"{i.price:.2f}")
+        TreeLoader.of(t).load(rows())
+
     def _clear_price_form(self) -> None:
         for k in self.form_vars: self.form_vars[k].set(0.0 if k == "price" else "")
 
@@ -298,6 +590,10 @@ class PreventiviApp:
         paned.pack(fill=tk.BOTH, expand=True)
         f_list = tk.Frame(paned, bg=cfg.COLOR_BG_MAIN, width=380); paned.add(f_list)
         tk.Button(f_list, text="+ NUOVO PREVENTIVO", command=self._new_quote_dialog, **cfg.get_button_style()).pack(fill=tk.X, padx=10, pady=10)
+        f_copy = tk.Frame(f_list, bg=cfg.COLOR_BG_MAIN); f_copy.pack(fill=tk.X, padx=10, pady=(0, 10))
+        tk.Button(f_copy, text="DUPLICA", command=self._clone_quote_dialog, **cfg.get_button_style()).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 2))
+        tk.Button(f_copy, text="DA MODELLO", command=self._template_picker, **cfg.get_button_style()).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(2, 0))
+        tk.Button(f_list, text="ARCHIVIO", command=self._archive_browser, **cfg.get_button_style()).pack(fill=tk.X, padx=10, pady=(0, 10))
         cols_q = ("ID", "Cliente", "Data", "Totale €")
         self.tree_quotes = ttk.Treeview(f_list, columns=cols_q, show="headings")
         qw = {"ID": 40, "Cliente": 140, "Data": 90, "Totale €": 90}
@@ -310,6 +606,7 @@ class PreventiviApp:
         tool = tk.Frame(self.frame_detail, bg=cfg.COLOR_BG_PANEL); tool.pack(fill=tk.X, padx=15)
         tk.Button(tool, text="AGGIUNGI VOCE", command=self._add_item_dialog, **cfg.get_button_style()).pack(side=tk.LEFT, padx=5)
         tk.Button(tool, text="ESPORTA TXT", command=self._export_quote, bg="#005500", fg="white", font=cfg.FONT_HEADER).pack(side=tk.LEFT, padx=5)
+        tk.Button(tool, text="SALVA MODELLO", command=self._save_template_dialog, **cfg.get_button_style()).pack(side=tk.LEFT, padx=5)
         tk.Button(tool, text="ELIMINA RIGA", command=lambda: self._custom_confirm("Elimina Riga", "Rimuovere riga selezionata?", self._do_delete_quote_item), bg="#880000", fg="white", font=cfg.FONT_HEADER).pack(side=tk.RIGHT, padx=5)
         
         i_frame = tk.Frame(self.frame_detail, bg=cfg.COLOR_BG_PANEL); i_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
@@ -324,8 +621,7 @@ class PreventiviApp:
         self._load_quotes_list(); self.current_quote_id = None
 
     def _load_quotes_list(self) -> None:
-        for r in self.tree_quotes.get_children(): self.tree_quotes.delete(r)
-        for q in self.db.get_quotes(): self.tree_quotes.insert("", tk.END, values=(q.id, q.customer_name, q.date_created.split()[0], f"{q.total_amount:.2f}"))
+        TreeLoader.of(self.tree_quotes).load((q.id, q.customer_name, q.date_created.split()[0], f"{q.total_amount:.2f}") for q in self.db.get_quotes())
         self._update_status()
 
     def _new_quote_dialog(self) -> None:
@@ -333,16 +629,141 @@ class PreventiviApp:
         if n and n.strip():
             if self.db.create_quote(n.strip()): self._load_quotes_list()
 
+    def _ask_reprice(self, on_choice: Callable[[bool], None]) -> None:
+        """Chiede se aggiornare i prezzi al listino corrente durante la copia."""
+        self._custom_confirm("Prezzi", "Aggiornare i prezzi al prezzario corrente?\n(NO = mantieni i prezzi originali)", lambda: on_choice(True), lambda: on_choice(False))
+
+    def _clone_quote_dialog(self) -> None:
+        if not self.current_quote_id: return
+        src_id = self.current_quote_id
+        n = simpledialog.askstring("Duplica Preventivo", "Nome Cliente del nuovo preventivo:")
+        if not n or not n.strip(): return
+        def do_clone(reprice: bool):
+            new_id = self.db.clone_quote(src_id, n.strip(), reprice)
+            if new_id: self._load_quotes_list(); self.current_quote_id = new_id; self._load_quote_detail(new_id)
+        self._ask_reprice(do_clone)
+
+    def _save_template_dialog(self) -> None:
+        if not self.current_quote_id: return
+        n = simpledialog.askstring("Salva Modello", "Nome del modello:")
+        if not n or not n.strip(): return
+        if self.db.save_quote_as_template(self.current_quote_id, n.strip()):
+            self._custom_confirm("Modello", f"Modello '{n.strip()}' salvato.", lambda: None)
+        else:
+            self._custom_confirm("Modello", f"Impossibile salvare '{n.strip()}' (nome già usato?).", lambda: None)
+
+    def _template_picker(self) -> None:
+        """Elenco dei modelli salvati: crea un preventivo da modello o elimina il modello."""
+        top = tk.Toplevel(self.root); top.title("Modelli Preventivo"); top.geometry("600x450"); top.configure(bg=cfg.COLOR_BG_MAIN)
+        top.transient(self.root)
+        cols = ("ID", "Nome", "Righe", "Data")
+        t = ttk.Treeview(top, columns=cols, show="headings", height=12)
+        tw = {"ID": 40, "Nome": 280, "Righe": 70, "Data": 150}
+        for c in cols: t.heading(c, text=c, command=lambda x=c: self._sort_tree("popup", t, x)); t.column(c, width=tw[c], anchor="w" if c == "Nome" else "center")
+        t.pack(fill=tk.BOTH, expand=True, padx=15, pady=10)
+        def reload():
+            TreeLoader.of(t).load((m.id, m.name, m.line_count, m.date_created) for m in self.db.get_quote_templates())
+        def selected_id() -> Optional[int]:
+            s = t.selection()
+            res = int(t.item(s[0])['values'][0]) if s else None
+            return res
+        def use():
+            t_id = selected_id()
+            if not t_id: return
+            n = simpledialog.askstring("Nuovo da Modello", "Nome Cliente:", parent=top)
+            if not n or not n.strip(): return
+            def do_create(reprice: bool):
+                new_id = self.db.create_quote_from_template(t_id, n.strip(), reprice)
+                if new_id: top.destroy(); self._load_quotes_list(); self.current_quote_id = new_id; self._load_quote_detail(new_id)
+            self._ask_reprice(do_create)
+        def remove():
+            t_id = selected_id()
+            if t_id: self._custom_confirm("Elimina Modello", "Eliminare il modello selezionato?", lambda: [self.db.delete_quote_template(t_id), reload()])
+        reload()
+        f = tk.Frame(top, bg=cfg.COLOR_BG_PANEL); f.pack(fill=tk.X, pady=15)
+        tk.Button(f, text="  USA MODELLO  ", command=use, bg="#008800", fg="white", font=cfg.FONT_HEADER).pack(side=tk.LEFT, padx=15)
+        tk.Button(f, text="  ELIMINA MODELLO  ", command=remove, bg="#AA0000", fg="white", font=cfg.FONT_HEADER).pack(side=tk.RIGHT, padx=15)
+
+    def _archive_browser(self) -> None:
+        """Ricerca nei preventivi archiviati, consultazione, ripristino e archiviazione dei vecchi."""
+        top = tk.Toplevel(self.root); top.title("Archivio Preventivi"); top.geometry("700x550"); top.configure(bg=cfg.COLOR_BG_MAIN)
+        top.transient(self.root)
+        f_search = tk.Frame(top, bg=cfg.COLOR_BG_PANEL); f_search.pack(fill=tk.X, padx=15, pady=10)
+        tk.Label(f_search, text="Cliente / Note / N.:", bg=cfg.COLOR_BG_PANEL, fg="white").pack(side=tk.LEFT, padx=10)
+        q_var = tk.StringVar()
+        e_search = tk.Entry(f_search, textvariable=q_var, **cfg.get_entry_style()); e_search.pack(side=tk.LEFT, fill=tk.X, expand=True, pady=5)
+        cols = ("ID", "Cliente", "Data", "Totale €")
+        t = ttk.Treeview(top, columns=cols, show="headings", height=14)
+        aw = {"ID": 60, "Cliente": 300, "Data": 160, "Totale €": 110}
+        for c in cols: t.heading(c, text=c, command=lambda x=c: self._sort_tree("popup", t, x)); t.column(c, width=aw[c], anchor="w" if c == "Cliente" else "center")
+        t.pack(fill=tk.BOTH, expand=True, padx=15)
+        def search(*_):
+            TreeLoader.of(t).load((q.id, q.customer_name, q.date_created, f"{q.total_amount:.2f}") for q in self.db.search_archived_quotes(q_var.get().strip()))
+        def selected_id() -> Optional[int]:
+            s = t.selection()
+            res = int(t.item(s[0])['values'][0]) if s else None
+            return res
+        def open_selected(*_):
+            q_id = selected_id()
+            if q_id: self._load_archived_detail(q_id)
+        def restore():
+            q_id = selected_id()
+            if q_id: self._custom_confirm("Ripristina", f"Riportare il preventivo {q_id} tra quelli attivi?", lambda: [self.db.restore_archived_quote(q_id), search(), self._load_quotes_list()])
+        def archive_old():
+            days = simpledialog.askinteger("Archivia", "Archiviare i preventivi più vecchi di (giorni):", initialvalue=DEFAULT_ARCHIVE_AGE_DAYS, minvalue=0, parent=top)
+            if days is None: return
+            def do_archive():
+                n = self.db.archive_quotes(days)
+                self._load_quotes_list(); search()
+                self._custom_confirm("Archivio", f"Archiviati {n} preventivi.", lambda: None)
+            self._custom_confirm("Archivia", f"Spostare in archivio i preventivi più vecchi di {days} giorni?", do_archive)
+        e_search.bind("<Return>", search); t.bind("<Double-Button-1>", open_selected)
+        tk.Button(f_search, text="CERCA", command=search, **cfg.get_button_style()).pack(side=tk.LEFT, padx=10)
+        f = tk.Frame(top, bg=cfg.COLOR_BG_PANEL); f.pack(fill=tk.X, pady=15)
+        tk.Button(f, text="APRI", command=open_selected, **cfg.get_button_style()).pack(side=tk.LEFT, padx=15)
+        tk.Button(f, text="RIPRISTINA", command=restore, **cfg.get_button_style()).pack(side=tk.LEFT, padx=5)
+        tk.Button(f, text="ARCHIVIA VECCHI", command=archive_old, bg="#660000", fg="white", font=cfg.FONT_HEADER).pack(side=tk.RIGHT, padx=15)
+        search()
+
+    def _load_archived_detail(self, q_id: int) -> None:
+        """Mostra un preventivo archiviato in sola lettura nel pannello di dettaglio."""
+        h, items = self.db.get_archived_quote_details(q_id)
+        if not h: return
+        self.current_quote_id = None
+        self.lbl_quote_title.config(text=f"[ARCHIVIO] CLIENTE: {h.customer_name.upper()} | TOTALE: € {h.total_amount:.2f}")
+        TreeLoader.of(self.tree_items).load(self._item_rows(items))
+
     def _on_quote_select(self, e) -> None:
         s = self.tree_quotes.selection()
-        if s: self.current_quote_id = int(self.tree_quotes.item(s[0])['values'][0]); self._load_quote_detail(self.current_quote_id)
+        if s:
+            self.current_quote_id = int(self.tree_quotes.item(s[0])['values'][0]); self._load_quote_detail(self.current_quote_id)
+            self._prefetch_neighbours(s[0])
+
+    def _prefetch_neighbours(self, row: str) -> None:
+        """Chiede il precaricamento dei preventivi adiacenti nella lista (navigazione con frecce/clic vicini)."""
+        rows = self.tree_quotes.get_children()
+        pos = rows.index(row)
+        near = rows[max(0, pos - PREFETCH_NEIGHBOURS):pos] + rows[pos + 1:pos + 1 + PREFETCH_NEIGHBOURS]
+        self.prefetch_queue.put([int(self.tree_quotes.item(r)['values'][0]) for r in near])
+
+    def _prefetch_worker(self) -> None:
+        while True:
+            ids = self.prefetch_queue.get()
+            # Le richieste superate da una selezione più recente vengono saltate
+            while not self.prefetch_queue.empty(): ids = self.prefetch_queue.get_nowait()
+            try: self.db.prefetch_quote_details(ids)
+            except Exception as e: print(f"ERRORE Prefetch: {e}")
 
     def _load_quote_detail(self, q_id: int) -> None:
-        for r in self.tree_items.get_children(): self.tree_items.delete(r)
         h, items = self.db.get_quote_details(q_id)
         if h:
             self.lbl_quote_title.config(text=f"CLIENTE: {h.customer_name.upper()} | TOTALE: € {h.total_amount:.2f}")
-            for i in items: self.tree_items.insert("", tk.END, values=(i.id, i.item_code, i.description, i.quantity, i.unit, f"{i.unit_price:.2f}", f"{i.total_price:.2f}"))
+        # Anche se il preventivo non esiste più la tabella va svuotata (e un caricamento precedente annullato)
+        TreeLoader.of(self.tree_items).load(self._item_rows(items))
+
+    @staticmethod
+    def _item_rows(items: List[QuoteLineItem]):
+        for i in items: yield (i.id, i.item_code, i.description, i.quantity, i.unit, f"{i.unit_price:.2f}", f"{i.total_price:.2f}")
 
     def _add_item_dialog(self) -> None:
         if not self.current_quote_id: return
@@ -352,7 +773,7 @@ class PreventiviApp:
         for c in cols: t.heading(c, text=c, command=lambda x=c: self._sort_tree("popup", t, x)); t.column(c, width=100 if c != "Descrizione" else 500)
         t.pack(fill=tk.BOTH, expand=True, padx=15, pady=10)
         all_it = self.db.get_all_price_items()
-        for r in all_it: t.insert("", tk.END, values=(r.code, r.description, f"{r.price:.2f}"))
+        TreeLoader.of(t).load((r.code, r.description, f"{r.price:.2f}") for r in all_it)
         f = tk.Frame(top, bg=cfg.COLOR_BG_PANEL); f.pack(fill=tk.X, pady=15)
         tk.Label(f, text="Quantità:", bg=cfg.COLOR_BG_PANEL, fg="white").pack(side=tk.LEFT, padx=15)
         eq = tk.Entry(f, width=12, **cfg.get_entry_style()); eq.pack(side=tk.LEFT); eq.insert(0, "1.0")
@@ -364,7 +785,7 @@ class PreventiviApp:
             if it:
                 try:
                     q = float(eq.get())
-                    if self.db.add_quote_item(QuoteLineItem(None, self.current_quote_id, it.code, it.description, q, it.price, it.price * q, it.unit)):
+                    if self.db.add_quote_item(QuoteLineItem(None, self.current_quote_id, it.code, it.description, q, it.price, it.price * q, it.unit, it.version_id)):
                         self._load_quote_detail(self.current_quote_id); self._load_quotes_list(); top.destroy()
                 except: pass
         tk.Button(f, text="  AGGIUNGI  ", command=confirm, bg="#008800", fg="white", font=cfg.FONT_HEADER).pack(side=tk.RIGHT, padx=15)
@@ -377,17 +798,134 @@ class PreventiviApp:
         if not self.current_quote_id: return
         h, items = self.db.get_quote_details(self.current_quote_id)
         if not h: return
-        ed = Path(__file__).parent / "exports"; ed.mkdir(exist_ok=True); fp = ed / f"Preventivo_{h.id}_{h.customer_name.replace(' ', '_')}.txt"
-        l = ["="*85, f"PREVENTIVO N. {h.id:04d} | CLIENTE: {h.customer_name.upper()} | DATA: {h.date_created}", "="*85, ""]
-        l.append(f"{'CODICE':<12} | {'DESCRIZIONE':<35} | {'UM':<4} | {'QTA':<7} | {'UNITARIO':<10} | {'TOTALE':<10}")
-        l.append("-" * 95)
-        for i in items: l.append(f"{i.item_code:<12} | {(i.description[:32]+'..') if len(i.description)>32 else i.description:<35} | {i.unit:<4} | {i.quantity:<7.2f} | {i.unit_price:<10.2f} | {i.total_price:<10.2f}")
-        l.append("-" * 95); l.append(f"{'TOTALE COMPLESSIVO:':<80} € {h.total_amount:.2f}"); l.append("="*85)
+        ed = EXPORTS_DIR
         try:
-            with open(fp, "w", encoding="utf-8") as f: f.write("\n".join(l))
-            self._custom_confirm("Export", f"Creato: {fp.name}\nAprire cartella?", lambda: os.system(f"xdg-open {ed}"))
+            r = self.export_cache.export(h, items)
+            msg = "Creato" if r.written else "Già aggiornato"
+            self._custom_confirm("Export", f"{msg}: {r.path.name}\nAprire cartella?", lambda: os.system(f"xdg-open {ed}"))
         except: pass
 
+    # --- TAB REPORT ---
+
+    def _build_report_tab(self) -> None:
+        """Costruisce la scheda report: indicatori globali e tre classifiche."""
+        top = tk.Frame(self.tab_report, bg=cfg.COLOR_BG_PANEL); top.pack(fill=tk.X, padx=5, pady=10)
+        self.lbl_report_kpi = tk.Label(top, text="", bg=cfg.COLOR_BG_PANEL, fg=cfg.COLOR_ACCENT, font=cfg.FONT_HEADER, anchor="w", justify=tk.LEFT)
+        self.lbl_report_kpi.pack(side=tk.LEFT, padx=15, pady=10)
+        tk.Button(top, text="RICALCOLA", command=lambda: self._custom_confirm("Ricalcolo Report", "Ricalcolare da zero tutti gli aggregati?", self._do_refresh_reports), bg="#660000", fg="white", font=cfg.FONT_HEADER).pack(side=tk.RIGHT, padx=10)
+        tk.Button(top, text="AGGIORNA", command=self._load_report, **cfg.get_button_style()).pack(side=tk.RIGHT, padx=5)
+
+        body = tk.Frame(self.tab_report, bg=cfg.COLOR_BG_MAIN); body.pack(fill=tk.BOTH, expand=True, padx=5)
+        body.grid_columnconfigure(0, weight=1); body.grid_columnconfigure(1, weight=1)
+        body.grid_rowconfigure(1, weight=1); body.grid_rowconfigure(3, weight=1)
+
+        def make_tree(title: str, cols: Dict[str, int], row: int, column: int, colspan: int = 1) -> ttk.Treeview:
+            tk.Label(body, text=title, bg=cfg.COLOR_BG_MAIN, fg=cfg.COLOR_ACCENT, font=cfg.FONT_HEADER).grid(row=row, column=column, columnspan=colspan, sticky="w", padx=5, pady=(5, 0))
+            t = ttk.Treeview(body, columns=tuple(cols), show="headings", height=8)
+            for c, width in cols.items(): t.heading(c, text=c, command=lambda x=c: self._sort_tree("report", t, x)); t.column(c, width=width, anchor="w" if c in ("Cliente", "Descrizione") else "center")
+            t.grid(row=row + 1, column=column, columnspan=colspan, sticky="nsew", padx=5, pady=5)
+            return t
+
+        self.tree_rpt_months = make_tree("RICAVI PER MESE", {"Mese": 90, "Preventivi": 90, "Righe": 80, "Totale €": 120}, 0, 0)
+        self.tree_rpt_customers = make_tree("CLIENTI PRINCIPALI", {"Cliente": 220, "Preventivi": 90, "Totale €": 120}, 0, 1)
+        self.tree_rpt_items = make_tree("VOCI PIÙ PREVENTIVATE", {"Codice": 100, "Descrizione": 450, "Righe": 80, "Quantità": 90, "Totale €": 120}, 2, 0, 2)
+
+    def _on_tab_changed(self, e) -> None:
+        if self.notebook.select() == str(self.tab_report): self._load_report()
+
+    def _load_report(self) -> None:
+        r = self.db.get_report()
+        if not r: return
+        self.lbl_report_kpi.config(text=f"Preventivi: {r.quote_count}  |  Ricavi: € {r.revenue:,.2f}  |  Medio: € {r.avg_quote_amount:,.2f}  |  Righe medie: {r.avg_lines_per_quote:.1f}")
+        TreeLoader.of(self.tree_rpt_months).load((m.month, m.quote_count, m.line_count, f"{m.revenue:.2f}") for m in r.months)
+        TreeLoader.of(self.tree_rpt_customers).load((c.customer_name, c.quote_count, f"{c.revenue:.2f}") for c in r.top_customers)
+        TreeLoader.of(self.tree_rpt_items).load((i.item_code, i.description, i.line_count, f"{i.quantity:.2f}", f"{i.revenue:.2f}") for i in r.top_items)
+
+    def _do_refresh_reports(self) -> None:
+        if self.db.refresh_reports(): self._load_report()
+
+    # --- TAB SISTEMA ---
+
+    def _build_system_tab(self) -> None:
+        """Costruisce la scheda di sistema: manutenzione del database e log delle operazioni."""
+        bar = tk.Frame(self.tab_system, bg=cfg.COLOR_BG_PANEL); bar.pack(fill=tk.X, padx=5, pady=10)
+        b_style = cfg.get_button_style()
+        tk.Button(bar, text="BACKUP ORA", command=lambda: self._run_maintenance(["backup"]), **b_style).pack(side=tk.LEFT, padx=5, pady=10)
+        tk.Button(bar, text="VERIFICA INTEGRITÀ", command=lambda: self._run_maintenance(["integrity"]), **b_style).pack(side=tk.LEFT, padx=5)
+        tk.Button(bar, text="OTTIMIZZA", command=lambda: self._run_maintenance(["optimize"]), **b_style).pack(side=tk.LEFT, padx=5)
+        tk.Button(bar, text="COMPATTA", command=lambda: self._custom_confirm("Compatta", "Recuperare lo spazio libero del database?\nLa prima volta il file viene riscritto per intero\n(scritture bloccate fino al termine).", lambda: self._run_maintenance(["compact"])), **b_style).pack(side=tk.LEFT, padx=5)
+        tk.Button(bar, text="AGGIORNA ESPORTAZIONI", command=self._run_export_refresh, **b_style).pack(side=tk.LEFT, padx=5)
+        tk.Button(bar, text="STATISTICHE CACHE", command=lambda: self._log_maintenance(f"CACHE PREVENTIVI: {self.db.get_cache_stats().summary()}"), **b_style).pack(side=tk.LEFT, padx=5)
+        
+        tk.Label(self.tab_system, text="REGISTRO MANUTENZIONE", bg=cfg.COLOR_BG_MAIN, fg=cfg.COLOR_ACCENT, font=cfg.FONT_HEADER).pack(anchor="w", padx=10)
+        self.txt_maint_log = tk.Text(self.tab_system, bg="#000000", fg=cfg.COLOR_FG_TEXT, font=cfg.FONT_MONO, height=12, wrap=tk.WORD, state=tk.DISABLED)
+        self.txt_maint_log.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        # Manutenzione automatica quando l'utente è inattivo
+        self.root.bind_all("<Any-KeyPress>", self._touch_activity, add="+")
+        self.root.bind_all("<Any-ButtonPress>", self._touch_activity, add="+")
+        self.root.after(MAINT_CHECK_MS, self._maintenance_tick)
+
+    def _touch_activity(self, e=None) -> None:
+        self.last_activity = time.time()
+
+    def _log_maintenance(self, line: str) -> None:
+        self.txt_maint_log.config(state=tk.NORMAL)
+        self.txt_maint_log.insert(tk.END, f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {line}\n"); self.txt_maint_log.see(tk.END)
+        self.txt_maint_log.config(state=tk.DISABLED)
+
+    def _maintenance_tick(self) -> None:
+        """Avvia le attività scadute solo dopo IDLE_SECONDS di inattività."""
+        if not self.maint_busy and time.time() - self.last_activity >= IDLE_SECONDS:
+            due = self.maint.due_tasks()
+            if due: self._run_maintenance(due)
+        self.root.after(MAINT_CHECK_MS, self._maintenance_tick)
+
+    def _run_maintenance(self, tasks: List[str]) -> None:
+        """Esegue le attività in un thread; la GUI legge avanzamento ed esiti dalla coda."""
+        if self.maint_busy: return
+        self.maint_busy = True
+        self._log_maintenance(f"Avvio: {', '.join(tasks)}")
+        def progress(done: int, total: int): self.maint_queue.put(("progress", done, total))
+        def worker():
+            try:
+                for task in tasks:
+                    for r in self.maint.run_tasks([task], progress): self.maint_queue.put(("result", r))
+            finally:
+                self.maint_queue.put(("done",))
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(MAINT_POLL_MS, self._poll_maintenance)
+
+    def _run_export_refresh(self) -> None:
+        """Rigenera in un thread le esportazioni dei preventivi modificati dopo l'ultimo export."""
+        if self.maint_busy: return
+        self.maint_busy = True
+        self._log_maintenance("Avvio: aggiornamento esportazioni")
+        def worker():
+            try:
+                self.maint_queue.put(("result", refresh_exports(self.db, self.export_cache)))
+            finally:
+                self.maint_queue.put(("done",))
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(MAINT_POLL_MS, self._poll_maintenance)
+
+    def _poll_maintenance(self) -> None:
+        finished = False
+        try:
+            while True:
+                msg = self.maint_queue.get_nowait()
+                if msg[0] == "progress" and msg[2]: self.status_bar.config(text=f" Backup in corso: {100 * msg[1] // msg[2]}%")
+                elif msg[0] == "result":
+                    self._log_maintenance(msg[1].summary())
+                    if getattr(msg[1], "task", "") == "backup" and msg[1].ok:
+                        copies = self.maint.list_backups()
+                        self._log_maintenance(f"Copie presenti ({len(copies)}): {', '.join(p.name for p in copies)}")
+                elif msg[0] == "done": finished = True
+        except queue.Empty:
+            pass
+        if finished: self.maint_busy = False; self._update_status()
+        else: self.root.after(MAINT_POLL_MS, self._poll_maintenance)
+
 
 def do_main() -> None:
     db = DataManager(); root = tk.Tk()
@@ -395,4 +933,6 @@ def do_main() -> None:
     except: pass
     app = PreventiviApp(root, db); root.mainloop()
 
-if __name__ == "__main__": do_main()
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Processi di import nell'eseguibile PyInstaller
+    do_main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Report Engine - Aggregati statistici sui preventivi.
+
+Mantiene tabelle di riepilogo (rpt_*) aggiornate in modo incrementale
+da trigger SQLite su quotes e quote_items, così che i report
+(ricavi per mese, clienti principali, voci più preventivate, medie)
+leggano poche righe precalcolate invece di scandire tutte le righe.
+"""
+
+__date__ = "2026-10-19"
+__version__ = "1.0.0"
+__author__ = "Gemini CLI"
+
+import sqlite3
+from typing import List, Optional
+from dataclasses import dataclass, field
+
+# Incrementare quando cambiano tabelle o trigger: forza ricreazione e ricalcolo completo
+REPORT_SCHEMA_VERSION = "3"
+
+# Colonne lette dalle sorgenti; con l'archivio collegato (schema "arc") si leggono entrambe
+_QUOTES_SOURCE = "SELECT id, customer_name, date_created, total_amount FROM main.quotes"
+_ITEMS_SOURCE = "SELECT quote_id, item_code, quantity, total_price FROM main.quote_items"
+
+# --- Modelli Dati ---
+
+@dataclass
+class MonthlyRevenue:
+    """Ricavi e volumi di un mese (AAAA-MM)."""
+    month: str
+    quote_count: int
+    revenue: float
+    line_count: int
+
+@dataclass
+class CustomerRevenue:
+    """Totale preventivato per cliente."""
+    customer_name: str
+    quote_count: int
+    revenue: float
+
+@dataclass
+class ItemUsage:
+    """Utilizzo di una voce di prezzario nei preventivi."""
+    item_code: str
+    description: str
+    line_count: int
+    quantity: float
+    revenue: float
+
+@dataclass
+class QuoteReport:
+    """Report completo: indicatori globali e classifiche."""
+    quote_count: int = 0
+    line_count: int = 0
+    revenue: float = 0.0
+    avg_quote_amount: float = 0.0
+    avg_lines_per_quote: float = 0.0
+    months: List[MonthlyRevenue] = field(default_factory=list)
+    top_customers: List[CustomerRevenue] = field(default_factory=list)
+    top_items: List[ItemUsage] = field(default_factory=list)
+
+
+# --- Schema ---
+
+_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS rpt_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rpt_monthly (
+        month TEXT PRIMARY KEY,
+        quote_count INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0.0,
+        line_count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rpt_customers (
+        customer_name TEXT PRIMARY KEY,
+        quote_count INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0.0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rpt_items (
+        item_code TEXT PRIMARY KEY,
+        line_count INTEGER NOT NULL DEFAULT 0,
+        quantity REAL NOT NULL DEFAULT 0.0,
+        revenue REAL NOT NULL DEFAULT 0.0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_rpt_customers_revenue ON rpt_customers (revenue)",
+    "CREATE INDEX IF NOT EXISTS idx_rpt_items_lines ON rpt_items (line_count)",
+]
+
+# Frammenti riusati dai trigger: aggiunta (sign=+) e rimozione (sign=-) di una testata o di una riga.
+# La testata porta con sé il conteggio delle proprie righe, così un cambio di data le sposta di mese.
+_QUOTE_DELTA = """
+    INSERT INTO rpt_monthly (month, quote_count, revenue, line_count)
+    VALUES (substr({r}.date_created, 1, 7), {sign}1, {sign}COALESCE({r}.total_amount, 0),
+            {sign}(SELECT COUNT(*) FROM quote_items WHERE quote_id = {r}.id))
+    ON CONFLICT(month) DO UPDATE SET
+        quote_count = quote_count + excluded.quote_count,
+        revenue = revenue + excluded.revenue,
+        line_count = line_count + excluded.line_count;
+    INSERT INTO rpt_customers (customer_name, quote_count, revenue)
+    VALUES ({r}.customer_name, {sign}1, {sign}COALESCE({r}.total_amount, 0))
+    ON CONFLICT(customer_name) DO UPDATE SET
+        quote_count = quote_count + excluded.quote_count,
+        revenue = revenue + excluded.revenue;
+"""
+
+_ITEM_DELTA = """
+    INSERT INTO rpt_items (item_code, line_count, quantity, revenue)
+    VALUES (COALESCE({r}.item_code, ''), {sign}1, {sign}{r}.quantity, {sign}{r}.total_price)
+    ON CONFLICT(item_code) DO UPDATE SET
+        line_count = line_count + excluded.line_count,
+        quantity = quantity + excluded.quantity,
+        revenue = revenue + excluded.revenue;
+    UPDATE rpt_monthly SET line_count = line_count {sign} 1
+    WHERE month = (SELECT substr(date_created, 1, 7) FROM quotes WHERE id = {r}.quote_id);
+"""
+
+# Pulizia delle sole chiavi toccate dalla riga (mai una scansione completa per riga)
+_QUOTE_CLEANUP = """
+    DELETE FROM rpt_monthly WHERE month = substr({r}.date_created, 1, 7) AND quote_count <= 0 AND line_count <= 0;
+    DELETE FROM rpt_customers WHERE customer_name = {r}.customer_name AND quote_count <= 0;
+"""
+
+_ITEM_CLEANUP = """
+    DELETE FROM rpt_items WHERE item_code = COALESCE({r}.item_code, '') AND line_count <= 0;
+"""
+
+# Spostamenti massivi (es. archiviazione) sospendono i trigger: il dato non cambia, cambia solo tabella
+_ACTIVE = "FOR EACH ROW WHEN NOT EXISTS (SELECT 1 FROM rpt_state WHERE key = 'suspended') BEGIN"
+
+_TRIGGERS = {
+    "rpt_quotes_insert": f"AFTER INSERT ON quotes {_ACTIVE}" + _QUOTE_DELTA.format(r="NEW", sign="") + "END",
+    "rpt_quotes_delete": f"AFTER DELETE ON quotes {_ACTIVE}" + _QUOTE_DELTA.format(r="OLD", sign="-") + _QUOTE_CLEANUP.format(r="OLD") + "END",
+    "rpt_quotes_update": (
+        f"AFTER UPDATE OF customer_name, date_created, total_amount ON quotes {_ACTIVE}"
+        + _QUOTE_DELTA.format(r="OLD", sign="-") + _QUOTE_DELTA.format(r="NEW", sign="") + _QUOTE_CLEANUP.format(r="OLD") + "END"
+    ),
+    "rpt_items_insert": f"AFTER INSERT ON quote_items {_ACTIVE}" + _ITEM_DELTA.format(r="NEW", sign="+") + "END",
+    "rpt_items_delete": f"AFTER DELETE ON quote_items {_ACTIVE}" + _ITEM_DELTA.format(r="OLD", sign="-") + _ITEM_CLEANUP.format(r="OLD") + "END",
+    "rpt_items_update": (
+        f"AFTER UPDATE OF quote_id, item_code, quantity, total_price ON quote_items {_ACTIVE}"
+        + _ITEM_DELTA.format(r="OLD", sign="-") + _ITEM_DELTA.format(r="NEW", sign="+") + _ITEM_CLEANUP.format(r="OLD") + "END"
+    ),
+}
+
+
+def init_report_schema(cursor: sqlite3.Cursor, include_archive: bool = False) -> None:
+    """
+    Crea tabelle e trigger dei report.
+
+    Se la versione dello schema salvata è diversa da REPORT_SCHEMA_VERSION,
+    i trigger vengono ricreati e gli aggregati ricalcolati da zero.
+
+    Args:
+        cursor: Cursore sul database principale.
+        include_archive: True se l'archivio è collegato come schema "arc".
+    """
+    for ddl in _TABLES:
+        cursor.execute(ddl)
+
+    cursor.execute("SELECT value FROM rpt_state WHERE key = 'schema_version'")
+    row = cursor.fetchone()
+    if row and row[0] == REPORT_SCHEMA_VERSION:
+        return
+
+    for name, body in _TRIGGERS.items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"CREATE TRIGGER {name} {body}")
+
+    refresh_reports(cursor, include_archive)
+    cursor.execute("""
+        INSERT OR REPLACE INTO rpt_state (key, value) VALUES ('schema_version', ?)
+    """, (REPORT_SCHEMA_VERSION,))
+
+
+def suspend_reports(cursor: sqlite3.Cursor) -> None:
+    """Sospende l'aggiornamento incrementale (da usare dentro la stessa transazione)."""
+    cursor.execute("INSERT OR REPLACE INTO rpt_state (key, value) VALUES ('suspended', '1')")
+
+
+def resume_reports(cursor: sqlite3.Cursor) -> None:
+    """Riattiva l'aggiornamento incrementale."""
+    cursor.execute("DELETE FROM rpt_state WHERE key = 'suspended'")
+
+
+def refresh_reports(cursor: sqlite3.Cursor, include_archive: bool = False) -> None:
+    """
+    Ricalcola da zero tutti gli aggregati (refresh materializzato completo).
+
+    Con include_archive i preventivi archiviati (schema "arc") restano nei totali storici.
+    """
+    quotes_src = _QUOTES_SOURCE
+    items_src = _ITEMS_SOURCE
+    if include_archive:
+        quotes_src += " UNION ALL " + _QUOTES_SOURCE.replace("main.", "arc.")
+        items_src += " UNION ALL " + _ITEMS_SOURCE.replace("main.", "arc.")
+
+    cursor.execute("DELETE FROM rpt_monthly")
+    cursor.execute("DELETE FROM rpt_customers")
+    cursor.execute("DELETE FROM rpt_items")
+
+    cursor.execute(f"""
+        INSERT INTO rpt_monthly (month, quote_count, revenue, line_count)
+        SELECT substr(q.date_created, 1, 7), COUNT(*), SUM(COALESCE(q.total_amount, 0)), SUM(COALESCE(l.n, 0))
+        FROM ({quotes_src}) q
+        LEFT JOIN (SELECT quote_id, COUNT(*) AS n FROM ({items_src}) GROUP BY quote_id) l ON l.quote_id = q.id
+        GROUP BY 1
+    """)
+    cursor.execute(f"""
+        INSERT INTO rpt_customers (customer_name, quote_count, revenue)
+        SELECT customer_name, COUNT(*), SUM(COALESCE(total_amount, 0))
+        FROM ({quotes_src})
+        GROUP BY customer_name
+    """)
+    cursor.execute(f"""
+        INSERT INTO rpt_items (item_code, line_count, quantity, revenue)
+        SELECT COALESCE(item_code, ''), COUNT(*), SUM(quantity), SUM(total_price)
+        FROM ({items_src})
+        GROUP BY 1
+    """)
+
+
+# --- Interrogazioni ---
+
+def build_report(cursor: sqlite3.Cursor, top_n: int = 10, months: int = 24) -> QuoteReport:
+    """
+    Legge gli aggregati precalcolati e compone il report.
+
+    Args:
+        cursor: Cursore su una connessione con row factory sqlite3.Row.
+        top_n: Numero di clienti e voci nelle classifiche.
+        months: Numero di mesi più recenti da restituire.
+    """
+    report = QuoteReport()
+
+    cursor.execute("""
+        SELECT COALESCE(SUM(quote_count), 0), COALESCE(SUM(line_count), 0), COALESCE(SUM(revenue), 0)
+        FROM rpt_monthly
+    """)
+    row = cursor.fetchone()
+    report.quote_count = row[0]
+    report.line_count = row[1]
+    report.revenue = row[2]
+    if report.quote_count > 0:
+        report.avg_quote_amount = report.revenue / report.quote_count
+        report.avg_lines_per_quote = report.line_count / report.quote_count
+
+    cursor.execute("""
+        SELECT month, quote_count, revenue, line_count
+        FROM rpt_monthly
+        ORDER BY month DESC
+        LIMIT ?
+    """, (months,))
+    for r in cursor.fetchall():
+        report.months.append(MonthlyRevenue(r[0], r[1], r[2], r[3]))
+
+    cursor.execute("""
+        SELECT customer_name, quote_count, revenue
+        FROM rpt_customers
+        ORDER BY revenue DESC, customer_name
+        LIMIT ?
+    """, (top_n,))
+    for r in cursor.fetchall():
+        report.top_customers.append(CustomerRevenue(r[0], r[1], r[2]))
+
+    cursor.execute("""
+        SELECT i.item_code, COALESCE(p.description, ''), i.line_count, i.quantity, i.revenue
+        FROM (SELECT * FROM rpt_items ORDER BY line_count DESC, item_code LIMIT ?) i
+        LEFT JOIN price_list p ON p.code = i.item_code
+        ORDER BY i.line_count DESC, i.item_code
+    """, (top_n,))
+    for r in cursor.fetchall():
+        report.top_items.append(ItemUsage(r[0], r[1], r[2], r[3], r[4]))
+
+    return report
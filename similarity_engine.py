@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Similarity Engine - Indice di somiglianza delle descrizioni del prezzario.
+
+Individua voci con descrizione identica o quasi identica ma codice
+diverso (tipico dopo la fusione di più listini) senza confrontare tutte
+le coppie. Ogni descrizione normalizzata diventa un insieme di n-grammi
+di caratteri, riassunto da una firma MinHash a una sola permutazione
+(un crc32 per n-gramma, con densificazione dei bin vuoti); la firma è
+divisa in bande (LSH) e solo le voci che hanno una banda identica
+diventano candidate. Prima della Jaccard esatta le coppie candidate
+passano un filtro economico: la somiglianza stimata dalla firma
+compatta (il byte basso di ogni bin) deve superare la soglia meno
+SIG_MARGIN.
+
+Per ogni voce il database conserva l'hash del testo normalizzato, la
+firma compatta e la chiave di ciascuna banda in una colonna indicizzata
+(sim_signatures): le voci simili a una data si trovano per uguaglianza
+sugli indici, i bucket del report duplicati con un GROUP BY per banda.
+I bucket affollati (testi con lunghe parti comuni) sono suddivisi con
+una seconda banda invece di confrontarne tutte le coppie. L'indice è
+incrementale: i trigger su price_list eliminano le firme delle voci
+modificate o cancellate, index_pending() indicizza solo le voci che ne
+sono prive.
+"""
+
+__date__ = "2026-10-19"
+__version__ = "1.0.0"
+__author__ = "Gemini CLI"
+
+import re
+import math
+import time
+import zlib
+import bisect
+import sqlite3
+import hashlib
+from array import array
+from typing import List, Dict, Set, Tuple
+from dataclasses import dataclass, field
+
+SHINGLE_SIZE = 5            # Lunghezza degli n-grammi di caratteri
+NUM_BINS = 32               # Valori MinHash per firma
+BANDS = 8                   # Bande LSH (BANDS * ROWS = NUM_BINS)
+ROWS = 4                    # Valori per banda: soglia effettiva ~ (1/BANDS)^(1/ROWS) ≈ 0.6
+DEFAULT_THRESHOLD = 0.8     # Somiglianza minima per il report duplicati
+# Sopra la soglia effettiva LSH: una coppia con Jaccard 0.7 condivide almeno una
+# banda nell'89% dei casi (a 0.5 solo nel 40%, le voci simili andrebbero perse)
+SIMILAR_THRESHOLD = 0.7     # Somiglianza minima per "voci simili"
+SIG_MARGIN = 0.1            # Tolleranza della stima dalla firma compatta
+SPLIT_BUCKET = 20           # Bucket più grandi suddivisi con una seconda banda
+MAX_BUCKET = 150            # Gruppi ancora più grandi (testi molto comuni) esclusi dal confronto a coppie
+INDEX_BATCH = 5000          # Voci indicizzate per blocco
+
+_BAND_COLUMNS = [f"band{b}" for b in range(BANDS)]
+_BIN_OF = (NUM_BINS - 1).__and__
+_GOLDEN = 0x9E3779B1        # Sposta i valori copiati nei bin vuoti (densificazione)
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+@dataclass
+class SimilarItem:
+    """Voce del prezzario con la somiglianza rispetto a un riferimento."""
+    code: str
+    description: str
+    unit: str
+    price: float
+    category: str
+    similarity: float
+
+
+@dataclass
+class DuplicateGroup:
+    """Gruppo di voci duplicate o quasi duplicate."""
+    items: List[SimilarItem]
+    min_similarity: float
+    exact: bool
+
+
+@dataclass
+class DedupReport:
+    """Esito della ricerca dei duplicati su tutto il prezzario."""
+    groups: List[DuplicateGroup] = field(default_factory=list)
+    items_indexed: int = 0
+    candidate_pairs: int = 0
+    verified_pairs: int = 0
+    skipped_buckets: int = 0
+    threshold: float = DEFAULT_THRESHOLD
+    duration_s: float = 0.0
+
+    @property
+    def duplicate_items(self) -> int:
+        res = sum(len(g.items) for g in self.groups)
+        return res
+
+    def summary(self) -> str:
+        exact = sum(1 for g in self.groups if g.exact)
+        res = (f"{len(self.groups)} gruppi ({exact} identici, {len(self.groups) - exact} simili >= {self.threshold:.0%}) | "
+               f"{self.duplicate_items} voci coinvolte su {self.items_indexed} | "
+               f"{self.candidate_pairs} coppie candidate, {self.verified_pairs} verificate | "
+               f"{self.duration_s:.2f}s")
+        if self.skipped_buckets:
+            res += f" | {self.skipped_buckets} bucket troppo affollati esclusi"
+        return res
+
+
+# --- FIRME ---
+
+def normalize_text(text: str) -> str:
+    """Minuscole, punteggiatura e spazi multipli ridotti a un solo spazio."""
+    res = " ".join(_NON_WORD.sub(" ", (text or "").lower()).split())
+    return res
+
+
+def shingles(norm: str) -> Set[bytes]:
+    """n-grammi di caratteri (in UTF-8) di un testo normalizzato."""
+    data = norm.encode("utf-8")
+    if len(data) <= SHINGLE_SIZE:
+        return {data}
+    res = {data[i:i + SHINGLE_SIZE] for i in range(len(data) - SHINGLE_SIZE + 1)}
+    return res
+
+
+def jaccard(a: Set[bytes], b: Set[bytes]) -> float:
+    if not a and not b:
+        return 1.0
+    inter = len(a & b)
+    res = inter / (len(a) + len(b) - inter)
+    return res
+
+
+def signature(grams: Set[bytes]) -> array:
+    """
+    Firma MinHash a una permutazione: ogni n-gramma è assegnato a un bin
+    dai bit bassi del crc32 e ogni bin conserva il minimo. I bin vuoti
+    (testi corti) copiano il bin pieno successivo, così due testi corti
+    diversi non si somigliano solo perché hanno bin vuoti in comune.
+    """
+    # In ordine decrescente l'ultimo valore scritto in ciascun bin è il minimo
+    hashes = sorted(map(zlib.crc32, grams), reverse=True)
+    mins = dict(zip(map(_BIN_OF, hashes), hashes))
+    if len(mins) == NUM_BINS:
+        res = array("I", map(mins.__getitem__, range(NUM_BINS)))
+        return res
+    full = sorted(mins)
+    res = array("I", bytes(4 * NUM_BINS))
+    for j in range(NUM_BINS):
+        if j in mins:
+            res[j] = mins[j]
+            continue
+        pos = bisect.bisect_right(full, j)
+        k = full[pos] if pos < len(full) else full[0]
+        res[j] = (mins[k] + ((k - j) % NUM_BINS) * _GOLDEN) & 0xFFFFFFFF
+    return res
+
+
+def band_keys(sig: array) -> List[int]:
+    """Chiavi delle bande: crc32 dei valori di ciascuna banda."""
+    raw = sig.tobytes()
+    width = ROWS * sig.itemsize
+    res = [zlib.crc32(raw[b * width:(b + 1) * width]) for b in range(BANDS)]
+    return res
+
+
+def compact_signature(sig: array) -> bytes:
+    """Byte basso di ciascun bin: firma compatta per stimare la somiglianza."""
+    res = bytes(v & 0xFF for v in sig)
+    return res
+
+
+def min_agreement(threshold: float, bins: int = NUM_BINS) -> int:
+    """
+    Bin uguali richiesti, su bins bin confrontati, perché la somiglianza
+    stimata raggiunga threshold - SIG_MARGIN. Con 8 bit due bin diversi
+    coincidono per caso con probabilità 1/256: stima = (m/N - 1/256) / (1 - 1/256).
+    """
+    p = max(0.0, threshold - SIG_MARGIN)
+    res = math.ceil(bins * (p + (1 - p) / 256))
+    return res
+
+
+def band_mask(bands: Tuple[int, ...]) -> int:
+    """
+    Maschera che esclude dal confronto i bin delle bande indicate: le bande
+    per cui una coppia è diventata candidata concordano per costruzione e
+    gonfierebbero la stima.
+    """
+    res = 0
+    for b in bands:
+        res |= ((1 << (8 * ROWS)) - 1) << (8 * ROWS * b)
+    return res
+
+
+def agreement(a: int, b: int, mask: int = 0) -> int:
+    """Bin uguali tra due firme compatte lette come interi, esclusi quelli in mask."""
+    res = ((a ^ b) | mask).to_bytes(NUM_BINS, "little").count(0)
+    return res
+
+
+def text_hash(norm: str) -> int:
+    """Hash a 64 bit (con segno, come gli INTEGER SQLite) del testo normalizzato."""
+    res = int.from_bytes(hashlib.blake2b(norm.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+    return res
+
+
+# --- SCHEMA E INDICIZZAZIONE ---
+
+def init_similarity_schema(cursor: sqlite3.Cursor) -> None:
+    """Tabella delle firme (un indice per banda) e trigger che eliminano quelle superate."""
+    cursor.execute("PRAGMA table_info(sim_signatures)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if columns and not {_BAND_COLUMNS[0], "sig"} <= columns:
+        # Formato precedente (bande in un BLOB o senza firma compatta): firme ricalcolate alla prima ricerca
+        cursor.execute("DROP TABLE sim_signatures")
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS sim_signatures (
+            item_id INTEGER PRIMARY KEY,
+            norm_hash INTEGER NOT NULL,
+            sig BLOB NOT NULL,
+            {", ".join(f"{c} INTEGER NOT NULL" for c in _BAND_COLUMNS)}
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sim_norm_hash ON sim_signatures (norm_hash)")
+    for c in _BAND_COLUMNS:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_sim_{c} ON sim_signatures ({c})")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_sim_price_update AFTER UPDATE OF description ON price_list
+        WHEN old.description IS NOT new.description
+        BEGIN
+            DELETE FROM sim_signatures WHERE item_id = old.id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_sim_price_delete AFTER DELETE ON price_list
+        BEGIN
+            DELETE FROM sim_signatures WHERE item_id = old.id;
+        END
+    """)
+
+
+def index_pending(cursor: sqlite3.Cursor) -> int:
+    """
+    Indicizza le voci del prezzario ancora prive di firma.
+
+    Returns:
+        Numero di voci indicizzate.
+    """
+    cursor.execute("""
+        SELECT p.id, p.description FROM price_list p
+        LEFT JOIN sim_signatures s ON s.item_id = p.id
+        WHERE s.item_id IS NULL
+    """)
+    # Cursore dedicato: quello principale sta ancora scorrendo la SELECT
+    writer = cursor.connection.cursor()
+    count = 0
+    while True:
+        rows = cursor.fetchmany(INDEX_BATCH)
+        if not rows:
+            break
+        sig_rows = []
+        for item_id, description in rows:
+            norm = normalize_text(description)
+            sig = signature(shingles(norm))
+            sig_rows.append((item_id, text_hash(norm), compact_signature(sig), *band_keys(sig)))
+        writer.executemany(f"INSERT INTO sim_signatures VALUES ({', '.join('?' * (BANDS + 3))})", sig_rows)
+        count += len(rows)
+    return count
+
+
+def rebuild_index(cursor: sqlite3.Cursor) -> int:
+    """Ricostruisce da zero l'indice (es. dopo aver cambiato i parametri delle firme)."""
+    cursor.execute("DELETE FROM sim_signatures")
+    count = index_pending(cursor)
+    return count
+
+
+# --- INTERROGAZIONI ---
+
+def _load_items(cursor: sqlite3.Cursor, ids: List[int]) -> Dict[int, Tuple[str, str, str, float, str]]:
+    """Voci del prezzario per id: (code, description, unit, price, category)."""
+    items: Dict[int, Tuple[str, str, str, float, str]] = {}
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        cursor.execute(f"""
+            SELECT id, code, description, unit, price, category FROM price_list
+            WHERE id IN ({",".join("?" * len(chunk))})
+        """, chunk)
+        for row in cursor.fetchall():
+            items[row[0]] = tuple(row[1:])
+    return items
+
+
+def find_similar(cursor: sqlite3.Cursor, code: str, threshold: float = SIMILAR_THRESHOLD,
+                 limit: int = 50) -> List[SimilarItem]:
+    """
+    Voci con descrizione simile a quella del codice indicato, dalla più simile.
+
+    I candidati sono le voci con almeno una banda identica e una firma
+    compatta abbastanza concorde; la somiglianza restituita è la Jaccard
+    esatta sugli n-grammi.
+    """
+    cursor.execute(f"""
+        SELECT p.id, p.description, s.sig, {", ".join(f"s.{c}" for c in _BAND_COLUMNS)} FROM price_list p
+        JOIN sim_signatures s ON s.item_id = p.id
+        WHERE p.code = ?
+    """, (code,))
+    row = cursor.fetchone()
+    if not row:
+        return []
+    item_id, description, ref_sig, keys = row[0], row[1], int.from_bytes(row[2], "little"), row[3:]
+    need = min_agreement(threshold, NUM_BINS - ROWS)
+    # Una ricerca per uguaglianza sull'indice di ciascuna banda
+    candidates = set()
+    for b, (c, key) in enumerate(zip(_BAND_COLUMNS, keys)):
+        mask = band_mask((b,))
+        cursor.execute(f"SELECT item_id, sig FROM sim_signatures WHERE {c} = ?", (key,))
+        candidates.update(i for i, sig in cursor.fetchall()
+                          if agreement(ref_sig, int.from_bytes(sig, "little"), mask) >= need)
+    candidates.discard(item_id)
+    candidates = sorted(candidates)
+    ref = shingles(normalize_text(description))
+    similar = []
+    for c_code, c_desc, c_unit, c_price, c_cat in _load_items(cursor, candidates).values():
+        sim = jaccard(ref, shingles(normalize_text(c_desc)))
+        if sim >= threshold:
+            similar.append(SimilarItem(c_code, c_desc, c_unit, c_price, c_cat or "", sim))
+    similar.sort(key=lambda s: (-s.similarity, s.code))
+    res = similar[:limit]
+    return res
+
+
+def _load_signatures(cursor: sqlite3.Cursor, ids: List[int]) -> Dict[int, Tuple[Tuple[int, ...], int]]:
+    """Chiavi delle bande e firma compatta (come intero) per id."""
+    stored: Dict[int, Tuple[Tuple[int, ...], int]] = {}
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        cursor.execute(f"""
+            SELECT item_id, sig, {", ".join(_BAND_COLUMNS)} FROM sim_signatures
+            WHERE item_id IN ({",".join("?" * len(chunk))})
+        """, chunk)
+        for row in cursor.fetchall():
+            stored[row[0]] = (tuple(row[2:]), int.from_bytes(row[1], "little"))
+    return stored
+
+
+def _band_buckets(cursor: sqlite3.Cursor,
+                  report: DedupReport) -> Tuple[List[Tuple[Tuple[int, ...], List[int]]], Dict[int, int]]:
+    """
+    Bucket LSH con più di una voce, raggruppati banda per banda sull'indice
+    della colonna, con le bande che li definiscono, e firme compatte delle
+    voci coinvolte.
+
+    Un bucket oltre SPLIT_BUCKET nasce di solito da una parte di testo
+    comune a molte voci (es. una coda standard): è suddiviso per ciascuna
+    delle altre bande, così restano candidate solo le voci che hanno in
+    comune almeno due bande. I gruppi ancora oltre MAX_BUCKET sono esclusi.
+    """
+    raw = []
+    crowded: List[Set[int]] = [set() for _ in range(BANDS)]
+    for b, c in enumerate(_BAND_COLUMNS):
+        cursor.execute(f"""
+            SELECT {c}, COUNT(*), group_concat(item_id) FROM sim_signatures
+            GROUP BY {c} HAVING COUNT(*) > 1
+        """)
+        for key, size, ids_text in cursor.fetchall():
+            raw.append((b, [int(x) for x in ids_text.split(",")]))
+            if size > SPLIT_BUCKET:
+                crowded[b].add(key)
+    stored = _load_signatures(cursor, sorted({i for _, ids in raw for i in ids}))
+    buckets = []
+    for band, ids in raw:
+        if len(ids) <= SPLIT_BUCKET:
+            buckets.append(((band,), ids))
+            continue
+        for other in range(BANDS):
+            if other == band:
+                continue
+            split: Dict[int, List[int]] = {}
+            for i in ids:
+                split.setdefault(stored[i][0][other], []).append(i)
+            for key, group in split.items():
+                # Se anche il bucket dell'altra banda è affollato lo stesso gruppo
+                # emerge suddividendo quello: lo si tiene una volta sola
+                if len(group) < 2 or (other < band and key in crowded[other]):
+                    continue
+                if len(group) > MAX_BUCKET:
+                    report.skipped_buckets += 1
+                else:
+                    buckets.append(((band, other), group))
+    sigs = {i: v[1] for i, v in stored.items()}
+    return buckets, sigs
+
+
+def find_duplicates(cursor: sqlite3.Cursor, threshold: float = DEFAULT_THRESHOLD) -> DedupReport:
+    """
+    Raggruppa le voci identiche (stesso testo normalizzato) e quasi identiche
+    (Jaccard >= threshold tra voci che condividono un bucket LSH e la cui
+    firma compatta supera min_agreement(threshold)).
+    """
+    start = time.perf_counter()
+    report = DedupReport(threshold=threshold)
+    cursor.execute("SELECT COUNT(*) FROM sim_signatures")
+    report.items_indexed = cursor.fetchone()[0]
+
+    parent: Dict[int, int] = {}
+    link_sim: Dict[int, float] = {}
+
+    def find(x: int) -> int:
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while parent.get(x, x) != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(a: int, b: int, sim: float) -> None:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent.setdefault(ra, ra)
+            parent[rb] = ra
+            link_sim[ra] = min(link_sim.get(ra, 1.0), link_sim.get(rb, 1.0), sim)
+
+    # 1. Testi identici dopo la normalizzazione
+    cursor.execute("""
+        SELECT group_concat(item_id) FROM sim_signatures
+        GROUP BY norm_hash HAVING COUNT(*) > 1
+    """)
+    for (ids_text,) in cursor.fetchall():
+        ids = [int(x) for x in ids_text.split(",")]
+        for other in ids[1:]:
+            union(ids[0], other, 1.0)
+
+    # 2. Coppie candidate dai bucket LSH, filtrate con la firma compatta
+    buckets, sigs = _band_buckets(cursor, report)
+    survivors: List[Tuple[int, int]] = []
+    checked: Set[int] = set()
+    for bands, ids in buckets:
+        mask = band_mask(bands)
+        need = min_agreement(threshold, NUM_BINS - ROWS * len(bands))
+        for x in range(len(ids)):
+            a = ids[x]
+            sa = sigs[a]
+            for y in range(x + 1, len(ids)):
+                b = ids[y]
+                pair = (a << 32 | b) if a < b else (b << 32 | a)
+                if pair in checked:
+                    continue
+                checked.add(pair)
+                if agreement(sa, sigs[b], mask) >= need:
+                    survivors.append((a, b))
+    report.candidate_pairs = len(checked)
+    checked.clear()
+
+    # ... e verificate con la Jaccard esatta
+    grams: Dict[int, Set[bytes]] = {}
+    descriptions = {i: v[1] for i, v in _load_items(cursor, sorted({i for p in survivors for i in p})).items()}
+    for a, b in survivors:
+        if find(a) == find(b) or a not in descriptions or b not in descriptions:
+            continue
+        for i in (a, b):
+            if i not in grams:
+                grams[i] = shingles(normalize_text(descriptions[i]))
+        report.verified_pairs += 1
+        sim = jaccard(grams[a], grams[b])
+        if sim >= threshold:
+            union(a, b, sim)
+
+    # 3. Gruppi (le voci identiche restano insieme anche se unite a voci solo simili)
+    members: Dict[int, List[int]] = {}
+    for x in list(parent):
+        members.setdefault(find(x), []).append(x)
+    details = _load_items(cursor, sorted({i for ids in members.values() for i in ids}))
+    for root, ids in members.items():
+        items = [SimilarItem(*details[i][:4], details[i][4] or "", 1.0) for i in sorted(ids) if i in details]
+        if len(items) < 2:
+            continue
+        min_sim = link_sim.get(root, 1.0)
+        report.groups.append(DuplicateGroup(items, min_sim, exact=min_sim >= 1.0))
+    report.groups.sort(key=lambda g: (-len(g.items), g.min_similarity, g.items[0].code))
+    report.duration_s = time.perf_counter() - start
+    return report
@@ -0,0 +1,581 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Sync Engine - Registro delle modifiche e sincronizzazione tra database.
+
+Trigger su price_list, quotes e quote_items annotano in sync_log ogni riga
+modificata (una sola voce per riga, con il numero di sequenza più recente,
+l'istante e il nodo che l'ha modificata). Le modifiche successive a una
+sequenza vengono esportate in un pacchetto JSON Lines compresso (gzip) con
+lo stato corrente delle righe e applicate su un altro database.
+
+Identità: le voci di prezzario si riconoscono dal codice, preventivi e
+righe da un uid casuale (gli id locali divergono tra i database).
+
+Conflitti: vince la modifica con (istante, nodo) maggiore, su ogni
+database allo stesso modo; le cancellazioni restano nel registro così
+una modifica più vecchia non fa ricomparire la riga. Il totale dei
+preventivi toccati viene ricalcolato dalle righe.
+"""
+
+__date__ = "2026-10-19"
+__version__ = "1.0.0"
+__author__ = "Gemini CLI"
+
+import os
+import gzip
+import json
+import time
+import socket
+import sqlite3
+import argparse
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set, Tuple
+from dataclasses import dataclass
+from datetime import datetime
+
+SYNC_FORMAT = "preventivi-sync"
+SYNC_FORMAT_VERSION = 1
+SYNC_SCHEMA_VERSION = "1"   # Se cambia, i trigger vengono ricreati all'avvio
+SYNC_DIRNAME = "sync"
+BUNDLE_SUFFIX = ".jsonl.gz"
+
+_NOW = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+_NODE = "(SELECT value FROM sync_state WHERE key = 'node_id')"
+_NEW_UID = "lower(hex(randomblob(16)))"
+
+# L'applicazione di un pacchetto (o un'archiviazione) sospende i trigger: il registro lo scrive il chiamante
+_ACTIVE = "NOT EXISTS (SELECT 1 FROM sync_state WHERE key = 'suspended')"
+
+
+def _log(tbl: str, key: str, op: str) -> str:
+    res = f"INSERT OR REPLACE INTO sync_log (tbl, key, op, ts, origin) VALUES ('{tbl}', {key}, '{op}', {_NOW}, {_NODE});"
+    return res
+
+
+def _log_with_uid(tbl: str) -> str:
+    """Assegna l'uid alle righe nuove (anche durante la sospensione) e registra l'inserimento."""
+    res = f"""
+        UPDATE {tbl} SET uid = {_NEW_UID} WHERE id = NEW.id AND uid IS NULL;
+        INSERT OR REPLACE INTO sync_log (tbl, key, op, ts, origin)
+        SELECT '{tbl}', uid, 'U', {_NOW}, {_NODE} FROM {tbl} WHERE id = NEW.id AND {_ACTIVE};
+    """
+    return res
+
+
+_PRICE_FIELDS = ("code", "description", "unit", "price", "category")
+# total_amount: aggiungere o togliere righe rende la testata più recente di una cancellazione concorrente
+_QUOTE_FIELDS = ("customer_name", "date_created", "notes", "total_amount")
+_ITEM_FIELDS = ("quote_id", "item_code", "description", "quantity", "unit_price", "total_price", "unit", "version_id")
+
+
+def _changed(fields: Tuple[str, ...]) -> str:
+    res = " OR ".join(f"OLD.{f} IS NOT NEW.{f}" for f in fields)
+    return res
+
+
+_TRIGGERS = {
+    "sync_price_insert": f"AFTER INSERT ON price_list WHEN {_ACTIVE} BEGIN {_log('price_list', 'NEW.code', 'U')} END",
+    "sync_price_update": (
+        f"AFTER UPDATE OF {', '.join(_PRICE_FIELDS)} ON price_list WHEN {_ACTIVE} AND ({_changed(_PRICE_FIELDS)}) BEGIN "
+        f"{_log('price_list', 'NEW.code', 'U')} "
+        f"INSERT OR REPLACE INTO sync_log (tbl, key, op, ts, origin) SELECT 'price_list', OLD.code, 'D', {_NOW}, {_NODE} "
+        f"WHERE OLD.code IS NOT NEW.code; END"
+    ),
+    "sync_price_delete": f"AFTER DELETE ON price_list WHEN {_ACTIVE} BEGIN {_log('price_list', 'OLD.code', 'D')} END",
+    "sync_quotes_insert": f"AFTER INSERT ON quotes BEGIN {_log_with_uid('quotes')} END",
+    "sync_quotes_update": (
+        f"AFTER UPDATE OF {', '.join(_QUOTE_FIELDS)} ON quotes WHEN {_ACTIVE} AND NEW.uid IS NOT NULL "
+        f"AND ({_changed(_QUOTE_FIELDS)}) BEGIN {_log('quotes', 'NEW.uid', 'U')} END"
+    ),
+    "sync_quotes_delete": f"AFTER DELETE ON quotes WHEN {_ACTIVE} AND OLD.uid IS NOT NULL BEGIN {_log('quotes', 'OLD.uid', 'D')} END",
+    "sync_items_insert": f"AFTER INSERT ON quote_items BEGIN {_log_with_uid('quote_items')} END",
+    "sync_items_update": (
+        f"AFTER UPDATE OF {', '.join(_ITEM_FIELDS)} ON quote_items WHEN {_ACTIVE} AND NEW.uid IS NOT NULL "
+        f"AND ({_changed(_ITEM_FIELDS)}) BEGIN {_log('quote_items', 'NEW.uid', 'U')} END"
+    ),
+    "sync_items_delete": f"AFTER DELETE ON quote_items WHEN {_ACTIVE} AND OLD.uid IS NOT NULL BEGIN {_log('quote_items', 'OLD.uid', 'D')} END",
+}
+
+
+@dataclass
+class SyncPeer:
+    """Database con cui si è già scambiato almeno un pacchetto."""
+    node_id: str
+    name: str
+    sent_seq: int
+    received_seq: int
+    last_sync: str
+
+
+@dataclass
+class SyncResult:
+    """Esito di un'esportazione o di un'applicazione di pacchetto."""
+    path: str
+    direction: str                  # "export" | "import"
+    node: str = ""                  # Nodo che ha generato il pacchetto
+    since: int = 0
+    upto: int = 0
+    changes: int = 0
+    applied: int = 0
+    skipped: int = 0                # Modifiche già presenti o superate da una locale più recente
+    conflicts: int = 0              # Righe modificate su entrambi i database (risolte per istante, nodo)
+    orphans: int = 0                # Righe di preventivi assenti in locale
+    archived: int = 0               # Preventivi presenti solo nell'archivio locale
+    gap: bool = False               # Mancano pacchetti precedenti di questo nodo
+    bytes: int = 0
+    duration_s: float = 0.0
+    error: str = ""
+
+    def summary(self) -> str:
+        name = Path(self.path).name if self.path else "-"
+        if self.error:
+            res = f"SYNC {self.direction.upper()} {name}: ERRORE {self.error}"
+            return res
+        if self.direction == "export":
+            res = (f"SYNC EXPORT {name}: {self.changes} modifiche (seq {self.since} → {self.upto}) | "
+                   f"{self.bytes / 1024:.1f} KB | {self.duration_s:.2f}s")
+            return res
+        res = (f"SYNC IMPORT {name} da {self.node}: {self.changes} modifiche | applicate {self.applied} | "
+               f"già presenti/superate {self.skipped} | conflitti {self.conflicts} | orfane {self.orphans} | "
+               f"archiviate {self.archived} | {self.duration_s:.2f}s")
+        if self.gap:
+            res += " | ATTENZIONE: mancano pacchetti precedenti di questo nodo"
+        return res
+
+
+# --- SCHEMA ---
+
+def init_sync_schema(cursor: sqlite3.Cursor) -> None:
+    """
+    Crea registro, stato e trigger. Le colonne uid di quotes e quote_items
+    devono già esistere: qui vengono valorizzate per le righe preesistenti.
+    """
+    cursor.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tbl TEXT NOT NULL,
+            key TEXT NOT NULL,
+            op TEXT NOT NULL,
+            ts TEXT NOT NULL,
+            origin TEXT NOT NULL,
+            UNIQUE (tbl, key)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_peers (
+            node_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            sent_seq INTEGER NOT NULL DEFAULT 0,
+            received_seq INTEGER NOT NULL DEFAULT 0,
+            last_sync TEXT
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO sync_state (key, value) VALUES ('node_id', lower(hex(randomblob(8))))")
+    cursor.execute("INSERT OR IGNORE INTO sync_state (key, value) VALUES ('node_name', ?)", (socket.gethostname() or "nodo",))
+    for table in ("quotes", "quote_items"):
+        cursor.execute(f"UPDATE {table} SET uid = {_NEW_UID} WHERE uid IS NULL")
+        cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_uid ON {table} (uid)")
+
+    if _state(cursor, "schema_version") == SYNC_SCHEMA_VERSION:
+        return
+    for name, body in _TRIGGERS.items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"CREATE TRIGGER {name} {body}")
+    cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('schema_version', ?)", (SYNC_SCHEMA_VERSION,))
+
+
+def suspend_sync(cursor: sqlite3.Cursor) -> None:
+    """Sospende la registrazione delle modifiche (da usare dentro la stessa transazione)."""
+    cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('suspended', '1')")
+
+
+def resume_sync(cursor: sqlite3.Cursor) -> None:
+    """Riattiva la registrazione delle modifiche."""
+    cursor.execute("DELETE FROM sync_state WHERE key = 'suspended'")
+
+
+def log_pending_prices(cursor: sqlite3.Cursor) -> int:
+    """
+    Registra in un colpo solo le voci di prezzario non ancora versionate
+    (import massivi eseguiti con i trigger sospesi, prima dello snapshot).
+    """
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO sync_log (tbl, key, op, ts, origin)
+        SELECT 'price_list', code, 'U', {_NOW}, {_NODE} FROM price_list WHERE version_id IS NULL
+    """)
+    res = cursor.rowcount
+    return res
+
+
+def _state(cursor: sqlite3.Cursor, key: str, default: str = "") -> str:
+    cursor.execute("SELECT value FROM sync_state WHERE key = ?", (key,))
+    row = cursor.fetchone()
+    res = row[0] if row else default
+    return res
+
+
+def node_info(cursor: sqlite3.Cursor) -> Tuple[str, str]:
+    """(node_id, nome) di questo database."""
+    res = (_state(cursor, "node_id"), _state(cursor, "node_name"))
+    return res
+
+
+def last_seq(cursor: sqlite3.Cursor) -> int:
+    cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM sync_log")
+    res = cursor.fetchone()[0]
+    return res
+
+
+def base_seq(cursor: sqlite3.Cursor) -> int:
+    """Sequenza al momento della copia del database (new_node): inizio delle modifiche proprie."""
+    res = int(_state(cursor, "base_seq", "0"))
+    return res
+
+
+def new_node(cursor: sqlite3.Cursor, name: Optional[str] = None) -> str:
+    """
+    Nuova identità per una copia del database (es. appena copiato su un portatile).
+
+    Le modifiche già a registro restano attribuite ai nodi originali; la
+    prima esportazione verso un nodo sconosciuto parte da qui.
+    """
+    cursor.execute("UPDATE sync_state SET value = lower(hex(randomblob(8))) WHERE key = 'node_id'")
+    if name:
+        cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('node_name', ?)", (name,))
+    cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('base_seq', ?)", (str(last_seq(cursor)),))
+    cursor.execute("DELETE FROM sync_peers")
+    res = node_info(cursor)[0]
+    return res
+
+
+def seed_log(cursor: sqlite3.Cursor) -> int:
+    """
+    Mette a registro le righe mai modificate da quando il registro esiste,
+    con istante vuoto (perdono contro qualsiasi modifica reale): serve per
+    allineare da zero un database che non deriva da una copia di questo.
+    """
+    node_id = node_info(cursor)[0]
+    count = 0
+    for tbl, key in (("price_list", "code"), ("quotes", "uid"), ("quote_items", "uid")):
+        cursor.execute(f"""
+            INSERT INTO sync_log (tbl, key, op, ts, origin)
+            SELECT ?, t.{key}, 'U', '', ? FROM {tbl} t
+            WHERE t.{key} IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM sync_log l WHERE l.tbl = ? AND l.key = t.{key})
+        """, (tbl, node_id, tbl))
+        count += cursor.rowcount
+    return count
+
+
+def get_peers(cursor: sqlite3.Cursor) -> List[SyncPeer]:
+    cursor.execute("SELECT node_id, name, sent_seq, received_seq, last_sync FROM sync_peers ORDER BY name")
+    res = [SyncPeer(r[0], r[1], r[2], r[3], r[4] or "") for r in cursor.fetchall()]
+    return res
+
+
+def find_peer(cursor: sqlite3.Cursor, peer: str) -> Optional[SyncPeer]:
+    """Nodo per node_id o per nome."""
+    res = next((p for p in get_peers(cursor) if peer in (p.node_id, p.name)), None)
+    return res
+
+
+# --- ESPORTAZIONE ---
+
+# Sezioni del pacchetto nell'ordine di applicazione: testate prima delle righe, cancellazioni delle testate per ultime
+_EXPORT_SECTIONS = (
+    ("price_list", """
+        SELECT l.seq, l.key, l.op, l.ts, l.origin, p.description, p.unit, p.price, p.category
+        FROM sync_log l LEFT JOIN price_list p ON p.code = l.key
+        WHERE l.tbl = 'price_list' AND l.seq > ? AND l.origin <> ?
+        ORDER BY l.seq
+    """),
+    ("quotes", """
+        SELECT l.seq, l.key, l.op, l.ts, l.origin, q.customer_name, q.date_created, q.notes
+        FROM sync_log l LEFT JOIN quotes q ON q.uid = l.key
+        WHERE l.tbl = 'quotes' AND l.op = 'U' AND l.seq > ? AND l.origin <> ?
+        ORDER BY l.seq
+    """),
+    # Righe versionate: descrizione e U.M. lette dallo storico (le versioni sono locali a ciascun database)
+    ("quote_items", """
+        SELECT l.seq, l.key, l.op, l.ts, l.origin, q.uid, qi.item_code,
+               COALESCE(qi.description, d.text, ''), qi.quantity, qi.unit_price, qi.total_price,
+               COALESCE(qi.unit, h.unit, '')
+        FROM sync_log l
+        LEFT JOIN quote_items qi ON qi.uid = l.key
+        LEFT JOIN quotes q ON q.id = qi.quote_id
+        LEFT JOIN price_history h ON h.version_id = qi.version_id AND h.code = qi.item_code
+        LEFT JOIN price_descriptions d ON d.id = h.description_id
+        WHERE l.tbl = 'quote_items' AND l.seq > ? AND l.origin <> ?
+        ORDER BY qi.id, l.seq
+    """),
+    ("quotes", """
+        SELECT l.seq, l.key, l.op, l.ts, l.origin
+        FROM sync_log l
+        WHERE l.tbl = 'quotes' AND l.op = 'D' AND l.seq > ? AND l.origin <> ?
+        ORDER BY l.seq
+    """),
+)
+
+_PAYLOAD_KEYS = {
+    "price_list": ("description", "unit", "price", "category"),
+    "quotes": ("customer_name", "date_created", "notes"),
+    "quote_items": ("quote", "item_code", "description", "quantity", "unit_price", "total_price", "unit"),
+}
+
+
+def export_bundle(cursor: sqlite3.Cursor, path: Path, since: int, exclude_origin: str = "",
+                  ack: int = 0) -> SyncResult:
+    """
+    Scrive in path le modifiche con sequenza > since (escluse quelle del nodo
+    exclude_origin, che le possiede già).
+
+    ack è l'ultima sequenza del destinatario già applicata qui: gli consente
+    di riconoscere come conflitti solo le modifiche che questo nodo non aveva visto.
+
+    Il file viene scritto accanto con suffisso .part e rinominato a fine scrittura.
+    """
+    start = time.perf_counter()
+    result = SyncResult(path=str(path), direction="export", since=since)
+    node_id, node_name = node_info(cursor)
+    result.node = node_name
+    result.upto = last_seq(cursor)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    part = path.with_name(path.name + ".part")
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    try:
+        with gzip.open(part, "wt", encoding="utf-8") as out:
+            header = {"format": SYNC_FORMAT, "version": SYNC_FORMAT_VERSION, "origin": node_id, "node": node_name,
+                      "since": since, "upto": result.upto, "base": base_seq(cursor), "ack": ack, "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+            out.write(dumps(header) + "\n")
+            for tbl, query in _EXPORT_SECTIONS:
+                cursor.execute(query, (since, exclude_origin))
+                for row in cursor:
+                    change: Dict[str, Any] = {"t": tbl, "k": row[1], "op": row[2], "ts": row[3], "o": row[4]}
+                    if row[2] == "U":
+                        if row[5] is None:
+                            continue    # Riga sparita senza passare dai trigger (es. archiviata)
+                        change["d"] = dict(zip(_PAYLOAD_KEYS[tbl], row[5:]))
+                    out.write(dumps(change) + "\n")
+                    result.changes += 1
+        os.replace(part, path)
+    except Exception:
+        part.unlink(missing_ok=True)
+        raise
+    result.bytes = path.stat().st_size
+    result.duration_s = time.perf_counter() - start
+    return result
+
+
+# --- APPLICAZIONE ---
+
+def _read_header(fh) -> Dict[str, Any]:
+    header = json.loads(fh.readline() or "{}")
+    if header.get("format") != SYNC_FORMAT or header.get("version") != SYNC_FORMAT_VERSION:
+        raise ValueError("file non riconosciuto come pacchetto di sincronizzazione")
+    return header
+
+
+def _quote_id(cursor: sqlite3.Cursor, uid: str) -> Optional[int]:
+    cursor.execute("SELECT id FROM quotes WHERE uid = ?", (uid,))
+    row = cursor.fetchone()
+    res = row[0] if row else None
+    return res
+
+
+def _is_archived(cursor: sqlite3.Cursor, uid: str, has_archive: bool) -> bool:
+    if not has_archive:
+        return False
+    cursor.execute("SELECT 1 FROM arc.quotes WHERE uid = ?", (uid,))
+    res = cursor.fetchone() is not None
+    return res
+
+
+def apply_bundle(cursor: sqlite3.Cursor, path: Path, has_archive: bool = False) -> SyncResult:
+    """
+    Applica un pacchetto nella transazione corrente (il commit spetta al chiamante).
+
+    Ogni modifica passa solo se il suo (istante, nodo) supera quello a
+    registro per la stessa riga; una riga locale mai registrata vale
+    ("", questo nodo). Le modifiche applicate entrano nel registro con
+    il timbro originale, così proseguono verso gli altri nodi.
+
+    Args:
+        has_archive: True se l'archivio è collegato come schema "arc".
+    """
+    start = time.perf_counter()
+    result = SyncResult(path=str(path), direction="import")
+    node_id = node_info(cursor)[0]
+    touched: Set[int] = set()
+
+    def local_stamp(tbl: str, key: str, exists: bool) -> Tuple[Optional[Tuple[str, str]], int]:
+        """Timbro (istante, nodo) della riga locale e sua sequenza nel registro (0 se mai registrata)."""
+        cursor.execute("SELECT ts, origin, seq FROM sync_log WHERE tbl = ? AND key = ?", (tbl, key))
+        row = cursor.fetchone()
+        res = ((row[0], row[1]), row[2]) if row else ((("", node_id) if exists else None), 0)
+        return res
+
+    def stamp(tbl: str, key: str, op: str, ts: str, origin: str) -> None:
+        cursor.execute("INSERT OR REPLACE INTO sync_log (tbl, key, op, ts, origin) VALUES (?, ?, ?, ?, ?)",
+                       (tbl, key, op, ts, origin))
+
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        header = _read_header(fh)
+        if header["origin"] == node_id:
+            raise ValueError("pacchetto generato da questo database (su una copia usare prima: sync_engine.py new-node)")
+        result.node, result.since, result.upto = header.get("node", header["origin"]), header["since"], header["upto"]
+        # Sequenza (del mittente) da cui è stata copiata la sua base dati: nessun salto prima di questa
+        sender_base = int(header.get("base", 0))
+        cursor.execute("SELECT received_seq FROM sync_peers WHERE node_id = ?", (header["origin"],))
+        peer = cursor.fetchone()
+        received = max(peer[0] if peer else 0, sender_base)
+        # Righe locali registrate oltre questa sequenza non ancora viste dal mittente: solo lì una
+        # sua modifica è concorrente. Senza conferma dal mittente vale il punto di copia (il nostro,
+        # o il suo se è una copia di questo database).
+        seen_upto = int(header.get("ack", 0)) or max(base_seq(cursor), sender_base)
+        suspend_sync(cursor)
+        for line in fh:
+            if not line.strip():
+                continue
+            ch = json.loads(line)
+            result.changes += 1
+            tbl, key, op, ts, origin = ch["t"], ch["k"], ch["op"], ch["ts"], ch["o"]
+            d = ch.get("d", {})
+            local_id: Optional[int] = None
+            if tbl == "price_list":
+                cursor.execute("SELECT id FROM price_list WHERE code = ?", (key,))
+                row = cursor.fetchone()
+                local_id = row[0] if row else None
+            elif tbl == "quotes":
+                local_id = _quote_id(cursor, key)
+            elif tbl == "quote_items":
+                cursor.execute("SELECT id, quote_id FROM quote_items WHERE uid = ?", (key,))
+                row = cursor.fetchone()
+                if row:
+                    local_id = row[0]
+                    touched.add(row[1])
+            else:
+                continue
+            local, local_seq = local_stamp(tbl, key, local_id is not None)
+            # Riga modificata qui (o ricevuta da altri) e non ancora vista dal mittente: conflitto, risolto dal timbro
+            if local is not None and local[0] and local[1] != origin and local_seq > seen_upto:
+                result.conflicts += 1
+            if local is not None and local >= (ts, origin):
+                result.skipped += 1
+                continue
+
+            if tbl == "price_list":
+                if op == "D":
+                    cursor.execute("DELETE FROM price_list WHERE code = ?", (key,))
+                else:
+                    cursor.execute("""
+                        INSERT INTO price_list (code, description, unit, price, category) VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT (code) DO UPDATE SET
+                            description = excluded.description, unit = excluded.unit,
+                            price = excluded.price, category = excluded.category, version_id = NULL
+                        WHERE description IS NOT excluded.description OR unit IS NOT excluded.unit
+                           OR price IS NOT excluded.price OR category IS NOT excluded.category
+                    """, (key, d["description"], d["unit"], d["price"], d["category"]))
+            elif tbl == "quotes":
+                if op == "D":
+                    if local_id is not None:
+                        # Le righe seguono la testata, con lo stesso timbro della cancellazione
+                        cursor.execute("SELECT uid FROM quote_items WHERE quote_id = ?", (local_id,))
+                        for (item_uid,) in cursor.fetchall():
+                            stamp("quote_items", item_uid, "D", ts, origin)
+                        cursor.execute("DELETE FROM quote_items WHERE quote_id = ?", (local_id,))
+                        cursor.execute("DELETE FROM quotes WHERE id = ?", (local_id,))
+                        touched.discard(local_id)
+                elif local_id is not None:
+                    cursor.execute("UPDATE quotes SET customer_name = ?, date_created = ?, notes = ? WHERE id = ?",
+                                   (d["customer_name"], d["date_created"], d["notes"], local_id))
+                elif _is_archived(cursor, key, has_archive):
+                    result.archived += 1
+                    continue
+                else:
+                    cursor.execute("""
+                        INSERT INTO quotes (customer_name, date_created, total_amount, notes, uid) VALUES (?, ?, 0.0, ?, ?)
+                    """, (d["customer_name"], d["date_created"], d["notes"], key))
+            else:
+                if op == "D":
+                    cursor.execute("DELETE FROM quote_items WHERE uid = ?", (key,))
+                else:
+                    quote_id = _quote_id(cursor, d["quote"])
+                    if quote_id is None:
+                        if _is_archived(cursor, d["quote"], has_archive):
+                            result.archived += 1
+                        else:
+                            result.orphans += 1
+                        continue
+                    values = (quote_id, d["item_code"], d["description"], d["quantity"], d["unit_price"], d["total_price"], d["unit"])
+                    if local_id is not None:
+                        cursor.execute("""
+                            UPDATE quote_items SET quote_id = ?, item_code = ?, description = ?, quantity = ?,
+                                   unit_price = ?, total_price = ?, unit = ?, version_id = NULL
+                            WHERE id = ?
+                        """, values + (local_id,))
+                    else:
+                        cursor.execute("""
+                            INSERT INTO quote_items (quote_id, item_code, description, quantity, unit_price, total_price, unit, uid)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        """, values + (key,))
+                    touched.add(quote_id)
+            stamp(tbl, key, op, ts, origin)
+            result.applied += 1
+
+    # Totali ricalcolati dalle righe: convergono anche con modifiche concorrenti allo stesso preventivo
+    for quote_id in touched:
+        cursor.execute("""
+            UPDATE quotes SET total_amount = COALESCE((SELECT SUM(total_price) FROM quote_items WHERE quote_id = ?), 0)
+            WHERE id = ?
+        """, (quote_id, quote_id))
+    resume_sync(cursor)
+
+    result.gap = result.since > received
+    cursor.execute("""
+        INSERT INTO sync_peers (node_id, name, received_seq, last_sync) VALUES (?, ?, ?, ?)
+        ON CONFLICT (node_id) DO UPDATE SET name = excluded.name,
+            received_seq = MAX(received_seq, excluded.received_seq), last_sync = excluded.last_sync
+    """, (header["origin"], result.node, result.upto, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    result.duration_s = time.perf_counter() - start
+    return result
+
+
+def do_main() -> None:
+    """Uso da riga di comando: python3 sync_engine.py status|export|import|new-node ..."""
+    from data_engine import DataManager
+    parser = argparse.ArgumentParser(description="Sincronizzazione tra database di Preventivi Manager")
+    parser.add_argument("--db", type=Path, default=None, help="percorso del database (default: data/computa_ai.db)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="identità del database, ultima sequenza e nodi noti")
+    p_exp = sub.add_parser("export", help="esporta le modifiche in un pacchetto")
+    p_exp.add_argument("--peer", help="nodo destinatario (nome o id): riparte dall'ultimo invio")
+    p_exp.add_argument("--since", type=int, default=None, help="esporta le modifiche con sequenza maggiore")
+    p_exp.add_argument("--full", action="store_true", help="tutte le righe, per allineare un database indipendente")
+    p_exp.add_argument("--out", type=Path, default=None, help=f"file di destinazione (default: data/{SYNC_DIRNAME}/)")
+    p_imp = sub.add_parser("import", help="applica uno o più pacchetti")
+    p_imp.add_argument("files", nargs="+", type=Path)
+    p_new = sub.add_parser("new-node", help="nuova identità per una copia del database")
+    p_new.add_argument("--name", default=None)
+    args = parser.parse_args()
+
+    db = DataManager(args.db)
+    if args.command == "status":
+        status = db.get_sync_status()
+        print(f"Nodo {status['name']} ({status['node_id']}) | ultima sequenza {status['last_seq']}")
+        for p in status["peers"]:
+            print(f"  {p.name} ({p.node_id}): inviato fino a {p.sent_seq} | ricevuto fino a {p.received_seq} | {p.last_sync}")
+    elif args.command == "export":
+        print(db.export_changes(args.out, args.peer, args.since, args.full).summary())
+    elif args.command == "import":
+        for f in args.files:
+            print(db.import_changes(f).summary())
+    elif args.command == "new-node":
+        print(f"Nuovo nodo: {db.new_sync_node(args.name)}")
+
+
+if __name__ == "__main__":
+    do_main()